@@ -0,0 +1,61 @@
+"""号码同现统计性能对比: 逐期组合计数 vs 矩阵乘法 / bincount
+
+用法:
+    python -m benchmarks.bench_cooccurrence [--sizes 1000 100000 1000000]
+
+- loop:    逐期枚举 15 个两两组合和 20 个三码组合, 用 Counter 计数
+- matrix:  cooccurrence(DrawMatrix), 两两计数为 XᵀX (float32 分块矩阵乘法),
+           三码为 50³ 键空间上的 bincount 后转为稀疏计数
+"""
+import argparse
+import collections
+import itertools
+import time
+
+import numpy as np
+
+from lottery_analyzer import analysis
+from lottery_analyzer.draws import DrawMatrix
+
+
+def sample_draws(rows: int, seed: int = 0) -> DrawMatrix:
+    rng = np.random.default_rng(seed)
+    numbers = np.argsort(rng.random((rows, 49)), axis=1)[:, :7] + 1
+    return DrawMatrix(numbers[:, :6], numbers[:, 6])
+
+
+def loop_cooccurrence(history: list) -> tuple:
+    pairs, triples = collections.Counter(), collections.Counter()
+    for numbers in history:
+        numbers = sorted(numbers)
+        pairs.update(itertools.combinations(numbers, 2))
+        triples.update(itertools.combinations(numbers, 3))
+    return pairs, triples
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'loop':>10} {'matrix':>10} {'speedup':>8}")
+    for size in args.sizes:
+        draws = sample_draws(size)
+        history = draws.numbers.tolist()
+        slow = timed(lambda: loop_cooccurrence(history))
+        fast = timed(lambda: analysis.cooccurrence(draws))
+        pairs, triples = loop_cooccurrence(history)
+        result = analysis.cooccurrence(draws)
+        assert all(result.counts[a, b] == c for (a, b), c in pairs.items())
+        assert result.top_triples(1)[0][1] == max(triples.values())
+        print(f"{size:>10} {slow * 1e3:>8.1f}ms {fast * 1e3:>8.2f}ms {slow / fast:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
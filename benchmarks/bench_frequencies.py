@@ -0,0 +1,66 @@
+"""频率统计性能对比: 逐期逐号循环 vs np.bincount
+
+用法:
+    python -m benchmarks.bench_frequencies [--sizes 1000 100000 1000000]
+
+- loop:      原有的逐期逐号计数 (isinstance 检查 + defaultdict)
+- dict:      calculate_frequencies(DrawMatrix), bincount 后转换为 defaultdict
+- bincount:  frequency_vectors(DrawMatrix), 直接返回长度50的计数向量
+"""
+import argparse
+import collections
+import time
+
+import numpy as np
+
+from lottery_analyzer import analysis
+from lottery_analyzer.draws import DrawMatrix
+
+
+def sample_draws(rows: int, seed: int = 0) -> DrawMatrix:
+    rng = np.random.default_rng(seed)
+    numbers = np.argsort(rng.random((rows, 49)), axis=1)[:, :7] + 1
+    return DrawMatrix(numbers[:, :6], numbers[:, 6])
+
+
+def loop_frequencies(history: list) -> tuple:
+    """原有写法 (有效数据上的主要开销)"""
+    regular, special = collections.defaultdict(int), collections.defaultdict(int)
+    for draw in history:
+        if not isinstance(draw, dict):
+            continue
+        for num in draw['numbers']:
+            if isinstance(num, int):
+                regular[num] += 1
+        if isinstance(draw['special'], int):
+            special[draw['special']] += 1
+    return regular, special
+
+
+def timed(func, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'loop':>10} {'dict':>10} {'bincount':>10} {'speedup':>8}")
+    for size in args.sizes:
+        draws = sample_draws(size)
+        history = draws.to_dicts()
+        repeat = max(1, 100_000 // size)
+        slow = timed(lambda: loop_frequencies(history))
+        wrapped = timed(lambda: analysis.calculate_frequencies(draws), repeat)
+        fast = timed(lambda: analysis.frequency_vectors(draws), repeat)
+        assert analysis.calculate_frequencies(draws) == loop_frequencies(history)
+        print(f"{size:>10} {slow * 1e3:>8.2f}ms {wrapped * 1e3:>8.3f}ms {fast * 1e3:>8.3f}ms"
+              f" {slow / fast:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
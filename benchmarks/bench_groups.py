@@ -0,0 +1,56 @@
+"""多组预测性能对比: 逐组调用 vs predict_groups 一次向量化抽样
+
+用法:
+    python -m benchmarks.bench_groups [--groups 10 100 1000] [--rows 2000]
+
+- loop:    每组以独立的随机数生成器调用一次预测函数 (共享 PredictionContext)
+- batched: predict_groups, 模型得分只计算一次, 全部分组一次抽样
+"""
+import argparse
+import gc
+import time
+
+import numpy as np
+
+from lottery_analyzer import prediction
+from lottery_analyzer.draws import DrawMatrix
+from lottery_analyzer.prediction_context import PredictionContext
+
+METHODS = ('markov', 'bayes', 'grey', 'hybrid')
+
+
+def sample_draws(rows: int, seed: int = 0) -> DrawMatrix:
+    rng = np.random.default_rng(seed)
+    numbers = np.argsort(rng.random((rows, 49)), axis=1)[:, :7] + 1
+    return DrawMatrix(numbers[:, :6], numbers[:, 6])
+
+
+def timed(func) -> float:
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--groups", type=int, nargs='+', default=[10, 100, 1_000])
+    parser.add_argument("--rows", type=int, default=2_000)
+    args = parser.parse_args()
+
+    draws = sample_draws(args.rows)
+    prediction.predict_groups(draws, 'hybrid', 1)  # 窗口等缓存建在 DrawMatrix 上, 不计入对比
+    print(f"{'method':>10} {'groups':>8} {'loop':>10} {'batched':>10} {'speedup':>8}")
+    for method in METHODS:
+        for groups in args.groups:
+            # 两种方式各自使用新的上下文, 都包含一次模型得分的计算
+            seeds = np.random.SeedSequence(1).spawn(groups)
+            loop_context = PredictionContext(draws)
+            slow = timed(lambda: [prediction._run_method(method, loop_context, seed, 6, 10, 20) for seed in seeds])
+            fast = timed(lambda: prediction.predict_groups(draws, method, groups, 1,
+                                                           context=PredictionContext(draws)))
+            print(f"{method:>10} {groups:>8} {slow * 1e3:>8.1f}ms {fast * 1e3:>8.1f}ms {slow / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""批量导入性能对比: csv.DictReader 逐行解析 vs data_input.ingest_history
+
+用法:
+    python -m benchmarks.bench_ingest [--sizes 10000 100000 1000000] [--dirty 0.01]
+
+生成含少量脏数据的临时CSV, 分别计时两种解析方式。
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from lottery_analyzer import data_input
+
+
+def write_sample(path: str, rows: int, dirty: float, seed: int = 0) -> None:
+    """生成 rows 行样本数据, 其中约 dirty 比例的行无效"""
+    rng = np.random.default_rng(seed)
+    numbers = np.argsort(rng.random((rows, 49)), axis=1)[:, :7] + 1
+    bad = rng.random(rows) < dirty
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write(','.join(data_input.CSV_HEADER) + '\r\n')
+        for i in range(rows):
+            values = [f"{n:02d}" for n in numbers[i]]
+            if bad[i]:
+                values[i % 7] = ('xx', '60', values[(i + 1) % 7])[i % 3]
+            f.write(f"{1000000 + i}," + ','.join(values) + '\r\n')
+
+
+def dictreader_ingest(path: str) -> int:
+    """原有的逐行解析方式 (每行 int() + try, 每个坏行打印一条警告)"""
+    history = []
+    with open(path, mode='r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                numbers = [int(row[f'n{i}']) for i in range(1, 7)]
+                special = int(row['special_number'])
+                if not all(1 <= n <= 49 for n in numbers + [special]):
+                    raise ValueError("号码超出范围")
+                history.append({'date': row['date'], 'numbers': numbers, 'special': special})
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"警告: 跳过无效行: {row}. 原因: {str(e)}")
+    return len(history)
+
+
+def bulk_ingest(path: str) -> int:
+    draws, _ = data_input.ingest_history(path)
+    return len(draws)
+
+
+def timed(func, path: str) -> tuple:
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        rows = func(path)
+        return time.perf_counter() - start, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dirty", type=float, default=0.01, help="无效行比例 (默认 0.01)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'DictReader':>12} {'ingest':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in args.sizes:
+            path = os.path.join(tmpdir, f"history_{size}.csv")
+            write_sample(path, size, args.dirty)
+            slow, slow_rows = timed(dictreader_ingest, path)
+            fast, fast_rows = timed(bulk_ingest, path)
+            print(f"{size:>10} {slow:>11.3f}s {fast:>9.3f}s {slow / fast:>7.1f}x"
+                  f"   (accepted {slow_rows} / {fast_rows})")
+
+
+if __name__ == '__main__':
+    main()
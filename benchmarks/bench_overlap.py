@@ -0,0 +1,54 @@
+"""号码重叠统计性能对比: 逐期 set 求交 vs 位图 + popcount
+
+用法:
+    python -m benchmarks.bench_overlap [--sizes 1000 100000 1000000] [--k 3]
+
+统计 "历史中有多少期与一注号码至少有 k 个相同正码"。
+"""
+import argparse
+import time
+
+import numpy as np
+
+from lottery_analyzer.draws import DrawMatrix
+
+
+def sample_draws(rows: int, seed: int = 0) -> DrawMatrix:
+    rng = np.random.default_rng(seed)
+    numbers = np.argsort(rng.random((rows, 49)), axis=1)[:, :7] + 1
+    return DrawMatrix(numbers[:, :6], numbers[:, 6])
+
+
+def set_sharing(history: list, ticket: list, k: int) -> int:
+    """原有写法: 每期转成 set 求交"""
+    ticket = set(ticket)
+    return sum(1 for numbers in history if len(ticket & set(numbers)) >= k)
+
+
+def per_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    ticket = [3, 11, 19, 27, 35, 43]
+    print(f"{'rows':>10} {'set':>12} {'popcount':>12} {'speedup':>8}")
+    for size in args.sizes:
+        draws = sample_draws(size)
+        history = draws.numbers.tolist()
+        draws.masks  # 位图在加载时已准备好, 不计入单次匹配时间
+        slow = per_call(lambda: set_sharing(history, ticket, args.k), 1)
+        fast = per_call(lambda: draws.count_sharing(ticket, args.k), 20)
+        assert set_sharing(history, ticket, args.k) == draws.count_sharing(ticket, args.k)
+        print(f"{size:>10} {slow * 1e6:>10.0f}us {fast * 1e6:>10.1f}us {slow / fast:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""综合预测 (predict_all_methods) 的并行方式对比
+
+用法:
+    python -m benchmarks.bench_prediction [--groups 50] [--rows 2000] [--workers 4]
+
+- serial:   逐组逐方法运行 (共享 PredictionContext)
+- threads:  全部分组的方法节点提交到一个线程池
+- process:  普通进程池, 每个任务都会序列化一份上下文
+- bound:    PredictionProcessPool, 上下文在每个工作进程启动时只传递一次
+
+线程池受 GIL 限制, 主要收益来自特征计算在各组间共享; 进程池的耗时包含进程启动
+(平台支持 fork 时使用 fork, 否则使用默认的启动方式, 如 Windows 上的 spawn)。
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from lottery_analyzer import prediction
+from lottery_analyzer.draws import DrawMatrix
+from lottery_analyzer.prediction_context import PredictionContext
+
+
+def sample_draws(rows: int, seed: int = 0) -> DrawMatrix:
+    rng = np.random.default_rng(seed)
+    numbers = np.argsort(rng.random((rows, 49)), axis=1)[:, :7] + 1
+    return DrawMatrix(numbers[:, :6], numbers[:, 6])
+
+
+def run_groups(draws: DrawMatrix, groups: int, executor=None, context=None) -> list:
+    context = context if context is not None else PredictionContext(draws)
+    seeds = np.random.SeedSequence(1).spawn(groups)
+    results = [prediction.predict_all_methods(draws, context=context, seed=seed, executor=executor)
+               for seed in seeds]
+    return [result.to_dict() for result in results]
+
+
+def timed(func) -> tuple:
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    draws = sample_draws(args.rows)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:
+        mp_context = multiprocessing.get_context()
+    run_groups(draws, 1)  # 窗口等缓存建在 DrawMatrix 上, 不计入对比
+
+    def threads():
+        with ThreadPoolExecutor(args.workers) as pool:
+            return run_groups(draws, args.groups, pool)
+
+    def process():
+        with ProcessPoolExecutor(args.workers, mp_context=mp_context) as pool:
+            return run_groups(draws, args.groups, pool)
+
+    def bound():
+        context = PredictionContext(draws)
+        with prediction.PredictionProcessPool(context, args.workers, mp_context=mp_context) as pool:
+            return run_groups(draws, args.groups, pool, context)
+
+    serial_time, expected = timed(lambda: run_groups(draws, args.groups))
+    print(f"{args.groups} 组, {args.rows} 期, {args.workers} 个工作线程/进程")
+    print(f"{'mode':>8} {'time':>10} {'speedup':>8}")
+    print(f"{'serial':>8} {serial_time * 1e3:>8.0f}ms {1:>7.1f}x")
+    for name, func in (('threads', threads), ('process', process), ('bound', bound)):
+        elapsed, result = timed(func)
+        assert result == expected
+        print(f"{name:>8} {elapsed * 1e3:>8.0f}ms {serial_time / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
+from . import draws
+from . import archive
+from . import backup
+from . import sqlite_backend
+from . import locking
+from . import frequency_state
 from . import data_input
 from . import analysis
+from . import prediction_context
 from . import prediction
 from . import tagging
 from . import visualization
 from . import config
 
-__all__ = ['data_input', 'analysis', 'prediction', 'tagging', 'visualization', 'config']
+__all__ = ['draws', 'archive', 'backup', 'sqlite_backend', 'locking', 'frequency_state', 'data_input', 'analysis', 'prediction_context', 'prediction', 'tagging', 'visualization', 'config']
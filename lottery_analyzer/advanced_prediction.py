@@ -1,158 +1,162 @@
 import numpy as np
 from collections import defaultdict
 from typing import List, Dict, Tuple, Set
-import random
 
-def calculate_transition_matrix(history_data: List[dict], order: int = 1) -> Dict[tuple, Dict[int, float]]:
+from .draws import COUNT_SIZE, DrawMatrix, as_draw_matrix
+from .prediction_context import PredictionContext, resolve_rng, sample_without_replacement
+
+def _next_number_counts(draws: DrawMatrix, state: tuple, order: int = 1) -> np.ndarray:
+    """统计当前状态(排序后的一期正码)出现后, 第 order 期各号码的出现次数"""
+    counts = np.zeros(COUNT_SIZE, dtype=np.int64)
+    if len(draws) <= order:
+        return counts
+    states = np.sort(draws.numbers[:-order], axis=1)
+    matches = np.all(states == np.asarray(state, dtype=states.dtype), axis=1)
+    if matches.any():
+        counts += np.bincount(draws.numbers[order:][matches].ravel(), minlength=COUNT_SIZE)[:COUNT_SIZE]
+    return counts
+
+def calculate_transition_matrix(history_data: List[dict] | DrawMatrix, order: int = 1) -> Dict[tuple, Dict[int, float]]:
     """计算马尔可夫转移概率矩阵"""
-    transitions = defaultdict(lambda: defaultdict(int))
-    total_counts = defaultdict(int)
+    draws = as_draw_matrix(history_data)
+    probability_matrix = defaultdict(dict)
+    if len(draws) <= order:
+        return probability_matrix
+
+    # 当前状态: 排序后的一期正码; 下一个状态: 第 order 期后的正码
+    states, state_ids = np.unique(np.sort(draws.numbers[:-order], axis=1), axis=0, return_inverse=True)
+    state_ids = state_ids.reshape(-1)
+    next_numbers = draws.numbers[order:].astype(np.int64)
     
-    for i in range(len(history_data) - order):
-        # 获取当前状态和下一个状态
-        current_state = tuple(sorted(history_data[i]['numbers']))
-        next_numbers = history_data[i + order]['numbers']
-        
-        # 计算转移次数
-        for next_num in next_numbers:
-            transitions[current_state][next_num] += 1
-            total_counts[current_state] += 1
+    # 计算转移次数: (状态, 号码) 对一次 bincount 得到
+    keys = state_ids[:, None] * COUNT_SIZE + next_numbers
+    transitions = np.bincount(keys.ravel(), minlength=len(states) * COUNT_SIZE).reshape(len(states), COUNT_SIZE)
+    total_counts = transitions.sum(axis=1)
     
     # 计算概率
-    probability_matrix = defaultdict(dict)
-    for state in transitions:
-        for next_num in transitions[state]:
-            probability_matrix[state][next_num] = transitions[state][next_num] / total_counts[state]
+    for state, row, total in zip(states.tolist(), transitions, total_counts.tolist()):
+        for next_num in np.flatnonzero(row).tolist():
+            probability_matrix[tuple(state)][next_num] = row[next_num] / total
             
     return probability_matrix
 
-def markov_chain_prediction(history_data: List[dict], order: int = 1, num_to_predict: int = 6) -> List[int]:
-    """基于马尔可夫链的预测"""
-    if len(history_data) < order + 1:
-        return random.sample(range(1, 50), num_to_predict)
-        
-    transition_matrix = calculate_transition_matrix(history_data, order)
-    
-    # 获取最近一期作为当前状态
-    current_state = tuple(sorted(history_data[-1]['numbers']))
+def _current_transition_counts(draws: DrawMatrix, order: int = 1) -> np.ndarray:
+    """转移矩阵中最近一期所在状态的一行 (各号码在该状态后第 order 期的出现次数)"""
+    current_state = tuple(sorted(draws.numbers[-1].tolist()))
+    return _next_number_counts(draws, current_state, order)
+
+def transition_weights(context: PredictionContext, order: int = 1) -> np.ndarray:
+    """最近一期状态之后各号码的转移计数 (长度50, 下标即号码; 在上下文中只统计一次)"""
+    return context.derived(('transition_counts', order),
+                           lambda draws: _current_transition_counts(draws, order))
+
+def _random_numbers(rng: np.random.Generator, count: int) -> List[int]:
+    """1-49 中不重复地随机取 count 个号码"""
+    return (rng.choice(49, size=count, replace=False) + 1).tolist()
+
+def markov_chain_prediction(history_data: List[dict] | DrawMatrix, order: int = 1, num_to_predict: int = 6,
+                            context: PredictionContext | None = None,
+                            rng: np.random.Generator | None = None) -> List[int]:
+    """基于马尔可夫链的预测 (给出 context 时转移计数在上下文中只统计一次)"""
+    context = PredictionContext.ensure(history_data, context)
+    rng = resolve_rng(rng)
+    draws = context.draws
+    if len(draws) < order + 1:
+        return _random_numbers(rng, num_to_predict)
     
-    # 根据转移概率选择下一期号码
-    predicted = set()
-    if current_state in transition_matrix:
-        while len(predicted) < num_to_predict:
-            probs = transition_matrix[current_state]
-            if not probs:  # 如果没有转移概率数据
-                remaining = random.choice([n for n in range(1, 50) if n not in predicted])
-            else:
-                # 根据概率选择号码
-                numbers = list(probs.keys())
-                probabilities = list(probs.values())
-                chosen = np.random.choice(numbers, p=probabilities)
-                if chosen not in predicted:
-                    predicted.add(chosen)
+    # 获取最近一期作为当前状态, 只统计该状态的转移
+    counts = transition_weights(context, order)
     
-    # 如果预测数量不足，随机补充
-    while len(predicted) < num_to_predict:
-        num = random.randint(1, 49)
-        if num not in predicted:
-            predicted.add(num)
-            
-    return sorted(list(predicted))
+    # 根据转移概率选择下一期号码; 有转移记录的号码不足时随机补充
+    return sorted(sample_without_replacement(counts, num_to_predict, rng).tolist())
 
-def calculate_conditional_probabilities(history_data: List[dict]) -> Dict[int, float]:
+def calculate_conditional_probabilities(history_data: List[dict] | DrawMatrix,
+                                        context: PredictionContext | None = None) -> Dict[int, float]:
     """计算条件概率"""
-    counts = defaultdict(int)
-    total_draws = len(history_data)
-    
-    for draw in history_data:
-        for num in draw['numbers']:
-            counts[num] += 1
+    context = PredictionContext.ensure(history_data, context)
+    counts = context.frequencies()[0]
+    total_draws = len(context)
             
     # 计算条件概率
     cond_probs = {}
     for num in range(1, 50):
         # 使用拉普拉斯平滑
-        cond_probs[num] = (counts[num] + 1) / (total_draws + 49)
+        cond_probs[num] = (int(counts[num]) + 1) / (total_draws + 49)
         
     return cond_probs
 
-def bayesian_prediction(history_data: List[dict], num_to_predict: int = 6) -> List[int]:
+def bayes_weights(context: PredictionContext) -> np.ndarray:
+    """贝叶斯预测的抽样概率 (长度50, 下标即号码, 1-49 之和为 1)"""
+    def weights(draws):
+        cond_probs = calculate_conditional_probabilities(draws, context)
+        vector = np.zeros(COUNT_SIZE)
+        vector[1:] = [cond_probs[n] for n in range(1, 50)]
+        return vector / vector.sum()
+    return context.derived('bayes_weights', weights)
+
+def bayesian_prediction(history_data: List[dict] | DrawMatrix, num_to_predict: int = 6,
+                        context: PredictionContext | None = None,
+                        rng: np.random.Generator | None = None) -> List[int]:
     """贝叶斯预测"""
-    # 计算条件概率
-    cond_probs = calculate_conditional_probabilities(history_data)
-    
-    # 根据概率选择号码
-    numbers = list(range(1, 50))
-    probabilities = [cond_probs[n] for n in numbers]
-    
-    # 标准化概率
-    probabilities = np.array(probabilities) / sum(probabilities)
-    
-    # 预测号码
-    predicted = set()
-    while len(predicted) < num_to_predict:
-        chosen = np.random.choice(numbers, p=probabilities)
-        if chosen not in predicted:
-            predicted.add(chosen)
-            
-    return sorted(list(predicted))
+    context = PredictionContext.ensure(history_data, context)
+    rng = resolve_rng(rng)
+    # 根据条件概率选择号码
+    return sorted(sample_without_replacement(bayes_weights(context), num_to_predict, rng).tolist())
 
-def time_series_prediction(history_data: List[dict], num_to_predict: int = 6) -> List[int]:
-    """时间序列预测"""
-    if not history_data:
-        return random.sample(range(1, 50), num_to_predict)
-        
+def _trend_scores(draws: DrawMatrix) -> np.ndarray:
+    """最近10期的频率与趋势综合得分 (长度50, 下标即号码)"""
     # 提取最近的趋势
-    recent_draws = history_data[-10:]  # 考虑最近10期
-    frequency = defaultdict(int)
+    recent_draws = draws.window(10)  # 考虑最近10期
     
     # 计算近期频率
-    for draw in recent_draws:
-        for num in draw['numbers']:
-            frequency[num] += 1
+    frequency = recent_draws.regular_counts()
             
-    # 计算趋势得分
-    trend_scores = defaultdict(float)
-    for i, draw in enumerate(recent_draws):
-        weight = (i + 1) / len(recent_draws)  # 更近的数据权重更大
-        for num in draw['numbers']:
-            trend_scores[num] += weight
+    # 计算趋势得分: 更近的数据权重更大
+    numbers = recent_draws.draws.numbers
+    weights = np.arange(1, len(recent_draws) + 1) / len(recent_draws)
+    trend_scores = np.bincount(numbers.ravel(),
+                               weights=np.repeat(weights, numbers.shape[1]),
+                               minlength=COUNT_SIZE)[:COUNT_SIZE]
             
     # 结合频率和趋势
-    final_scores = {}
-    for num in range(1, 50):
-        final_scores[num] = frequency[num] * 0.7 + trend_scores[num] * 0.3
+    return frequency * 0.7 + trend_scores * 0.3
+
+def time_series_prediction(history_data: List[dict] | DrawMatrix, num_to_predict: int = 6,
+                           context: PredictionContext | None = None,
+                           rng: np.random.Generator | None = None) -> List[int]:
+    """时间序列预测 (确定性方法, rng 只用于没有历史数据时的随机兜底)"""
+    context = PredictionContext.ensure(history_data, context)
+    if not context.draws:
+        return _random_numbers(resolve_rng(rng), num_to_predict)
+        
+    final_scores = context.derived('trend_scores', _trend_scores)
         
-    # 选择得分最高的号码
-    sorted_numbers = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-    predicted = [num for num, _ in sorted_numbers[:num_to_predict]]
+    # 选择得分最高的号码 (同分时号码小的优先)
+    nums = np.arange(1, 50)
+    predicted = nums[np.lexsort((nums, -final_scores[1:]))][:num_to_predict].tolist()
     
     return sorted(predicted)
 
-def hybrid_prediction(history_data: List[dict], num_to_predict: int = 6) -> List[int]:
+def hybrid_prediction(history_data: List[dict] | DrawMatrix, num_to_predict: int = 6,
+                      context: PredictionContext | None = None,
+                      rng: np.random.Generator | None = None) -> List[int]:
     """混合预测模型"""
+    context = PredictionContext.ensure(history_data, context)
+    rng = resolve_rng(rng)
+    history_data = context.draws
     # 获取各个模型的预测
-    markov_nums = set(markov_chain_prediction(history_data, num_to_predict=num_to_predict))
-    bayes_nums = set(bayesian_prediction(history_data, num_to_predict=num_to_predict))
-    ts_nums = set(time_series_prediction(history_data, num_to_predict=num_to_predict))
+    markov_nums = set(markov_chain_prediction(history_data, num_to_predict=num_to_predict, context=context, rng=rng))
+    bayes_nums = set(bayesian_prediction(history_data, num_to_predict=num_to_predict, context=context, rng=rng))
+    ts_nums = set(time_series_prediction(history_data, num_to_predict=num_to_predict, context=context, rng=rng))
     
     # 找出在多个模型中都出现的号码
     common_nums = markov_nums.intersection(bayes_nums).intersection(ts_nums)
     
-    # 选择预测号码
+    # 选择预测号码: 公共号码全部保留, 不足时从其余候选号码中随机补充
     predicted = set(common_nums)
-    candidates = markov_nums.union(bayes_nums).union(ts_nums)
-    
-    # 如果公共号码不足，从候选号码中随机选择
-    while len(predicted) < num_to_predict:
-        if candidates:
-            num = random.choice(list(candidates))
-            predicted.add(num)
-            candidates.remove(num)
-        else:
-            # 如果候选号码用完，随机选择
-            num = random.randint(1, 49)
-            if num not in predicted:
-                predicted.add(num)
+    weights = np.zeros(COUNT_SIZE)
+    weights[list(markov_nums.union(bayes_nums).union(ts_nums) - predicted)] = 1
+    if len(predicted) < num_to_predict:
+        predicted.update(sample_without_replacement(weights, num_to_predict - len(predicted), rng).tolist())
                 
     return sorted(list(predicted))
@@ -1,13 +1,49 @@
 import collections
+import itertools
 
-def calculate_frequencies(history_data: list[dict]) -> tuple[collections.defaultdict[int, int], collections.defaultdict[int, int]]:
+import numpy as np
+
+from .draws import COUNT_SIZE, DrawMatrix, HistoryWindow, as_draw_matrix
+
+def _counts_to_defaultdict(counts: np.ndarray) -> collections.defaultdict[int, int]:
+    """Converts a dense count vector (index = number) to a defaultdict of non-zero counts."""
+    freq = collections.defaultdict(int)
+    for num in np.flatnonzero(counts).tolist():
+        freq[num] = int(counts[num])
+    return freq
+
+def frequency_dicts(regular_counts: np.ndarray, special_counts: np.ndarray) -> tuple[collections.defaultdict[int, int], collections.defaultdict[int, int]]:
+    """Converts dense count vectors to the (regular, special) defaultdict shape of calculate_frequencies()."""
+    return _counts_to_defaultdict(regular_counts), _counts_to_defaultdict(special_counts)
+
+def frequency_vectors(history_data: list[dict] | DrawMatrix | HistoryWindow) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Dense regular and special number counts, one np.bincount each.
+
+    Args:
+        history_data: A DrawMatrix, HistoryWindow (its cached counts are reused) or a list of
+                      draw dictionaries (incomplete or out-of-range draws are skipped).
+
+    Returns:
+        A tuple (regular_counts, special_counts) of length-50 int64 vectors; index = number,
+        index 0 is unused.
+    """
+    if isinstance(history_data, HistoryWindow):
+        return history_data.regular_counts(), history_data.special_counts()
+    draws = as_draw_matrix(history_data)
+    return draws.regular_counts(), draws.special_counts()
+
+def calculate_frequencies(history_data: list[dict] | DrawMatrix | HistoryWindow) -> tuple[collections.defaultdict[int, int], collections.defaultdict[int, int]]:
     """
     Calculates the frequency of each regular and special number from lottery history data.
 
     Args:
-        history_data: A list of draw dictionaries, where each dictionary should have
-                      'numbers' (a list of ints) and 'special' (an int) keys.
+        history_data: A DrawMatrix, or a list of draw dictionaries where each dictionary
+                      should have 'numbers' (a list of ints) and 'special' (an int) keys.
                       Example: [{'date': '2023-01-01', 'numbers': [1,2,3,4,5,6], 'special': 7}, ...]
+                      A DrawMatrix, a HistoryWindow, or a list whose draws are all valid is
+                      counted with frequency_vectors(); only lists containing malformed draws
+                      take the lenient per-number loop below.
 
     Returns:
         A tuple containing two defaultdicts:
@@ -21,6 +57,14 @@ def calculate_frequencies(history_data: list[dict]) -> tuple[collections.default
         print("Warning: History data is empty. Returning empty frequency counts.")
         return regular_num_freq, special_num_freq
 
+    if not isinstance(history_data, (DrawMatrix, HistoryWindow)):
+        draws = DrawMatrix.from_dicts(history_data)
+        if len(draws) == len(history_data):
+            history_data = draws  # every draw is valid: same counts as the loop below
+    if isinstance(history_data, (DrawMatrix, HistoryWindow)):
+        regular, special = frequency_vectors(history_data)
+        return _counts_to_defaultdict(regular), _counts_to_defaultdict(special)
+
     for draw in history_data:
         if not isinstance(draw, dict):
             print(f"Warning: Skipping invalid draw entry (not a dict): {draw}")
@@ -93,6 +137,415 @@ def get_least_frequent(frequencies: collections.defaultdict[int, int] | dict[int
     return sorted_items[:count]
 
 
+# ----------------------------------------------------------------------
+# Batched top-k over count vectors
+#
+# Counts for many windows form a W×50 matrix (CountTable.recent_counts), so the
+# hot and cold numbers of every window come from one argpartition instead of a
+# Counter or a full sort per window.
+# ----------------------------------------------------------------------
+
+def top_k_numbers(counts: np.ndarray, k: int, largest: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The k most (or least) frequent numbers of each row of a count matrix.
+
+    Ties are broken by the smaller number, so results are deterministic. All
+    numbers 1-49 take part, including those that never appeared (count 0).
+
+    Args:
+        counts: A length-50 count vector or a W×50 matrix (index = number, column 0 unused).
+        k: How many numbers to return per row (clipped to 49).
+        largest: True for the most frequent numbers, False for the least frequent.
+
+    Returns:
+        A tuple (numbers, values), each of shape (W, k) (or (k,) for a vector input),
+        ordered from most to least frequent (or least to most when largest is False).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    matrix = np.atleast_2d(counts)[:, 1:]
+    k = max(0, min(int(k), matrix.shape[1]))
+    numbers = np.arange(1, matrix.shape[1] + 1)
+    # One unique sort key per number: the count, then the number as tie-breaker
+    if largest:
+        keys = -(matrix * COUNT_SIZE + (COUNT_SIZE - numbers))
+    else:
+        keys = matrix * COUNT_SIZE + numbers
+    if 0 < k < matrix.shape[1]:
+        candidates = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(matrix.shape[1]), matrix.shape)[:, :k]
+    order = np.take_along_axis(candidates, np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1), axis=1)
+    picked_numbers = order + 1
+    picked_counts = np.take_along_axis(matrix, order, axis=1)
+    if counts.ndim == 1:
+        return picked_numbers[0], picked_counts[0]
+    return picked_numbers, picked_counts
+
+def hot_cold_table(history_data: list[dict] | DrawMatrix, periods=(10, 30, 100, 500), k: int = 5,
+                   number_type: str = 'regular') -> list[dict]:
+    """
+    Hot and cold numbers over several recent windows in one call.
+
+    The window counts are read from the draws' prefix-sum count table (built on
+    first use), then ranked with a single batched top_k_numbers per direction.
+
+    Args:
+        history_data: A DrawMatrix or a list of draw dictionaries.
+        periods: Window sizes in draws; windows longer than the history cover all of it.
+        k: Hot and cold numbers per window.
+        number_type: 'regular' or 'special'.
+
+    Returns:
+        One dict per window: {'periods': p, 'draws': draws covered,
+        'hot': [(number, count), ...], 'cold': [(number, count), ...]}.
+    """
+    draws = as_draw_matrix(history_data)
+    periods = [int(p) for p in periods]
+    counts = draws.count_table().recent_counts(periods, number_type)
+    hot_numbers, hot_counts = top_k_numbers(counts, k)
+    cold_numbers, cold_counts = top_k_numbers(counts, k, largest=False)
+    return [
+        {'periods': p, 'draws': min(max(p, 0), len(draws)),
+         'hot': list(zip(hot_numbers[i].tolist(), hot_counts[i].tolist())),
+         'cold': list(zip(cold_numbers[i].tolist(), cold_counts[i].tolist()))}
+        for i, p in enumerate(periods)
+    ]
+
+
+# ----------------------------------------------------------------------
+# Bitmask overlap statistics
+#
+# Every draw's regular numbers are a uint64 bitmask (DrawMatrix.masks), so
+# comparing a ticket with the whole history is one AND plus one popcount per
+# draw instead of a set intersection.
+# ----------------------------------------------------------------------
+
+def match_counts(history_data: list[dict] | DrawMatrix, ticket) -> np.ndarray:
+    """
+    Number of regular numbers each past draw shares with a ticket.
+
+    Args:
+        history_data: DrawMatrix or list of draw dictionaries.
+        ticket: A list of numbers or a bitmask from draws.numbers_to_mask().
+
+    Returns:
+        A uint8 array with one entry per draw (0-6).
+    """
+    return as_draw_matrix(history_data).overlap_counts(ticket)
+
+def repeat_counts(history_data: list[dict] | DrawMatrix) -> np.ndarray:
+    """Number of regular numbers each draw repeats from the draw before it (0 for the first draw)."""
+    return as_draw_matrix(history_data).repeat_counts()
+
+def count_draws_sharing(history_data: list[dict] | DrawMatrix, ticket, k: int) -> int:
+    """Number of past draws that share at least k regular numbers with a ticket."""
+    return as_draw_matrix(history_data).count_sharing(ticket, k)
+
+
+# ----------------------------------------------------------------------
+# Streaming accumulators
+#
+# Each accumulator consumes DrawMatrix blocks in file order (for example from
+# data_input.iter_history) and keeps only fixed-size state, so archives of any
+# length can be analysed with bounded memory.
+# ----------------------------------------------------------------------
+
+class FrequencyAccumulator:
+    """Running regular/special number counts."""
+
+    def __init__(self):
+        self.regular = np.zeros(COUNT_SIZE, dtype=np.int64)
+        self.special = np.zeros(COUNT_SIZE, dtype=np.int64)
+        self.total_draws = 0
+
+    def update(self, block: list[dict] | DrawMatrix) -> None:
+        block = as_draw_matrix(block)
+        self.regular += block.regular_counts()
+        self.special += block.special_counts()
+        self.total_draws += len(block)
+
+    def result(self) -> tuple[collections.defaultdict[int, int], collections.defaultdict[int, int]]:
+        """Frequencies in the same format as calculate_frequencies()."""
+        return _counts_to_defaultdict(self.regular), _counts_to_defaultdict(self.special)
+
+
+class GapAccumulator:
+    """
+    Running gap (遗漏, draws between appearances) statistics per number.
+
+    Gaps are counted in draws: a number drawn at rows 2 and 5 has a gap of 2.
+    For max_gaps() the stretch before a number's first appearance and the
+    current open stretch count as gaps as well. The mean, histogram and
+    percentiles describe closed gaps only, i.e. those between two appearances.
+
+    All per-number results are length-50 vectors (index = number, index 0 unused).
+
+    Args:
+        number_type: 'regular' to track the six regular numbers, 'special' for the special number.
+    """
+
+    def __init__(self, number_type: str = 'regular'):
+        if number_type not in ('regular', 'special'):
+            raise ValueError(f"Unknown number_type: {number_type}")
+        self.number_type = number_type
+        self.last_seen = np.full(COUNT_SIZE, -1, dtype=np.int64)
+        self.max_gap = np.zeros(COUNT_SIZE, dtype=np.int64)
+        self.gap_sum = np.zeros(COUNT_SIZE, dtype=np.int64)
+        self.gap_count = np.zeros(COUNT_SIZE, dtype=np.int64)
+        self.histogram = np.zeros((COUNT_SIZE, 1), dtype=np.int64)
+        self.total_draws = 0
+
+    def _occurrences(self, block: DrawMatrix) -> tuple[np.ndarray, np.ndarray]:
+        """(global row, number) of every appearance, sorted by number then row."""
+        if self.number_type == 'special':
+            rows = np.arange(len(block), dtype=np.int64)
+            nums = block.special.astype(np.int64)
+        else:
+            rows = np.repeat(np.arange(len(block), dtype=np.int64), block.numbers.shape[1])
+            nums = block.numbers.ravel().astype(np.int64)
+        order = np.lexsort((rows, nums))
+        return rows[order] + self.total_draws, nums[order]
+
+    def update(self, block: list[dict] | DrawMatrix) -> None:
+        block = as_draw_matrix(block)
+        if not len(block):
+            return
+        rows, nums = self._occurrences(block)
+        first = np.ones(len(nums), dtype=bool)
+        first[1:] = nums[1:] != nums[:-1]
+        previous = np.empty_like(rows)
+        previous[1:] = rows[:-1]
+        previous[first] = self.last_seen[nums[first]]
+        gaps = rows - previous - 1
+        np.maximum.at(self.max_gap, nums, gaps)
+        np.maximum.at(self.last_seen, nums, rows)
+        closed = previous >= 0
+        self._record_closed_gaps(nums[closed], gaps[closed])
+        self.total_draws += len(block)
+
+    def _record_closed_gaps(self, nums: np.ndarray, gaps: np.ndarray) -> None:
+        if not len(gaps):
+            return
+        width = max(self.histogram.shape[1], int(gaps.max()) + 1)
+        if width > self.histogram.shape[1]:
+            self.histogram = np.pad(self.histogram, ((0, 0), (0, width - self.histogram.shape[1])))
+        self.histogram += np.bincount(nums * width + gaps, minlength=COUNT_SIZE * width).reshape(COUNT_SIZE, width)
+        self.gap_sum += np.bincount(nums, weights=gaps, minlength=COUNT_SIZE).astype(np.int64)
+        self.gap_count += np.bincount(nums, minlength=COUNT_SIZE)
+
+    def current_gaps(self) -> np.ndarray:
+        """Draws since each number last appeared (index = number, index 0 unused)."""
+        return self.total_draws - 1 - self.last_seen
+
+    def max_gaps(self) -> np.ndarray:
+        """Longest gap seen so far for each number, including the current one."""
+        return np.maximum(self.max_gap, self.current_gaps())
+
+    def mean_gaps(self) -> np.ndarray:
+        """Average closed gap per number (NaN for numbers with fewer than two appearances)."""
+        means = np.full(COUNT_SIZE, np.nan)
+        np.divide(self.gap_sum, self.gap_count, out=means, where=self.gap_count > 0)
+        return means
+
+    def gap_percentiles(self, q: float) -> np.ndarray:
+        """
+        The q-th percentile (0-100) of each number's closed gaps.
+
+        Uses the inverted empirical CDF, so results are actual gap lengths.
+        NaN for numbers without closed gaps.
+        """
+        if not 0 <= q <= 100:
+            raise ValueError(f"Percentile must be between 0 and 100: {q}")
+        cdf = np.cumsum(self.histogram, axis=1)
+        target = np.maximum(1, np.ceil(q / 100 * self.gap_count))
+        result = np.argmax(cdf >= target[:, None], axis=1).astype(float)
+        result[self.gap_count == 0] = np.nan
+        return result
+
+    def current_gap_percentiles(self) -> np.ndarray:
+        """
+        Percentage of each number's closed gaps that are shorter than its current gap.
+
+        A value near 100 means the number is more overdue than almost ever before.
+        NaN for numbers without closed gaps or that have never appeared.
+        """
+        cdf = np.cumsum(self.histogram, axis=1)
+        current = self.current_gaps()
+        shorter = np.where(current > 0,
+                           cdf[np.arange(COUNT_SIZE), np.clip(current - 1, 0, cdf.shape[1] - 1)], 0)
+        result = np.full(COUNT_SIZE, np.nan)
+        valid = (self.gap_count > 0) & (self.last_seen >= 0)
+        result[valid] = shorter[valid] / self.gap_count[valid] * 100
+        return result
+
+
+def gap_statistics(history_data: list[dict] | DrawMatrix, number_type: str = 'regular') -> GapAccumulator:
+    """
+    Gap statistics for the whole history in one vectorized pass.
+
+    Feed later draws to the returned accumulator's update() to keep it current.
+    """
+    gaps = GapAccumulator(number_type)
+    gaps.update(history_data)
+    return gaps
+
+
+# Rows per float32 matrix product: keeps every partial count below 2**24, where float32 is exact
+GRAM_CHUNK = 1 << 16
+
+# The 20 ways to pick three of the six regular numbers
+_TRIPLE_COLUMNS = np.array(list(itertools.combinations(range(6), 3)))
+
+
+def _gram(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    leftᵀ @ right for N×50 one-hot matrices, as exact int64 counts.
+
+    Integer matmul has no BLAS path and is orders of magnitude slower, so the
+    product is taken in float32 chunks small enough to stay exact.
+    """
+    result = np.zeros((left.shape[1], right.shape[1]), dtype=np.int64)
+    for start in range(0, len(left), GRAM_CHUNK):
+        a = left[start:start + GRAM_CHUNK].astype(np.float32)
+        b = right[start:start + GRAM_CHUNK].astype(np.float32)
+        result += (a.T @ b).astype(np.int64)
+    return result
+
+
+def _top_entries(values: np.ndarray, count: int) -> np.ndarray:
+    """Indices of the `count` largest positive values, ties broken by the smaller index."""
+    if count <= 0:
+        return np.empty(0, dtype=np.intp)
+    order = np.lexsort((np.arange(len(values)), -values))[:count]
+    return order[values[order] > 0]
+
+
+class PairAccumulator:
+    """Running co-occurrence counts of regular number pairs (a 50x50 matrix)."""
+
+    def __init__(self):
+        self.counts = np.zeros((COUNT_SIZE, COUNT_SIZE), dtype=np.int64)
+        self.total_draws = 0
+
+    def update(self, block: list[dict] | DrawMatrix) -> None:
+        block = as_draw_matrix(block)
+        hot = block.onehot()
+        self.counts += _gram(hot, hot)
+        self.total_draws += len(block)
+
+    def top_pairs(self, count: int = 10) -> list[tuple[tuple[int, int], int]]:
+        """
+        Most frequent pairs as ((a, b), times) with a < b.
+
+        Ties are broken by the smaller pair first.
+        """
+        first, second = np.triu_indices(COUNT_SIZE, k=1)
+        values = self.counts[first, second]
+        return [((int(first[i]), int(second[i])), int(values[i])) for i in _top_entries(values, count)]
+
+    def partners(self, number: int, count: int = 5) -> list[tuple[int, int]]:
+        """The numbers drawn most often together with `number`, as (partner, times)."""
+        values = self.counts[number].copy()
+        values[number] = 0
+        return [(int(n), int(values[n])) for n in _top_entries(values, count)]
+
+
+class CooccurrenceAccumulator(PairAccumulator):
+    """
+    Pair, triple and special-vs-regular co-occurrence counts.
+
+    - counts: 50x50 regular pair matrix XᵀX over the one-hot draw matrix X
+      (the diagonal holds each number's own count).
+    - special_cross: 50x50 matrix SᵀX, [s, n] = draws with special s and regular n.
+    - triple_keys / triple_counts: sparse counter of regular triples a < b < c,
+      keyed by a * 2500 + b * 50 + c and sorted by key. Only triples that occurred are stored.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.special_cross = np.zeros((COUNT_SIZE, COUNT_SIZE), dtype=np.int64)
+        self.triple_keys = np.empty(0, dtype=np.int64)
+        self.triple_counts = np.empty(0, dtype=np.int64)
+
+    def update(self, block: list[dict] | DrawMatrix) -> None:
+        block = as_draw_matrix(block)
+        hot = block.onehot()
+        self.counts += _gram(hot, hot)
+        special = np.zeros((len(block), COUNT_SIZE), dtype=bool)
+        special[np.arange(len(block)), block.special] = True
+        self.special_cross += _gram(special, hot)
+        self._add_triples(block)
+        self.total_draws += len(block)
+
+    def _add_triples(self, block: DrawMatrix) -> None:
+        if not len(block):
+            return
+        numbers = np.sort(block.numbers, axis=1).astype(np.int64)
+        picked = numbers[:, _TRIPLE_COLUMNS]  # N×20×3
+        keys = (picked[..., 0] * COUNT_SIZE + picked[..., 1]) * COUNT_SIZE + picked[..., 2]
+        # Dense bincount over the 50**3 key space is cheaper than sorting N×20 keys
+        dense = np.bincount(keys.ravel(), minlength=COUNT_SIZE ** 3)
+        keys = np.flatnonzero(dense)
+        counts = dense[keys]
+        if len(self.triple_keys):
+            keys, inverse = np.unique(np.concatenate([self.triple_keys, keys]), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate([self.triple_counts, counts])).astype(np.int64)
+        self.triple_keys, self.triple_counts = keys.astype(np.int64), counts
+
+    def triple_count(self, a: int, b: int, c: int) -> int:
+        """How many draws contained all three regular numbers."""
+        a, b, c = sorted((a, b, c))
+        key = (a * COUNT_SIZE + b) * COUNT_SIZE + c
+        i = np.searchsorted(self.triple_keys, key)
+        return int(self.triple_counts[i]) if i < len(self.triple_keys) and self.triple_keys[i] == key else 0
+
+    def top_triples(self, count: int = 10) -> list[tuple[tuple[int, int, int], int]]:
+        """Most frequent triples as ((a, b, c), times) with a < b < c; ties by the smaller triple."""
+        result = []
+        for i in _top_entries(self.triple_counts, count):
+            key = int(self.triple_keys[i])
+            triple = (key // COUNT_SIZE ** 2, key // COUNT_SIZE % COUNT_SIZE, key % COUNT_SIZE)
+            result.append((triple, int(self.triple_counts[i])))
+        return result
+
+    def special_partners(self, special: int, count: int = 5) -> list[tuple[int, int]]:
+        """The regular numbers drawn most often alongside special number `special`, as (number, times)."""
+        return [(int(n), int(self.special_cross[special, n]))
+                for n in _top_entries(self.special_cross[special], count)]
+
+
+def cooccurrence(history_data: list[dict] | DrawMatrix | HistoryWindow) -> CooccurrenceAccumulator:
+    """
+    Pair, triple and special-vs-regular co-occurrence counts for a history.
+
+    For a HistoryWindow the result is cached on the window, so repeated queries
+    over the same window (e.g. repository.draws.window(100)) are computed once.
+    The returned object is shared in that case and must be treated as read-only.
+    """
+    if isinstance(history_data, HistoryWindow):
+        return history_data.derived('cooccurrence', cooccurrence)
+    result = CooccurrenceAccumulator()
+    result.update(history_data)
+    return result
+
+
+def accumulate(blocks, *accumulators):
+    """
+    Feeds every block of a stream to each accumulator.
+
+    Args:
+        blocks: An iterable of DrawMatrix blocks (e.g. data_input.iter_history(path)).
+        *accumulators: Objects with an update(block) method.
+
+    Returns:
+        The accumulators, for chaining.
+    """
+    for block in blocks:
+        for accumulator in accumulators:
+            accumulator.update(block)
+    return accumulators
+
+
 if __name__ == '__main__':
     print("--- Testing analysis functions ---")
 
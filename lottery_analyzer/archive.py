@@ -0,0 +1,242 @@
+"""按年份分区的压缩历史档案
+
+data/history/ 目录下每个年份一个压缩文件 (<YYYY>.npz, 年份取期号的前四位),
+另有 manifest.json 记录各分区的期号范围、行数和内容哈希:
+
+    {
+        "version": 1,
+        "source": {"size": ..., "mtime_ns": ...},
+        "partitions": [
+            {"year": "2025", "file": "2025.npz", "min_id": 2025001,
+             "max_id": 2025184, "rows": 184, "sha256": "..."},
+            ...
+        ]
+    }
+
+分区按年份在数据中首次出现的顺序排列, 各分区内保持原有行顺序。
+按期号范围读取时只打开范围内的分区; 同步时只重写内容发生变化的分区,
+因此追加新一期只会重写当年的分区。写入方知道哪些期号变化时 (追加、删除、导入)
+只处理这些年份的分区, 其余分区既不读取也不重新计算哈希。
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .draws import DrawMatrix, normalize_draw_id
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def partition_years(draw_ids: np.ndarray) -> np.ndarray:
+    """期号 -> 分区年份 (期号前四位, 不足五位的期号归入 0 年)"""
+    years = np.asarray(draw_ids, dtype=np.int64).copy()
+    years[years < 10000] = 0
+    while (years >= 10000).any():
+        years = np.where(years >= 10000, years // 10, years)
+    return years
+
+
+def select_range(draws: DrawMatrix, start_id=None, end_id=None) -> DrawMatrix:
+    """筛选期号在 [start_id, end_id] 内的记录 (任一端为 None 表示不限)"""
+    mask = np.ones(len(draws), dtype=bool)
+    if start_id is not None:
+        mask &= draws.draw_ids >= normalize_draw_id(start_id)
+    if end_id is not None:
+        mask &= draws.draw_ids <= normalize_draw_id(end_id)
+    return draws if mask.all() else draws[mask]
+
+
+def _content_digest(draws: DrawMatrix) -> str:
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(draws.draw_ids).tobytes())
+    digest.update(np.ascontiguousarray(draws.numbers).tobytes())
+    digest.update(np.ascontiguousarray(draws.special).tobytes())
+    digest.update('\n'.join(draws.dates.tolist()).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class HistoryArchive:
+    """年份分区档案 (位于 directory 目录下)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+
+    # ------------------------------------------------------------------
+    # 清单
+    # ------------------------------------------------------------------
+    def manifest(self) -> Optional[Dict]:
+        """读取清单, 不存在或版本不符时返回 None"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def partitions(self) -> List[Dict]:
+        manifest = self.manifest()
+        return manifest['partitions'] if manifest else []
+
+    def is_current(self, source: Dict) -> bool:
+        """档案是否与给定的数据文件指纹一致"""
+        manifest = self.manifest()
+        return manifest is not None and manifest.get('source') == source
+
+    def _write_manifest(self, partitions: List[Dict], source: Optional[Dict]) -> None:
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'source': source, 'partitions': partitions},
+                      f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    # ------------------------------------------------------------------
+    # 分区读写
+    # ------------------------------------------------------------------
+    def _partition_path(self, entry: Dict) -> str:
+        return os.path.join(self.directory, entry['file'])
+
+    def _read_partition(self, entry: Dict) -> DrawMatrix:
+        with np.load(self._partition_path(entry)) as data:
+            return DrawMatrix(data['numbers'], data['special'], data['draw_ids'], data['dates'])
+
+    def _write_partition(self, year: str, draws: DrawMatrix) -> Dict:
+        """写入单个年份分区 (临时文件 + 原子替换), 返回清单条目"""
+        entry = {
+            'year': year,
+            'file': f"{year}.npz",
+            'min_id': int(draws.draw_ids.min()),
+            'max_id': int(draws.draw_ids.max()),
+            'rows': len(draws),
+            'sha256': _content_digest(draws),
+        }
+        path = self._partition_path(entry)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, numbers=draws.numbers, special=draws.special,
+                                    draw_ids=draws.draw_ids, dates=draws.dates)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return entry
+
+    @staticmethod
+    def _split_by_year(draws: DrawMatrix) -> List[tuple]:
+        """按年份拆分, 返回 [(年份, DrawMatrix)], 年份按首次出现的顺序排列"""
+        if not len(draws):
+            return []
+        years = partition_years(draws.draw_ids)
+        unique, first = np.unique(years, return_index=True)
+        return [(f"{int(year):04d}", draws[np.flatnonzero(years == year)])
+                for year in unique[np.argsort(first)]]
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+    def load(self, start_id=None, end_id=None) -> DrawMatrix:
+        """读取期号在 [start_id, end_id] 内的记录, 只打开范围内的分区"""
+        low = normalize_draw_id(start_id) if start_id is not None else None
+        high = normalize_draw_id(end_id) if end_id is not None else None
+        blocks = []
+        for entry in self.partitions():
+            if low is not None and entry['max_id'] < low:
+                continue
+            if high is not None and entry['min_id'] > high:
+                continue
+            blocks.append(select_range(self._read_partition(entry), start_id, end_id))
+        return DrawMatrix.concatenate(blocks)
+
+    def sync(self, draws: DrawMatrix, source: Optional[Dict] = None) -> List[str]:
+        """使档案与 draws 一致, 只重写内容变化的分区
+
+        Returns:
+            List[str]: 被重写的年份
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        existing = {entry['year']: entry for entry in self.partitions()}
+        partitions, rewritten = [], []
+        for year, block in self._split_by_year(draws):
+            entry = existing.pop(year, None)
+            if (entry is None or entry['sha256'] != _content_digest(block)
+                    or not os.path.exists(self._partition_path(entry))):
+                entry = self._write_partition(year, block)
+                rewritten.append(year)
+            partitions.append(entry)
+        self._write_manifest(partitions, source)
+
+        # 删除已不存在的年份分区
+        for entry in existing.values():
+            path = self._partition_path(entry)
+            if os.path.exists(path):
+                os.remove(path)
+        return rewritten
+
+    def append(self, draws: DrawMatrix, source: Optional[Dict] = None) -> List[str]:
+        """在各年份分区末尾追加记录, 只重写涉及的年份
+
+        Returns:
+            List[str]: 被重写的年份
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        partitions = self.partitions()
+        positions = {entry['year']: i for i, entry in enumerate(partitions)}
+        rewritten = []
+        for year, block in self._split_by_year(draws):
+            if year in positions:
+                i = positions[year]
+                block = self._read_partition(partitions[i]).concat(block)
+                partitions[i] = self._write_partition(year, block)
+            else:
+                positions[year] = len(partitions)
+                partitions.append(self._write_partition(year, block))
+            rewritten.append(year)
+        self._write_manifest(partitions, source)
+        return rewritten
+
+    def sync_years(self, draws: DrawMatrix, years, source: Optional[Dict] = None) -> List[str]:
+        """只重写 years 中的年份分区, 其余分区不读取、不比较
+
+        用于调用方确定只有这些年份的记录发生变化 (如删除或导入若干期) 的情况,
+        draws 为变化后的全部数据。年份中已没有记录的分区被删除。
+
+        Returns:
+            List[str]: 被重写或删除的年份
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        years = {f"{int(year):04d}" for year in years}
+        draw_years = partition_years(draws.draw_ids)
+        wanted = np.isin(draw_years, [int(year) for year in years])
+        blocks = dict(self._split_by_year(draws[np.flatnonzero(wanted)]))
+
+        partitions, rewritten = [], []
+        for entry in self.partitions():
+            year = entry['year']
+            if year not in years:
+                partitions.append(entry)
+                continue
+            rewritten.append(year)
+            if year in blocks:
+                partitions.append(self._write_partition(year, blocks.pop(year)))
+            elif os.path.exists(self._partition_path(entry)):
+                os.remove(self._partition_path(entry))
+        for year, block in blocks.items():
+            partitions.append(self._write_partition(year, block))
+            rewritten.append(year)
+        self._write_manifest(partitions, source)
+        return rewritten
+
+    def clear(self, source: Optional[Dict] = None) -> None:
+        """清空档案"""
+        self.sync(DrawMatrix.empty(), source)
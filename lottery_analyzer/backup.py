@@ -0,0 +1,221 @@
+"""内容寻址的历史数据备份
+
+备份目录结构:
+    backup/
+        blobs/<sha256>.csv.gz   按内容哈希命名的压缩快照 (相同内容只存一份)
+        manifest.json           快照清单
+
+    manifest.json:
+    {
+        "version": 1,
+        "snapshots": [
+            {"id": "20250704_144956", "created": "2025-07-04T14:49:56",
+             "sha256": "...", "size": 12345, "source": {"size": ..., "mtime_ns": ...}},
+            ...
+        ]
+    }
+
+数据未变化时 (文件大小和修改时间与最近一次快照相同, 或内容哈希相同) 不产生新快照,
+备份几乎没有开销。保留策略: 最近 N 个快照, 加上最近若干天每天、若干月每月的最后一个快照;
+不再被任何快照引用的数据块会被删除。
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+BLOB_DIR_NAME = "blobs"
+BLOB_SUFFIX = ".csv.gz"
+
+
+def _file_sha256(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_fingerprint(filepath: str) -> Dict:
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class BackupStore:
+    """位于 directory 目录下的快照仓库"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, BLOB_DIR_NAME)
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+
+    # ------------------------------------------------------------------
+    # 清单
+    # ------------------------------------------------------------------
+    def snapshots(self) -> List[Dict]:
+        """全部快照, 按创建时间从旧到新排列"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if manifest.get('version') != MANIFEST_VERSION:
+            return []
+        return manifest.get('snapshots', [])
+
+    def _write_manifest(self, snapshots: List[Dict]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'snapshots': snapshots},
+                      f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256 + BLOB_SUFFIX)
+
+    def find(self, snapshot_id: Optional[str] = None) -> Optional[Dict]:
+        """按ID查找快照, snapshot_id 为 None 时返回最新的快照"""
+        snapshots = self.snapshots()
+        if snapshot_id is None:
+            return snapshots[-1] if snapshots else None
+        for snapshot in snapshots:
+            if snapshot['id'] == snapshot_id:
+                return snapshot
+        return None
+
+    # ------------------------------------------------------------------
+    # 备份与恢复
+    # ------------------------------------------------------------------
+    def snapshot(self, filepath: str, now: Optional[datetime] = None) -> Optional[Dict]:
+        """为 filepath 创建快照
+
+        内容与最近一次快照相同时直接返回该快照, 不写任何文件。
+
+        Returns:
+            Optional[Dict]: 快照条目, 文件不存在时返回 None
+        """
+        if not os.path.exists(filepath):
+            return None
+        snapshots = self.snapshots()
+        latest = snapshots[-1] if snapshots else None
+        source = _source_fingerprint(filepath)
+        if latest and latest.get('source') == source and os.path.exists(self._blob_path(latest['sha256'])):
+            return latest
+
+        sha256 = _file_sha256(filepath)
+        if latest and latest['sha256'] == sha256 and os.path.exists(self._blob_path(sha256)):
+            return latest
+
+        blob_path = self._blob_path(sha256)
+        if not os.path.exists(blob_path):
+            os.makedirs(self.blob_dir, exist_ok=True)
+            tmp_path = f"{blob_path}.{os.getpid()}.tmp"
+            try:
+                with open(filepath, 'rb') as src, open(tmp_path, 'wb') as raw:
+                    with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as dst:
+                        shutil.copyfileobj(src, dst)
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                os.replace(tmp_path, blob_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        now = now or datetime.now()
+        snapshot_id = now.strftime('%Y%m%d_%H%M%S')
+        existing_ids = {s['id'] for s in snapshots}
+        suffix = 1
+        while snapshot_id in existing_ids:
+            suffix += 1
+            snapshot_id = f"{now.strftime('%Y%m%d_%H%M%S')}_{suffix}"
+
+        entry = {
+            'id': snapshot_id,
+            'created': now.isoformat(timespec='seconds'),
+            'sha256': sha256,
+            'size': source['size'],
+            'source': source,
+        }
+        self._write_manifest(snapshots + [entry])
+        return entry
+
+    def restore(self, target: str, snapshot_id: Optional[str] = None) -> Dict:
+        """将快照原子地恢复到 target (默认最新快照)
+
+        Raises:
+            ValueError: 快照不存在
+            IOError: 数据块缺失或内容校验失败
+        """
+        snapshot = self.find(snapshot_id)
+        if snapshot is None:
+            raise ValueError(f"快照不存在: {snapshot_id}")
+        blob_path = self._blob_path(snapshot['sha256'])
+        if not os.path.exists(blob_path):
+            raise IOError(f"快照数据缺失: {blob_path}")
+
+        directory = os.path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            digest = hashlib.sha256()
+            with gzip.open(blob_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(1 << 20), b''):
+                    digest.update(chunk)
+                    dst.write(chunk)
+                dst.flush()
+                os.fsync(dst.fileno())
+            if digest.hexdigest() != snapshot['sha256']:
+                raise IOError(f"快照内容校验失败: {snapshot['id']}")
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # 保留策略
+    # ------------------------------------------------------------------
+    def apply_retention(self, keep_last: int, keep_daily: int, keep_monthly: int) -> List[Dict]:
+        """按保留策略删除旧快照及不再引用的数据块
+
+        保留最近 keep_last 个快照, 以及最近 keep_daily 天、keep_monthly 个月中
+        每天/每月的最后一个快照。
+
+        Returns:
+            List[Dict]: 被删除的快照
+        """
+        snapshots = self.snapshots()
+        keep = set(range(max(0, len(snapshots) - keep_last), len(snapshots)))
+        for key_length, limit in ((10, keep_daily), (7, keep_monthly)):
+            seen = []
+            for i in range(len(snapshots) - 1, -1, -1):
+                period = snapshots[i]['created'][:key_length]
+                if period in seen:
+                    continue
+                if len(seen) >= limit:
+                    break
+                seen.append(period)
+                keep.add(i)
+
+        kept = [s for i, s in enumerate(snapshots) if i in keep]
+        removed = [s for i, s in enumerate(snapshots) if i not in keep]
+        if removed:
+            self._write_manifest(kept)
+            self._collect_garbage({s['sha256'] for s in kept})
+        return removed
+
+    def _collect_garbage(self, referenced: set) -> None:
+        if not os.path.isdir(self.blob_dir):
+            return
+        for name in os.listdir(self.blob_dir):
+            if name.endswith(BLOB_SUFFIX) and name[:-len(BLOB_SUFFIX)] not in referenced:
+                os.remove(os.path.join(self.blob_dir, name))
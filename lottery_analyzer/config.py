@@ -4,8 +4,25 @@ import os
 DATA_DIR = "data"
 DATA_FILE_PATH = os.path.join(DATA_DIR, "history.csv")
 
+# 存储后端: "csv" (data/history.csv) 或 "sqlite" (WAL模式的SQLite数据库)
+STORAGE_BACKEND = "csv"
+# SQLite 数据库路径, None 表示 data/history.db; 首次使用时自动导入 history.csv
+SQLITE_PATH = None
+
 # 数字范围配置
 MIN_NUMBER = 1
 MAX_NUMBER = 49
 NUM_REGULAR = 6
 NUM_SPECIAL = 1
+
+# 备份保留策略: 最近N个快照 + 最近N天每天一个 + 最近N个月每月一个
+BACKUP_KEEP_LAST = 10
+BACKUP_KEEP_DAILY = 7
+BACKUP_KEEP_MONTHLY = 12
+
+# 写入系统数据时等待跨进程文件锁的最长秒数 (None 表示一直等待)
+LOCK_TIMEOUT = 60
+
+# 综合预测并行计算的线程数 (None 表示串行计算: 各组共享特征后单个方法节点很小,
+# 线程池相对串行没有收益, 见 benchmarks/bench_prediction.py)
+PREDICTION_WORKERS = None
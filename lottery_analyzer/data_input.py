@@ -1,13 +1,33 @@
 import csv
+import hashlib
+import io
+import itertools
+import json
 import os
-import shutil
-from typing import List, Dict
-from datetime import datetime
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from . import analysis
+from . import tagging
+from . import config
+from .archive import HistoryArchive, partition_years, select_range
+from .backup import BackupStore
+from .frequency_state import FrequencyState
+from .locking import GenerationCounter, get_lock
+from .sqlite_backend import SQLiteHistoryStore, get_store
+from .config import MIN_NUMBER, MAX_NUMBER
+from .draws import DrawMatrix, combination_key, is_valid_draw, normalize_draw_id
 
 # 系统数据目录设置
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 BACKUP_DIR = os.path.join(DATA_DIR, "backup")
 SYSTEM_FILE = os.path.join(DATA_DIR, "history.csv")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "history")  # 按年份分区的压缩档案
 
 # 确保目录存在
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -16,130 +36,1323 @@ os.makedirs(BACKUP_DIR, exist_ok=True)
 # 修改CSV文件头
 CSV_HEADER = ['date', 'n1', 'n2', 'n3', 'n4', 'n5', 'n6', 'special_number']
 
-def _validate_draw_data(draw: dict, previous_draws: list) -> bool:
+# 二进制缓存(旁路文件)后缀: history.csv -> history.csv.npy / history.csv.meta.json
+SIDECAR_SUFFIX = ".npy"
+SIDECAR_META_SUFFIX = ".meta.json"
+
+# 流式读取时每块的默认行数
+DEFAULT_CHUNK_SIZE = 65536
+
+# 跨进程写锁与写入计数: history.csv -> history.csv.lock / history.csv.generation
+LOCK_SUFFIX = ".lock"
+GENERATION_SUFFIX = ".generation"
+
+# 增量维护的频率状态: history.csv -> history.csv.freq.json
+FREQUENCY_STATE_SUFFIX = ".freq.json"
+
+# 无锁读取遇到并发写入时的重试次数, 之后改为等待写锁
+READ_RETRIES = 50
+
+def _history_lock():
+    """系统数据的跨进程写锁 (同一进程内可重入)"""
+    return get_lock(SYSTEM_FILE + LOCK_SUFFIX, config.LOCK_TIMEOUT)
+
+def _generation_counter() -> GenerationCounter:
+    return GenerationCounter(SYSTEM_FILE + GENERATION_SUFFIX)
+
+def history_generation() -> int:
+    """系统数据的写入计数 (任一进程完成写入后增加, 奇数表示正在写入)"""
+    return _generation_counter().read()
+
+@contextmanager
+def _writing():
+    """所有修改系统数据的操作都在此上下文中执行
+
+    持有跨进程写锁, 并在写入期间把写入计数置为奇数; 嵌套调用只在最外层计数。
+    """
+    lock = _history_lock()
+    with lock:
+        if lock.depth > 1:
+            yield
+            return
+        counter = _generation_counter()
+        done = counter.begin()
+        try:
+            yield
+        finally:
+            counter.end(done)
+
+def _read_consistent(read):
+    """无锁读取系统数据: 读取前后写入计数相同且为偶数时结果一致, 否则重试
+
+    完整重写都是原子替换, 只有原地追加时读者可能读到不完整的末尾;
+    长时间读不到一致结果 (写入很慢或写入进程中途崩溃) 时改为持有写锁读取。
+    """
+    if _history_lock().depth:
+        return read()  # 本线程正在写入, 直接读取
+    counter = _generation_counter()
+    for _ in range(READ_RETRIES):
+        before = counter.read()
+        if before % 2 == 0:
+            result = read()
+            if counter.read() == before:
+                return result
+        time.sleep(0.01)
+    with _writing():
+        return read()
+
+def _use_sqlite() -> bool:
+    """config.STORAGE_BACKEND 为 "sqlite" 时系统数据存放在 SQLite 数据库中"""
+    return config.STORAGE_BACKEND == "sqlite"
+
+def _sqlite_store() -> SQLiteHistoryStore:
+    """SQLite 存储 (首次使用且数据库为空时导入现有的 history.csv)"""
+    store = get_store(config.SQLITE_PATH or os.path.join(DATA_DIR, "history.db"))
+    if not getattr(store, 'migrated', False):
+        with _writing():
+            if store.generation() == 0 and store.count() == 0 and os.path.exists(SYSTEM_FILE):
+                store.replace_all(_load_system_draws(SYSTEM_FILE))
+        store.migrated = True
+    return store
+
+class DrawIndex:
+    """开奖索引, 用于 O(1) 重复检查 (可以只包含与待验证记录相关的历史)
+
+    - ids: 已有期号集合
+    - combinations: 规范化号码组合 (排序后的正码 + 特别号) -> 期号
+    """
+
+    def __init__(self):
+        self.ids = set()
+        self.combinations = {}
+
+    @classmethod
+    def from_draws(cls, draws: DrawMatrix) -> 'DrawIndex':
+        """由 DrawMatrix 批量建立索引 (组合键向量化计算)"""
+        index = cls()
+        dates = draws.dates.tolist()
+        index.ids.update(dates)
+        # 同一组合出现多次时保留最早的期号
+        for key, date in zip(reversed(draws.combination_keys().tolist()), reversed(dates)):
+            index.combinations[key] = date
+        return index
+
+    def add(self, draw: Dict) -> None:
+        self.ids.add(draw['date'])
+        self.combinations.setdefault(combination_key(draw['numbers'], draw['special']), draw['date'])
+
+def _validate_draw_data(draw: dict, index: DrawIndex) -> bool:
     """验证开奖数据的有效性，包括重复性检查
     
     Args:
         draw: 当前开奖记录
-        previous_draws: 之前的开奖记录列表
+        index: 已验证开奖记录的索引 (覆盖与本记录相关的全部历史)
     
     Returns:
         bool: 数据是否有效
     """
-    if not draw or 'date' not in draw or 'numbers' not in draw or 'special' not in draw:
+    if not is_valid_draw(draw) or 'date' not in draw:
         print(f"警告: 数据格式不完整: {draw}")
         return False
         
-    # 检查与最近10期的重复性
-    recent_draws = previous_draws[-10:] if previous_draws else []
-    for prev_draw in recent_draws:
-        if (draw['numbers'] == prev_draw['numbers'] and 
-            draw['special'] == prev_draw['special'] and
-            draw['date'] != prev_draw['date']):
-            print(f"警告: 检测到重复数据 - 期号:{draw['date']}, 与期号:{prev_draw['date']}重复")
-            return False
+    # 检查与全部历史的重复性 (组合键哈希查找)
+    prev_date = index.combinations.get(combination_key(draw['numbers'], draw['special']))
+    if prev_date is not None and prev_date != draw['date']:
+        print(f"警告: 检测到重复数据 - 期号:{draw['date']}, 与期号:{prev_date}重复")
+        return False
             
     return True
 
+def _validate_batch(draw_data: List[Dict], index: DrawIndex) -> List[Dict]:
+    """批量验证开奖记录, 返回通过验证的记录 (索引随之更新)
+
+    期号已存在的记录直接跳过, 其余记录逐条做 O(1) 的哈希重复检查。
+    """
+    validated_data = []
+    for draw in draw_data:
+        date = draw.get('date') if isinstance(draw, dict) else None
+        if date in index.ids:
+            continue  # 跳过重复期号
+        if _validate_draw_data(draw, index):
+            validated_data.append(draw)
+            index.add(draw)
+        else:
+            print(f"跳过无效数据: {draw}")
+    return validated_data
+
 def save_history(draw_data: List[Dict], custom_path: str = None) -> None:
     """保存历史数据，带重复性检查和期号去重"""
     try:
-        # 验证每条数据
-        validated_data = []
-        seen_dates = set()
-        for i, draw in enumerate(draw_data):
-            date = draw.get('date')
-            if date in seen_dates:
-                continue  # 跳过重复期号
-            if _validate_draw_data(draw, validated_data):
-                validated_data.append(draw)
-                seen_dates.add(date)
-            else:
-                print(f"跳过无效数据: {draw}")
+        # 整批验证 (索引覆盖本批全部数据)
+        validated_data = _validate_batch(draw_data, DrawIndex())
         
         # 保存验证后的数据
-        _save_to_file(validated_data, SYSTEM_FILE)
+        with _writing():
+            if _use_sqlite():
+                _sqlite_store().replace_all(DrawMatrix.from_dicts(
+                    [draw for draw in validated_data if _is_valid_draw_id(draw['date'])]))
+            else:
+                _save_to_file(validated_data, SYSTEM_FILE)
+            _sync_archive()
         
         if custom_path and custom_path != SYSTEM_FILE:
             _save_to_file(validated_data, custom_path)
             
     except Exception as e:
         raise IOError(f"保存失败: {str(e)}")
+    _notify_history_changed()
+
+def _is_valid_draw_id(draw_id) -> bool:
+    """期号必须为7位数字 (YYYYNNN)"""
+    return isinstance(draw_id, str) and draw_id.isdigit() and len(draw_id) == 7
+
+def _draw_to_row(draw: Dict) -> Dict:
+    """开奖记录 -> CSV行"""
+    row = {
+        'date': draw['date'],
+        'special_number': draw['special']
+    }
+    # 保持原始输入顺序，不排序
+    for i, num in enumerate(draw['numbers'], 1):
+        row[f'n{i}'] = f"{num:02d}"
+    return row
 
 def _save_to_file(data: List[Dict], filepath: str) -> None:
-    """保存数据到指定文件"""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
-    mode = 'w'  # 总是重写文件
-    with open(filepath, mode=mode, newline='', encoding='utf-8') as f:
+    """保存数据到指定文件
+
+    先写入同目录下的临时文件并 fsync, 再用 os.replace 原子替换目标文件,
+    写入中途崩溃不会截断原有数据。
+    """
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode='w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
+            writer.writeheader()
+            for draw in data:
+                # 确保期号格式正确
+                draw_id = draw['date']
+                if not _is_valid_draw_id(draw_id):
+                    print(f"警告: 跳过无效期号格式: {draw_id}")
+                    continue
+                writer.writerow(_draw_to_row(draw))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _append_to_file(data: List[Dict], filepath: str) -> None:
+    """在文件末尾追加记录并 fsync (文件不存在或为空时先写表头)"""
+    needs_header = not os.path.exists(filepath) or os.path.getsize(filepath) == 0
+    needs_newline = False
+    if not needs_header:
+        with open(filepath, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+
+    with open(filepath, mode='a', newline='', encoding='utf-8') as f:
+        if needs_newline:
+            f.write('\r\n')
         writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
-        writer.writeheader()
+        if needs_header:
+            writer.writeheader()
         for draw in data:
-            # 确保期号格式正确
-            draw_id = draw['date']
-            if not (draw_id.isdigit() and len(draw_id) == 7):
-                print(f"警告: 跳过无效期号格式: {draw_id}")
+            writer.writerow(_draw_to_row(draw))
+        f.flush()
+        os.fsync(f.fileno())
+
+def append_draws(new_draws: List[Dict]) -> int:
+    """追加新的开奖记录到系统数据文件
+
+    只验证新记录 (期号格式、与全部历史的期号/号码组合重复),
+    然后追加写入, 不重写整个文件。
+
+    读取已有数据、验证和写入都在跨进程写锁内完成,
+    多个进程同时追加时不会丢失或重复记录。
+
+    Args:
+        new_draws: 新开奖记录列表
+
+    Returns:
+        int: 实际追加的记录数
+    """
+    try:
+        with _writing():
+            accepted = _append_locked(new_draws)
+    except Exception as e:
+        raise IOError(f"保存失败: {str(e)}")
+    if accepted:
+        _notify_history_changed()
+    return len(accepted)
+
+def _append_locked(new_draws: List[Dict]) -> List[Dict]:
+    """append_draws 的主体 (调用方持有写锁), 返回实际追加的记录"""
+    previous_source = _history_source()
+    candidates = []
+    for draw in new_draws:
+        if not draw or not _is_valid_draw_id(draw.get('date')):
+            print(f"跳过无效数据: {draw}")
+            continue
+        candidates.append(draw)
+
+    existing = None
+    if _use_sqlite():
+        index = _sqlite_index(candidates)
+    else:
+        existing = load_draws()
+        index = _draws_index(existing, candidates)
+
+    fresh = []
+    for draw in candidates:
+        if draw['date'] in index.ids:
+            print(f"警告: 期号 {draw['date']} 已存在, 跳过")
+            continue
+        fresh.append(draw)
+    accepted = _validate_batch(fresh, index)
+
+    if accepted:
+        added = DrawMatrix.from_dicts(accepted)
+        if _use_sqlite():
+            _sqlite_store().append(added)
+        else:
+            _append_to_file(accepted, SYSTEM_FILE)
+            _append_sidecar(SYSTEM_FILE, previous_source, len(existing), added)
+            _sync_archive(added, previous_source)
+        _update_frequency_state(previous_source, added=added, existing=existing)
+    return accepted
+
+def delete_draws(draw_ids) -> int:
+    """按期号删除系统数据中的开奖记录
+
+    频率状态按被删除的记录逐号减一, 不重新统计全部历史。
+
+    Args:
+        draw_ids: 期号 (字符串或整数) 列表
+
+    Returns:
+        int: 实际删除的记录数
+
+    Raises:
+        IOError: 写入失败
+    """
+    ids = np.array([normalize_draw_id(draw_id) for draw_id in draw_ids], dtype=np.int64)
+    try:
+        with _writing():
+            previous_source = _history_source()
+            draws = load_draws()
+            matched = np.isin(draws.draw_ids, ids)
+            removed = draws[matched]
+            if len(removed):
+                if _use_sqlite():
+                    _sqlite_store().delete(removed.draw_ids.tolist())
+                else:
+                    remaining = _write_draws(draws[~matched], SYSTEM_FILE)
+                    _refresh_sidecar(SYSTEM_FILE, remaining)
+                    _sync_archive(previous_source=previous_source, draws=remaining,
+                                  changed=removed.draw_ids)
+                _update_frequency_state(previous_source, removed=removed)
+    except Exception as e:
+        raise IOError(f"删除失败: {str(e)}")
+    if len(removed):
+        _notify_history_changed()
+    return len(removed)
+
+def _draws_index(draws: DrawMatrix, new_draws: List[Dict]) -> DrawIndex:
+    """只索引与新记录相关的已有期号和号码组合 (不为全部历史建立集合/字典)
+
+    在已有数据 (通常是内存映射的缓存) 上用 np.isin 筛出期号相同的行和特别号相同的行,
+    只对后者计算组合键; 逐条的 Python 操作只涉及新记录和命中的行。
+    """
+    index = DrawIndex()
+    if not len(draws) or not new_draws:
+        return index
+    ids = np.array([normalize_draw_id(draw['date']) for draw in new_draws], dtype=np.int64)
+    index.ids.update(draws.dates[np.isin(draws.draw_ids, ids)].tolist())
+    candidates = DrawMatrix.from_dicts(new_draws)
+    if len(candidates):
+        nearby = draws[np.isin(draws.special, np.unique(candidates.special))]
+        matched = nearby[np.isin(nearby.combination_keys(), candidates.combination_keys())]
+        index.combinations.update(DrawIndex.from_draws(matched).combinations)
+    return index
+
+def _sqlite_index(new_draws: List[Dict]) -> DrawIndex:
+    """只查询与新记录相关的期号和号码组合 (走数据库索引, 不加载全部历史)"""
+    candidates = DrawMatrix.from_dicts(new_draws)
+    found_ids, found_combos = _sqlite_store().lookup(
+        candidates.draw_ids.tolist(), candidates.combination_keys().astype(np.int64).tolist())
+    index = DrawIndex()
+    index.ids.update(found_ids)
+    index.combinations.update(found_combos)
+    return index
+
+class IngestReport:
+    """批量解析的拒绝报告
+
+    rejected 中每条记录为 {'line': 行号 (表头为第1行), 'reason': 原因代码, 'content': 原始行},
+    原因代码见 REASONS。
+    """
+
+    REASONS = {
+        'format': '格式错误',
+        'range': f'号码超出范围 {MIN_NUMBER}-{MAX_NUMBER}',
+        'duplicate_numbers': '正码重复',
+        'special_in_regulars': '特别号与正码重复',
+        'draw_id': '期号格式错误 (需要7位数字)',
+    }
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = []
+
+    def reject(self, line: int, reason: str, content: str) -> None:
+        self.rejected.append({'line': line, 'reason': reason, 'content': content})
+
+    def counts(self) -> Dict[str, int]:
+        """各原因的拒绝数量"""
+        counts = {}
+        for item in self.rejected:
+            counts[item['reason']] = counts.get(item['reason'], 0) + 1
+        return counts
+
+    def summary(self) -> str:
+        parts = [f"{self.REASONS[reason]} {count} 行" for reason, count in self.counts().items()]
+        text = f"通过 {self.accepted} 行, 跳过 {len(self.rejected)} 行"
+        return f"{text} ({', '.join(parts)})" if parts else text
+
+def _parse_rows_slow(lines: List[str], line_numbers: List[int], columns: List[int],
+                     report: IngestReport) -> tuple:
+    """逐行解析 (批量解析失败时的回退路径), 返回 (号码矩阵, 期号数组, 保留的行下标)"""
+    values, dates, kept = [], [], []
+    for i, line in enumerate(lines):
+        row = next(csv.reader([line]), [])
+        try:
+            if len(row) <= max(columns):
+                raise ValueError("列数不足")
+            values.append([int(row[c]) for c in columns[1:]])
+        except ValueError:
+            report.reject(line_numbers[i], 'format', line.rstrip('\r\n'))
+            continue
+        dates.append(row[columns[0]])
+        kept.append(i)
+    return (np.array(values, dtype=np.int64).reshape(-1, len(columns) - 1),
+            np.array(dates, dtype=str), kept)
+
+def _row_rejections(values: np.ndarray, dates: np.ndarray, strict: bool) -> np.ndarray:
+    """向量化校验, 返回每行的拒绝原因代码 (空字符串表示通过)
+
+    非严格模式只检查号码范围 (与加载已有数据时一致);
+    严格模式另外检查正码互不相同、特别号不在正码中以及期号格式。
+    """
+    reasons = np.full(len(values), '', dtype='<U20')
+    if strict:
+        # 优先级从低到高依次赋值, 每行保留最先违反的规则
+        id_ok = (np.char.str_len(dates) == 7) & np.char.isdigit(dates)
+        reasons[~id_ok] = 'draw_id'
+        regulars, special = values[:, :-1], values[:, -1]
+        reasons[(regulars == special[:, None]).any(axis=1)] = 'special_in_regulars'
+        reasons[(np.diff(np.sort(regulars, axis=1), axis=1) == 0).any(axis=1)] = 'duplicate_numbers'
+    reasons[~((values >= MIN_NUMBER) & (values <= MAX_NUMBER)).all(axis=1)] = 'range'
+    return reasons
+
+class _CsvLayout:
+    """由表头得到的列布局
+
+    - columns: [期号列, n1..n6列, 特别号列] 的下标
+    - width: 表头列数
+    - pattern: 能被批量路径直接解析的数据行 (列数与表头一致, 号码列均为整数)
+    """
+
+    def __init__(self, header: List[str]):
+        self.columns = [header.index(name) for name in CSV_HEADER]
+        self.width = len(header)
+        numeric = set(self.columns[1:])
+        fields = [r'\s*[+-]?\d+\s*' if i in numeric else r'[^,"]*' for i in range(self.width)]
+        self.pattern = re.compile(','.join(fields))
+
+# 纯数字数据行允许出现的字节: 数字、逗号、空白
+_PLAIN_BYTES = np.zeros(256, dtype=bool)
+_PLAIN_BYTES[[ord(c) for c in '0123456789, \t\r\n']] = True
+
+def _plain_lines(lines: List[str], width: int) -> np.ndarray:
+    """向量化预筛: 只含数字/逗号/空白且列数正确的行 (可直接批量解析)"""
+    data = np.frombuffer(''.join(lines).encode('utf-8'), dtype=np.uint8)
+    ends = np.cumsum([len(line) for line in lines])
+    if ends[-1] != data.size:  # 含非ASCII字符时按字节计算行长
+        ends = np.cumsum([len(line.encode('utf-8')) for line in lines])
+    starts = np.concatenate([[0], ends[:-1]])
+    commas = np.add.reduceat((data == ord(',')).astype(np.int64), starts)
+    other = np.add.reduceat((~_PLAIN_BYTES[data]).astype(np.int64), starts)
+    return (commas == width - 1) & (other == 0)
+
+def _bulk_parse(lines: List[str], columns: List[int]) -> tuple:
+    """np.loadtxt 批量解析, 返回 (号码矩阵, 期号数组); 任一行格式错误时抛出 ValueError"""
+    if not lines:
+        return np.empty((0, len(columns) - 1), dtype=np.int64), np.empty(0, dtype=str)
+    values = np.loadtxt(lines, delimiter=',', dtype=np.int64, usecols=columns[1:],
+                        comments=None, ndmin=2)
+    dates = np.loadtxt(lines, delimiter=',', dtype=str, usecols=columns[0],
+                       comments=None, ndmin=1)
+    return values, dates
+
+def _parse_bulk_subset(lines: List[str], layout: _CsvLayout) -> tuple:
+    """从含格式错误的块中挑出可批量解析的行并解析
+
+    先用向量化预筛选出纯数字行, 其余行再用正则检查; 预筛结果仍无法解析时
+    (如存在空字段) 全部改用正则检查。
+
+    Returns:
+        tuple: (行下标列表, 号码矩阵, 期号数组)
+    """
+    def matches(i):
+        return layout.pattern.fullmatch(lines[i].rstrip('\r\n')) is not None
+
+    plain = _plain_lines(lines, layout.width)
+    bulk = np.flatnonzero(plain).tolist()
+    checked = [i for i in np.flatnonzero(~plain).tolist() if matches(i)]
+    if checked:
+        bulk = sorted(bulk + checked)
+    try:
+        values, dates = _bulk_parse([lines[i] for i in bulk], layout.columns)
+    except ValueError:
+        bulk = [i for i in bulk if matches(i)]
+        values, dates = _bulk_parse([lines[i] for i in bulk], layout.columns)
+    return bulk, values, dates
+
+def _parse_chunk(lines: List[str], line_numbers: List[int], layout: _CsvLayout,
+                 report: IngestReport, strict: bool = False) -> DrawMatrix:
+    """解析一块CSV数据行为 DrawMatrix
+
+    整块交给 np.loadtxt 批量解析为整数矩阵并做向量化校验。块内有格式错误的行时,
+    先筛出可批量解析的行, 只有剩余的少数行逐行解析。被跳过的行记入 report。
+
+    Args:
+        lines: 原始数据行 (不含表头和空行)
+        line_numbers: 各行在文件中的行号
+        layout: 表头对应的列布局
+        report: 拒绝报告
+        strict: 是否做完整的导入校验 (见 _row_rejections)
+    """
+    columns = layout.columns
+    try:
+        values, dates = _bulk_parse(lines, columns)
+        kept = None
+    except ValueError:
+        bulk, bulk_values, bulk_dates = _parse_bulk_subset(lines, layout)
+        rest = sorted(set(range(len(lines))) - set(bulk))
+        rest_values, rest_dates, rest_kept = _parse_rows_slow(
+            [lines[i] for i in rest], [line_numbers[i] for i in rest], columns, report)
+        kept = np.array(bulk + [rest[i] for i in rest_kept], dtype=np.int64)
+        order = np.argsort(kept, kind='stable')
+        kept = kept[order].tolist()
+        values = np.concatenate([bulk_values, rest_values])[order]
+        dates = np.concatenate([bulk_dates, rest_dates])[order]
+
+    reasons = _row_rejections(values, dates, strict)
+    valid = reasons == ''
+    if not valid.all():
+        for row in np.flatnonzero(~valid).tolist():
+            i = kept[row] if kept is not None else row
+            report.reject(line_numbers[i], str(reasons[row]), lines[i].rstrip('\r\n'))
+        values, dates = values[valid], dates[valid]
+    report.accepted += len(values)
+    if not len(values):
+        return DrawMatrix.empty()
+    return DrawMatrix(values[:, :-1], values[:, -1], dates=dates)
+
+def iter_history(filepath: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 report: IngestReport = None, strict: bool = False) -> Iterator[DrawMatrix]:
+    """分块流式读取历史数据
+
+    每次读取 chunk_size 行并批量解析, 内存占用与文件大小无关,
+    适合用 analysis 中的累加器统计很长的历史档案。
+
+    Args:
+        filepath: 数据文件路径，如果为None则使用系统文件
+        chunk_size: 每块的最大行数
+        report: 拒绝报告; 为 None 时读取结束后打印一行汇总
+        strict: 是否做完整的导入校验 (正码唯一、特别号、期号格式)
+
+    Returns:
+        Iterator[DrawMatrix]: 通过验证的非空数据块, 行顺序与文件一致
+
+    Raises:
+        ValueError: 表头缺少必需的列
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须为正整数")
+    own_report = report is None
+    if own_report:
+        report = IngestReport()
+    file_to_load = filepath if filepath else SYSTEM_FILE
+    with open(file_to_load, mode='r', newline=None, encoding='utf-8') as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line]), [])
+        if not header:
+            return
+        header = [name.strip() for name in header]
+        if not all(field in header for field in CSV_HEADER):
+            raise ValueError(f"文件格式错误: 需要的列名 {CSV_HEADER}")
+        layout = _CsvLayout(header)
+
+        line_number = 1
+        while True:
+            raw_lines = list(itertools.islice(f, chunk_size))
+            if not raw_lines:
+                break
+            lines, line_numbers = [], []
+            for line in raw_lines:
+                line_number += 1
+                if line.strip():
+                    lines.append(line)
+                    line_numbers.append(line_number)
+            if not lines:
                 continue
-                
-            row = {
-                'date': draw_id,
-                'special_number': draw['special']
-            }
-            # 保持原始输入顺序，不排序
-            for i, num in enumerate(draw['numbers'], 1):
-                row[f'n{i}'] = f"{num:02d}"
-            writer.writerow(row)
-
-def load_history(filepath: str = None, merge: bool = False) -> List[Dict]:
-    """加载历史数据
+            block = _parse_chunk(lines, line_numbers, layout, report, strict)
+            if len(block):
+                yield block
+
+    if own_report and report.rejected:
+        print(f"警告: {file_to_load}: {report.summary()}")
+
+def ingest_history(filepath: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple:
+    """批量导入外部历史文件
+
+    所有列一次性解析为数组并做向量化校验 (号码范围 1-49、6个正码互不相同、
+    特别号不在正码中、7位期号), 不逐行打印警告, 而是返回结构化的拒绝报告。
+
+    Args:
+        filepath: 要导入的CSV文件
+        chunk_size: 每块的最大行数
+
+    Returns:
+        tuple: (DrawMatrix 通过校验的记录, IngestReport 拒绝报告)
+
+    Raises:
+        ValueError: 表头缺少必需的列
+    """
+    report = IngestReport()
+    draws = DrawMatrix.concatenate(iter_history(filepath, chunk_size, report=report, strict=True))
+    report.rejected.sort(key=lambda item: item['line'])
+    return draws, report
+
+def _read_history_file(filepath: str) -> DrawMatrix:
+    """读取CSV历史文件为 DrawMatrix (表头错误时抛出 ValueError)"""
+    return DrawMatrix.concatenate(iter_history(filepath))
+
+def _file_fingerprint(filepath: str) -> Dict:
+    """文件大小和修改时间, 用于快速判断缓存是否失效"""
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _content_hash(filepath: str) -> str:
+    """文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _sidecar_paths(filepath: str) -> tuple:
+    return filepath + SIDECAR_SUFFIX, filepath + SIDECAR_META_SUFFIX
+
+@contextmanager
+def _sidecar_update():
+    """无锁读者更新二进制缓存时持有写锁 (不改变写入计数)
+
+    写锁正被占用时不等待, 返回 False, 调用方放弃更新: 读者解析的可能是旧版本数据,
+    不能覆盖写入方刚更新的缓存。
+    """
+    lock = _history_lock()
+    try:
+        lock.acquire(timeout=0)
+    except TimeoutError:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        lock.release()
+
+def _write_meta(meta_path: str, meta: Dict) -> None:
+    tmp_meta = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, meta_path)
+
+def _write_sidecar(filepath: str, draws: DrawMatrix, fingerprint: Dict, content_hash: str) -> None:
+    """写入二进制缓存及其元数据 (先写临时文件再原子替换, 调用方持有写锁)
+
+    .npy 与元数据分两次替换, 元数据中记录 .npy 自身的大小和修改时间,
+    读者据此确认两者属于同一次写入。
+    """
+    npy_path, meta_path = _sidecar_paths(filepath)
+    tmp_npy = f"{npy_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_npy, 'wb') as f:
+        np.save(f, draws.to_records())
+    npy_fingerprint = _file_fingerprint(tmp_npy)
+    os.replace(tmp_npy, npy_path)
+    _write_meta(meta_path, dict(fingerprint, sha256=content_hash, rows=len(draws), npy=npy_fingerprint))
+
+def _read_sidecar(filepath: str) -> Optional[DrawMatrix]:
+    """CSV未变化时以内存映射方式读取二进制缓存, 缓存失效返回 None
+
+    失效判断: 文件大小不同即失效; 大小和修改时间都相同则直接使用;
+    仅修改时间不同时再比较内容哈希 (如文件被 touch 或原样复制)。
+    .npy 的大小、修改时间和行数必须与元数据一致, 否则两者不是同一次写入的结果, 同样失效。
+    """
+    npy_path, meta_path = _sidecar_paths(filepath)
+    if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        fingerprint = _file_fingerprint(filepath)
+        if meta.get('size') != fingerprint['size']:
+            return None
+        if meta.get('mtime_ns') != fingerprint['mtime_ns']:
+            content_hash = _content_hash(filepath)
+            if meta.get('sha256') != content_hash:
+                return None
+            # 内容未变, 刷新元数据中的修改时间
+            with _sidecar_update() as locked:
+                if locked and _file_fingerprint(filepath) == fingerprint:
+                    meta = dict(meta, **fingerprint)
+                    _write_meta(meta_path, meta)
+        npy_fingerprint = _file_fingerprint(npy_path)
+        if meta.get('npy') != npy_fingerprint:
+            return None
+        records = np.load(npy_path, mmap_mode='r')
+        # 映射期间 .npy 被替换或追加时不使用
+        if len(records) != meta.get('rows') or _file_fingerprint(npy_path) != npy_fingerprint:
+            return None
+        return DrawMatrix.from_records(records)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"警告: 读取缓存失败, 将重新解析CSV: {str(e)}")
+        return None
+
+def _refresh_sidecar(filepath: str, draws: DrawMatrix) -> None:
+    """写入方更新 CSV 后按写入后的数据重写二进制缓存 (调用方持有写锁)
+
+    下次加载直接映射缓存, 不再重新解析整个CSV。缓存只是派生数据, 失败只打印警告。
+    """
+    try:
+        _write_sidecar(filepath, draws, _file_fingerprint(filepath), _content_hash(filepath))
+    except OSError as e:
+        print(f"警告: 写入缓存失败: {str(e)}")
+
+def _extend_npy(npy_path: str, records: np.ndarray) -> bool:
+    """在一维记录数组 .npy 文件末尾追加记录并原地更新头部的行数
+
+    np.save 写出的头部为行数增长预留了空间; 头部长度会变化、记录格式不同
+    (包括期号宽度不够) 或文件长度与头部不符时不做修改, 返回 False。
+    """
+    with open(npy_path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            return False
+        offset = f.tell()
+        if (fortran_order or len(shape) != 1 or dtype.names != records.dtype.names
+                or any(dtype[name].itemsize < records.dtype[name].itemsize for name in dtype.names)):
+            return False
+        header = io.BytesIO()
+        header_data = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                       'shape': (shape[0] + len(records),)}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_data)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_data)
+        if len(header.getvalue()) != offset or f.seek(0, os.SEEK_END) != offset + shape[0] * dtype.itemsize:
+            return False
+        converted = np.empty(len(records), dtype=dtype)
+        for name in dtype.names:
+            converted[name] = records[name]
+        f.write(converted.tobytes())
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+def _append_sidecar(filepath: str, previous: Optional[Dict], rows: int, added: DrawMatrix) -> None:
+    """原地追加 CSV 后同步二进制缓存 (调用方持有写锁)
+
+    缓存与追加前的 CSV (previous, rows 行) 一致时只在 .npy 末尾写入新记录, 并更新元数据
+    中的大小、修改时间和行数; 不重新计算整个文件的内容哈希 (置空: 之后仅修改时间变化
+    也按失效处理)。否则删除元数据, 由下次读取重建缓存。缓存只是派生数据, 失败只打印警告。
+    """
+    npy_path, meta_path = _sidecar_paths(filepath)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        current = (previous is not None and meta.get('rows') == rows
+                   and all(meta.get(key) == value for key, value in previous.items())
+                   and meta.get('npy') == _file_fingerprint(npy_path))
+        if current and _extend_npy(npy_path, added.to_records()):
+            _write_meta(meta_path, dict(_file_fingerprint(filepath), sha256=None, rows=rows + len(added),
+                                        npy=_file_fingerprint(npy_path)))
+            return
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        print(f"警告: 追加缓存失败, 将在下次读取时重建: {str(e)}")
+    try:
+        os.remove(meta_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"警告: 删除缓存元数据失败: {str(e)}")
+
+def _load_system_draws(filepath: str) -> DrawMatrix:
+    """加载系统数据文件, 优先使用二进制缓存"""
+    cached = _read_sidecar(filepath)
+    if cached is not None:
+        return cached
+
+    fingerprint = _file_fingerprint(filepath)
+    draws = _read_history_file(filepath)
+    try:
+        # 只在持有写锁且文件仍是解析时的版本时写缓存, 避免缓存与文件内容不一致
+        content_hash = _content_hash(filepath)
+        with _sidecar_update() as locked:
+            if locked and _file_fingerprint(filepath) == fingerprint:
+                _write_sidecar(filepath, draws, fingerprint, content_hash)
+    except OSError as e:
+        print(f"警告: 写入缓存失败: {str(e)}")
+    return draws
+
+def _is_system_file(filepath: str) -> bool:
+    return os.path.abspath(filepath) == os.path.abspath(SYSTEM_FILE)
+
+def _archive() -> HistoryArchive:
+    return HistoryArchive(ARCHIVE_DIR)
+
+def _sync_archive(appended: DrawMatrix = None, previous_source: Dict = None,
+                  draws: DrawMatrix = None, changed=None) -> None:
+    """系统数据文件写入后同步年份分区档案
+
+    档案与写入前的文件一致 (previous_source) 时:
+    - 追加 (appended): 只在涉及年份的分区末尾追加
+    - 删除/导入 (draws 为写入后的全部数据, changed 为变化记录的期号): 只重写这些期号所在的年份分区
+    否则按内容哈希比较, 只重写发生变化的分区。
+
+    系统数据仍是单个 CSV 文件, 删除和导入会原子地重写整个 CSV; 档案只是派生数据,
+    同步失败只打印警告。
+    """
+    if _use_sqlite():
+        return  # SQLite 后端直接按索引查询期号范围
+    try:
+        archive = _archive()
+        source = _file_fingerprint(SYSTEM_FILE)
+        current = previous_source is not None and archive.is_current(previous_source)
+        if appended is not None and current:
+            archive.append(appended, source)
+        elif draws is not None and changed is not None and current:
+            archive.sync_years(draws, np.unique(partition_years(changed)).tolist(), source)
+        else:
+            archive.sync(draws if draws is not None else _load_system_draws(SYSTEM_FILE), source)
+    except Exception as e:
+        print(f"警告: 同步分区档案失败: {str(e)}")
+
+def _load_archived_range(start_id=None, end_id=None) -> DrawMatrix:
+    """从分区档案读取期号范围 (档案过期时持有写锁同步)"""
+    archive = _archive()
+    if not archive.is_current(_file_fingerprint(SYSTEM_FILE)):
+        with _writing():
+            source = _file_fingerprint(SYSTEM_FILE)
+            if not archive.is_current(source):
+                archive.sync(_load_system_draws(SYSTEM_FILE), source)
+    return archive.load(start_id, end_id)
+
+def _history_source() -> Optional[Dict]:
+    """系统数据的版本标识 (CSV 为文件大小和修改时间, SQLite 为写入计数), 数据不存在时为 None"""
+    if _use_sqlite():
+        return {'sqlite_generation': _sqlite_store().generation()}
+    if not os.path.exists(SYSTEM_FILE):
+        return None
+    return _file_fingerprint(SYSTEM_FILE)
+
+def _frequency_state_path() -> str:
+    return SYSTEM_FILE + FREQUENCY_STATE_SUFFIX
+
+def _update_frequency_state(previous_source: Optional[Dict], added: DrawMatrix = None,
+                            removed: DrawMatrix = None, existing: DrawMatrix = None) -> None:
+    """写入后增量更新频率状态 (调用方持有写锁)
+
+    状态与写入前的数据一致时只对变化的记录加减; 状态缺失或过期而调用方
+    恰好持有写入前的全部数据 (existing) 时据此重建; 否则留待 load_frequency_state 重建。
+    状态只是派生数据, 更新失败只打印警告。
+    """
+    path = _frequency_state_path()
+    try:
+        state = FrequencyState.load(path)
+        if state is None or previous_source is None or state.source != previous_source:
+            if existing is None:
+                return
+            state = FrequencyState.from_draws(existing)
+        if added is not None:
+            state.add(added)
+        if removed is not None:
+            state.remove(removed)
+        state.source = _history_source()
+        state.save(path)
+    except (OSError, ValueError) as e:
+        print(f"警告: 更新频率状态失败: {str(e)}")
+
+def load_frequency_state() -> FrequencyState:
+    """系统数据的频率状态
+
+    状态文件与当前数据一致时直接读取 (追加/删除后由写入方增量更新),
+    否则全量统计一次并保存。
+    """
+    path = _frequency_state_path()
+    source = _history_source()
+    state = FrequencyState.load(path)
+    if state is not None and source is not None and state.source == source:
+        return state
+    state = FrequencyState.from_draws(load_draws(), source)
+    try:
+        # 统计期间数据被修改时不保存, 避免状态与数据不一致
+        if source is not None and _history_source() == source:
+            state.save(path)
+    except OSError as e:
+        print(f"警告: 保存频率状态失败: {str(e)}")
+    return state
+
+def load_draws(filepath: str = None, start_id=None, end_id=None) -> DrawMatrix:
+    """加载历史数据为列式 DrawMatrix
+
+    系统数据文件旁会维护一个内存映射的二进制缓存 (history.csv.npy),
+    CSV 未变化时直接映射缓存, 不再逐行解析。
+    指定期号范围时, 系统数据从年份分区档案读取, 只打开范围内的分区。
+    使用 SQLite 后端时系统数据从数据库读取。
+
+    Args:
+        filepath: 数据文件路径，如果为None则使用系统文件
+        start_id: 起始期号 (含), None 表示不限
+        end_id: 结束期号 (含), None 表示不限
+
+    Returns:
+        DrawMatrix: 文件不存在或读取失败时返回空的 DrawMatrix
+    """
+    file_to_load = filepath if filepath else SYSTEM_FILE
+    ranged = start_id is not None or end_id is not None
+    if _use_sqlite() and _is_system_file(file_to_load):
+        try:
+            return _sqlite_store().load(start_id, end_id)
+        except Exception as e:
+            print(f"警告: 读取数据库失败: {str(e)}")
+            return DrawMatrix.empty()
+    if not os.path.exists(file_to_load):
+        return DrawMatrix.empty()
+    try:
+        if _is_system_file(file_to_load):
+            if ranged:
+                return _read_consistent(lambda: _load_archived_range(start_id, end_id))
+            return _read_consistent(lambda: _load_system_draws(file_to_load))
+        draws = _read_history_file(file_to_load)
+        return select_range(draws, start_id, end_id) if ranged else draws
+    except Exception as e:
+        print(f"警告: 读取文件失败: {str(e)}")
+        return DrawMatrix.empty()
+
+def load_recent(count: int) -> DrawMatrix:
+    """系统数据的最后 count 期 (等价于 load_draws()[-count:])
+
+    SQLite 后端只读取需要的行。
+    """
+    if count <= 0:
+        return DrawMatrix.empty()
+    if _use_sqlite():
+        try:
+            return _sqlite_store().tail(count)
+        except Exception as e:
+            print(f"警告: 读取数据库失败: {str(e)}")
+            return DrawMatrix.empty()
+    return load_draws()[-count:]
+
+class MergeReport:
+    """合并结果报告
+
+    - inserted / identical / conflicting: 新增、完全相同、冲突的期号 (int64 数组)
+    - repeated: 导入数据内重复出现且号码相同的期号 (只取第一次出现的记录)
+    - conflicts: 冲突详情 [{'draw_id', 'reason', 'existing', 'incoming'}],
+      reason 为 'different_numbers' (同一期号号码不同, 保留已有记录)、
+      'duplicate_combination' (号码组合与其他期号重复, 不导入) 或
+      'repeated_id' (导入数据内同一期号号码不同, 保留第一次出现的记录, existing 为该记录)
+    - ingest: 导入文件的拒绝报告 (由 import_history 填写)
+    """
+
+    def __init__(self):
+        self.inserted = np.empty(0, dtype=np.int64)
+        self.identical = np.empty(0, dtype=np.int64)
+        self.repeated = np.empty(0, dtype=np.int64)
+        self.conflicting = np.empty(0, dtype=np.int64)
+        self.conflicts = []
+        self.ingest = None
+
+    def summary(self) -> str:
+        text = (f"新增 {len(self.inserted)} 期, 相同 {len(self.identical)} 期, "
+                f"冲突 {len(self.conflicting)} 期")
+        if len(self.repeated):
+            text += f", 重复 {len(self.repeated)} 行"
+        if self.ingest is not None and self.ingest.rejected:
+            text += f", 无效 {len(self.ingest.rejected)} 行"
+        return text
+
+def _row_text(draws: DrawMatrix, i: int) -> str:
+    return f"{draws.dates[i]}: {draws.numbers[i].tolist()} + {int(draws.special[i])}"
+
+def merge_histories(existing: DrawMatrix, incoming: DrawMatrix) -> tuple:
+    """按规范化期号归并两份历史数据
+
+    两侧按期号排序后用 searchsorted 做归并连接 (O(n log n)), 全程使用数组运算:
+    - 已有期号且号码组合相同: identical
+    - 已有期号但号码不同: 冲突, 保留已有记录
+    - 新期号但号码组合与其他期号重复: 冲突, 不导入
+    - 其余: inserted
+    导入数据内重复的期号只取第一次出现的记录, 其余记为 repeated (号码相同)
+    或 'repeated_id' 冲突 (号码不同)。
+
+    Returns:
+        tuple: (合并后的 DrawMatrix, MergeReport)。结果按期号排序,
+        已有数据为倒序 (最新在前) 时结果同样倒序。
+    """
+    report = MergeReport()
+    repeated_conflicts = np.empty(0, dtype=np.int64)
+    if len(incoming):
+        unique_ids, first = np.unique(incoming.draw_ids, return_index=True)
+        repeats = np.setdiff1d(np.arange(len(incoming)), first)
+        if len(repeats):
+            # 与同一期号第一次出现的记录比较号码组合
+            origins = first[np.searchsorted(unique_ids, incoming.draw_ids[repeats])]
+            keys = incoming.combination_keys()
+            same = keys[repeats] == keys[origins]
+            report.repeated = incoming.draw_ids[repeats[same]]
+            repeated_conflicts = incoming.draw_ids[repeats[~same]]
+            for row, origin in zip(repeats[~same].tolist(), origins[~same].tolist()):
+                report.conflicts.append({'draw_id': int(incoming.draw_ids[row]), 'reason': 'repeated_id',
+                                         'existing': _row_text(incoming, origin),
+                                         'incoming': _row_text(incoming, row)})
+        incoming = incoming[np.sort(first)]
+
+    order = np.argsort(existing.draw_ids, kind='stable')
+    existing_ids = existing.draw_ids[order]
+    existing_keys = existing.combination_keys()[order]
+    incoming_keys = incoming.combination_keys()
+
+    if len(existing_ids):
+        pos = np.minimum(np.searchsorted(existing_ids, incoming.draw_ids), len(existing_ids) - 1)
+        matched = existing_ids[pos] == incoming.draw_ids
+        same = matched & (existing_keys[pos] == incoming_keys)
+    else:
+        pos = np.zeros(len(incoming), dtype=np.int64)
+        matched = same = np.zeros(len(incoming), dtype=bool)
+
+    new_rows = np.flatnonzero(~matched)
+    # 新期号的号码组合不能与已有数据或本批更早的记录重复
+    _, first_new = np.unique(incoming_keys[new_rows], return_index=True)
+    unique_new = np.zeros(len(new_rows), dtype=bool)
+    unique_new[first_new] = True
+    duplicate = ~unique_new | np.isin(incoming_keys[new_rows], existing_keys)
+    inserted_rows = new_rows[~duplicate]
+
+    report.inserted = incoming.draw_ids[inserted_rows]
+    report.identical = incoming.draw_ids[same]
+    differing = np.flatnonzero(matched & ~same)
+    duplicated = new_rows[duplicate]
+    report.conflicting = np.concatenate([incoming.draw_ids[differing], incoming.draw_ids[duplicated],
+                                         repeated_conflicts])
+    for row in differing.tolist():
+        report.conflicts.append({'draw_id': int(incoming.draw_ids[row]), 'reason': 'different_numbers',
+                                 'existing': _row_text(existing, int(order[pos[row]])),
+                                 'incoming': _row_text(incoming, row)})
+    for row in duplicated.tolist():
+        report.conflicts.append({'draw_id': int(incoming.draw_ids[row]), 'reason': 'duplicate_combination',
+                                 'existing': None, 'incoming': _row_text(incoming, row)})
+
+    merged = existing.concat(incoming[inserted_rows])
+    descending = len(existing) > 1 and bool((np.diff(existing.draw_ids) <= 0).all())
+    merged_order = np.argsort(merged.draw_ids, kind='stable')
+    if descending:
+        merged_order = merged_order[::-1]
+    return merged[merged_order], report
+
+def _write_draws(draws: DrawMatrix, filepath: str) -> DrawMatrix:
+    """将 DrawMatrix 原子写入CSV (格式与 _save_to_file 相同, 不经过逐行字典)
+
+    Returns:
+        DrawMatrix: 实际写入的记录 (跳过无效期号后)
+    """
+    valid = (np.char.str_len(draws.dates) == 7) & np.char.isdigit(draws.dates)
+    if not valid.all():
+        for draw_id in draws.dates[~valid].tolist():
+            print(f"警告: 跳过无效期号格式: {draw_id}")
+        draws = draws[valid]
+    table = np.column_stack([draws.dates,
+                             np.char.zfill(draws.numbers.astype(str), 2),
+                             draws.special.astype(str)]) if len(draws) else []
+
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode='w', newline='', encoding='utf-8') as f:
+            f.write(','.join(CSV_HEADER) + '\r\n')
+            if len(table):
+                np.savetxt(f, table, fmt='%s', delimiter=',', newline='\r\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return draws
+
+def import_history(filepath: str) -> MergeReport:
+    """将外部历史文件归并到系统数据
+
+    导入文件走批量解析与校验 (ingest_history), 再与系统数据按期号归并,
+    有新增记录时原子地重写系统文件。
+
+    Returns:
+        MergeReport: 合并报告 (ingest 属性为导入文件的拒绝报告)
+
+    Raises:
+        IOError: 读取或写入失败
+    """
+    try:
+        incoming, ingest_report = ingest_history(filepath)
+        with _writing():
+            previous_source = _history_source()
+            merged, report = merge_histories(load_draws(), incoming)
+            report.ingest = ingest_report
+            if len(report.inserted) and _use_sqlite():
+                _sqlite_store().replace_all(merged)
+            elif len(report.inserted):
+                written = _write_draws(merged, SYSTEM_FILE)
+                _refresh_sidecar(SYSTEM_FILE, written)
+                _sync_archive(previous_source=previous_source, draws=written,
+                              changed=report.inserted)
+    except Exception as e:
+        raise IOError(f"导入失败: {str(e)}")
+    if len(report.inserted):
+        _notify_history_changed()
+    return report
+
+def load_history(filepath: str = None, merge: bool = False,
+                 start_id=None, end_id=None) -> List[Dict]:
+    """加载历史数据 (字典列表格式，兼容旧调用方)
     
     Args:
         filepath: 数据文件路径，如果为None则使用系统文件
-        merge: 是否将加载的数据合并到系统数据
+        merge: 是否将文件按期号归并到系统数据 (见 import_history)
+        start_id: 起始期号 (含), None 表示不限
+        end_id: 结束期号 (含), None 表示不限
     """
     try:
-        file_to_load = filepath if filepath else SYSTEM_FILE
-        if not os.path.exists(file_to_load):
-            # 如果文件不存在，返回空列表
-            return []
-            
-        history = []
-        with open(file_to_load, mode='r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            
-            # 检查文件是否为空
-            if not reader.fieldnames:
-                return []
-                
-            if not all(field in reader.fieldnames for field in CSV_HEADER):
-                raise ValueError(f"文件格式错误: 需要的列名 {CSV_HEADER}")
-                
-            for row in reader:
-                try:
-                    numbers = []
-                    for i in range(1, 7):
-                        num = int(row[f'n{i}'])
-                        numbers.append(num)
-                        
-                    history.append({
-                        'date': row['date'],
-                        'numbers': numbers,
-                        'special': int(row['special_number'])
-                    })
-                except (ValueError, KeyError) as e:
-                    print(f"警告: 跳过无效行: {row}. 原因: {str(e)}")
-                    continue
-                    
         if merge and filepath and filepath != SYSTEM_FILE:
-            # 合并到系统数据
-            _save_to_file(history, SYSTEM_FILE)
-            
-        return history
+            # 按期号归并到系统数据, 只打印一行汇总
+            report = import_history(filepath)
+            print(f"导入 {filepath}: {report.summary()}")
+
+        return load_draws(filepath, start_id, end_id).to_dicts()
         
     except Exception as e:
         print(f"警告: 读取文件失败: {str(e)}")
         return []  # 出错时返回空列表而不是抛出异常
 
+class HistoryRepository:
+    """进程内共享的历史数据仓库
+
+    持有已加载的 DrawMatrix 以及由它派生的统计结果 (频率表、标签标注等)。
+    只有写入计数或数据文件指纹 (大小、修改时间、inode) 变化时才重新加载,
+    派生结果按数据版本缓存; 数据变化时通知订阅者 (如GUI表格和各类缓存)。
+    """
+
+    def __init__(self, filepath: str = None):
+        self._filepath = filepath
+        self._draws = DrawMatrix.empty()
+        self._fingerprint = None
+        self._source = None
+        self._loaded = False
+        self._derived = {}
+        self._accumulators = {}
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self.generation = 0
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath if self._filepath else SYSTEM_FILE
+
+    def _current_fingerprint(self):
+        if self._filepath is None and _use_sqlite():
+            try:
+                store = _sqlite_store()
+                return ('sqlite', store.path, store.generation())
+            except Exception:
+                return None
+        try:
+            stat = os.stat(self.filepath)
+        except OSError:
+            return None
+        generation = history_generation() if self._filepath is None else None
+        return (generation, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def refresh(self, force: bool = False) -> bool:
+        """文件指纹变化时重新加载并通知订阅者
+
+        Returns:
+            bool: 数据是否发生变化
+        """
+        with self._lock:
+            fingerprint = self._current_fingerprint()
+            if self._loaded and not force and fingerprint == self._fingerprint:
+                return False
+            previous = self._draws
+            # 已加载数据的版本标识 (加载期间数据被修改时为 None), 用于校验频率状态
+            source = _history_source() if self._filepath is None else None
+            self._draws = load_draws(self.filepath)
+            if source is not None and _history_source() != source:
+                source = None
+            self._source = source
+            self._draws.masks  # 位图随数据一起准备好, 供重叠统计使用
+            # 计数前缀和表和累加器: 追加新数据时只处理新增的行
+            if self._draws.extend_count_table(previous):
+                appended = self._draws[len(previous):]
+                for accumulator in self._accumulators.values():
+                    accumulator.update(appended)
+            else:
+                self._draws.count_table()
+                self._accumulators = {}
+            self._fingerprint = fingerprint
+            self._loaded = True
+            self._derived = {}
+            self.generation += 1
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"警告: 历史数据变更通知失败: {str(e)}")
+        return True
+
+    @property
+    def draws(self) -> DrawMatrix:
+        """当前历史数据 (必要时自动重新加载)"""
+        self.refresh()
+        return self._draws
+
+    def derived(self, key, factory):
+        """按数据版本缓存的派生结果, factory(draws) 只在数据变化后重新计算"""
+        draws = self.draws
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory(draws)
+            return self._derived[key]
+
+    def accumulator(self, key, factory):
+        """随数据增量更新的累加器 (如 analysis.GapAccumulator)
+
+        factory() 返回带 update(block) 方法的新累加器, 第一次访问时累加全部历史;
+        之后追加数据时只累加新增的行, 其他修改后重新累加。返回的对象供只读使用。
+        """
+        draws = self.draws
+        with self._lock:
+            if key not in self._accumulators:
+                accumulator = factory()
+                accumulator.update(draws)
+                self._accumulators[key] = accumulator
+            return self._accumulators[key]
+
+    def gap_statistics(self, number_type: str = 'regular') -> analysis.GapAccumulator:
+        """全部历史的遗漏统计 (当前/最大/平均遗漏、直方图、百分位)"""
+        return self.accumulator(('gaps', number_type), lambda: analysis.GapAccumulator(number_type))
+
+    def cooccurrence(self, periods: Optional[int] = None) -> analysis.CooccurrenceAccumulator:
+        """最近 periods 期 (None 为全部历史) 的号码同现统计 (两两、三码、特码与正码)
+
+        全部历史的统计随追加增量更新; 其他窗口的结果缓存在对应的 HistoryWindow 上,
+        数据变化后随新的 DrawMatrix 一起失效。
+        """
+        if periods is None:
+            return self.accumulator('cooccurrence', analysis.CooccurrenceAccumulator)
+        return analysis.cooccurrence(self.draws.window(periods))
+
+    def history(self) -> List[Dict]:
+        """字典列表格式的历史数据 (返回副本, 调用方可自由修改)"""
+        return [dict(draw, numbers=list(draw['numbers']))
+                for draw in self.derived('dicts', DrawMatrix.to_dicts)]
+
+    def _frequency_vectors(self, draws: DrawMatrix) -> tuple:
+        """系统数据优先使用增量维护的频率状态, 否则对已加载的数据做一次 bincount
+
+        只有状态记录的数据版本与已加载数据的版本一致时才使用状态。
+        """
+        vectors = None
+        if self._filepath is None and self._source is not None:
+            try:
+                state = load_frequency_state()
+                if state.source == self._source and state.total_draws == len(draws):
+                    vectors = (state.regular, state.special)
+            except Exception as e:
+                print(f"警告: 读取频率状态失败: {str(e)}")
+        if vectors is None:
+            vectors = tuple(v.copy() for v in analysis.frequency_vectors(draws))
+        for vector in vectors:
+            vector.flags.writeable = False
+        return vectors
+
+    def frequency_vectors(self):
+        """全部历史的正码/特码计数向量 (长度50, 下标即号码; 只读)"""
+        return self.derived('frequency_vectors', self._frequency_vectors)
+
+    def frequencies(self):
+        """全部历史的正码/特码频率表 (字典格式, 返回副本)"""
+        regular_freq, special_freq = self.derived(
+            'frequencies', lambda draws: analysis.frequency_dicts(*self.frequency_vectors()))
+        return regular_freq.copy(), special_freq.copy()
+
+    def tag_annotations(self) -> Dict[str, List]:
+        """每期特别号按类别的标签标注"""
+        return self.derived('tag_annotations', lambda draws: tagging.annotate_numbers(draws.special.tolist()))
+
+    def subscribe(self, callback) -> None:
+        """订阅数据变更事件, callback(repository)"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+_repository: Optional[HistoryRepository] = None
+_repository_lock = threading.Lock()
+
+def get_repository() -> HistoryRepository:
+    """获取系统数据文件的共享仓库 (单例)"""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = HistoryRepository()
+        return _repository
+
+def _notify_history_changed() -> None:
+    """本进程写入系统数据后立即刷新共享仓库"""
+    if _repository is not None:
+        _repository.refresh()
+
 def export_history(filepath: str) -> bool:
     """导出历史数据到指定文件"""
     try:
@@ -150,6 +1363,50 @@ def export_history(filepath: str) -> bool:
         print(f"导出失败: {str(e)}")
         return False
 
+def backup_history() -> Optional[Dict]:
+    """为系统数据文件创建快照并执行保留策略
+
+    Returns:
+        Optional[Dict]: 快照条目 (含 'id'), 系统文件不存在时返回 None
+    """
+    with _writing():
+        if _use_sqlite():
+            # 数据库内容先导出为 history.csv, 快照始终是CSV格式
+            _write_draws(_sqlite_store().load(), SYSTEM_FILE)
+        store = BackupStore(BACKUP_DIR)
+        snapshot = store.snapshot(SYSTEM_FILE)
+        store.apply_retention(config.BACKUP_KEEP_LAST, config.BACKUP_KEEP_DAILY, config.BACKUP_KEEP_MONTHLY)
+    return snapshot
+
+def list_backups() -> List[Dict]:
+    """全部快照, 按创建时间从旧到新排列"""
+    return BackupStore(BACKUP_DIR).snapshots()
+
+def restore_history(snapshot_id: str = None) -> bool:
+    """将系统数据恢复为指定快照 (默认最新快照)
+
+    恢复前会先为当前数据创建快照, 以便撤销。
+    """
+    try:
+        with _writing():
+            store = BackupStore(BACKUP_DIR)
+            snapshot = store.find(snapshot_id)
+            if snapshot is None:
+                raise ValueError(f"快照不存在: {snapshot_id}")
+            if _use_sqlite():
+                _write_draws(_sqlite_store().load(), SYSTEM_FILE)
+            store.snapshot(SYSTEM_FILE)
+            store.restore(SYSTEM_FILE, snapshot['id'])
+            if _use_sqlite():
+                _sqlite_store().replace_all(_read_history_file(SYSTEM_FILE))
+            store.apply_retention(config.BACKUP_KEEP_LAST, config.BACKUP_KEEP_DAILY, config.BACKUP_KEEP_MONTHLY)
+            _sync_archive()
+    except Exception as e:
+        print(f"恢复数据失败: {str(e)}")
+        return False
+    _notify_history_changed()
+    return True
+
 def initialize_data():
     """初始化所有数据，清空历史记录"""
     try:
@@ -157,24 +1414,21 @@ def initialize_data():
         os.makedirs(DATA_DIR, exist_ok=True)
         os.makedirs(BACKUP_DIR, exist_ok=True)
         
-        # 备份现有数据
-        if os.path.exists(SYSTEM_FILE):
-            backup_name = f"history_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            backup_path = os.path.join(BACKUP_DIR, backup_name)
-            shutil.copy2(SYSTEM_FILE, backup_path)
+        with _writing():
+            # 备份现有数据 (内容未变化时不产生新文件)
+            backup_history()
             
-            # 删除现有文件
-            os.remove(SYSTEM_FILE)
-        
-        # 创建新的空文件，只写入表头
-        with open(SYSTEM_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
-            writer.writeheader()
-        
-        # 确保文件被正确创建和清空
-        if not os.path.exists(SYSTEM_FILE):
-            raise IOError("Failed to create new system file")
+            # 原子替换为只有表头的新文件
+            _save_to_file([], SYSTEM_FILE)
+            if _use_sqlite():
+                _sqlite_store().replace_all(DrawMatrix.empty())
             
+            # 确保文件被正确创建和清空
+            if not os.path.exists(SYSTEM_FILE):
+                raise IOError("Failed to create new system file")
+
+            _sync_archive()
+        _notify_history_changed()
         return True
     except Exception as e:
         print(f"初始化数据失败: {str(e)}")
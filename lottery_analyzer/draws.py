@@ -0,0 +1,493 @@
+"""列式开奖数据存储
+
+DrawMatrix 把开奖历史保存为几个等长的 NumPy 列:
+    - numbers:  N×6 uint8 正码矩阵 (保持原始输入顺序)
+    - special:  N uint8 特别号向量
+    - draw_ids: N int64 期号向量 (由 'date' 字段规范化得到)
+    - dates:    N 原始期号/日期字符串, 用于还原旧的字典格式
+    - masks:    N uint64 正码位图 (第 n 位表示号码 n, 首次访问时计算并缓存)
+
+分析和预测函数直接在这些数组上做向量运算, 不再逐条查字典。
+"最近N期" 通过 DrawMatrix.window(N) 得到 HistoryWindow 视图 (O(1) 构造),
+窗口上的计数等聚合结果只计算一次, 同一次预测中的各评分函数共享。
+DrawMatrix.count_table() 建立计数前缀和表后, 任意窗口的计数只需一次向量减法。
+旧代码仍可通过 to_dicts() 或直接迭代得到 {'date', 'numbers', 'special'} 字典。
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from .config import MIN_NUMBER, MAX_NUMBER, NUM_REGULAR
+
+# 计数向量长度: 下标即号码, 0 号位空置
+COUNT_SIZE = MAX_NUMBER + 1
+
+
+def normalize_draw_id(value) -> int:
+    """将期号/日期字符串规范化为整数期号
+
+    只保留其中的数字: '2025001' -> 2025001, '2023-01-01' -> 20230101。
+    不含任何数字时返回 -1。
+    """
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return int(value)
+    digits = ''.join(ch for ch in str(value) if ch.isdigit())
+    return int(digits) if digits else -1
+
+
+def _normalize_draw_ids(dates: np.ndarray) -> np.ndarray:
+    """批量规范化期号 (全为数字时整列一次转换)"""
+    if dates.size and np.char.isdigit(dates).all() and dates.dtype.itemsize // 4 <= 18:
+        return dates.astype(np.int64)
+    return np.array([normalize_draw_id(d) for d in dates.tolist()], dtype=np.int64)
+
+
+def record_dtype(date_width: int = 16) -> np.dtype:
+    """二进制缓存使用的定长记录格式"""
+    return np.dtype([
+        ('draw_id', '<i8'),
+        ('numbers', 'u1', (NUM_REGULAR,)),
+        ('special', 'u1'),
+        ('date', f'<U{date_width}'),
+    ])
+
+
+# 组合键: 低 50 位为正码位图 (第 n 位表示号码 n), 其上存放特别号
+SPECIAL_SHIFT = COUNT_SIZE
+
+
+def numbers_to_mask(numbers: Iterable[int]) -> int:
+    """号码集合 -> 位图 (第 n 位表示号码 n)"""
+    mask = 0
+    for num in numbers:
+        mask |= 1 << int(num)
+    return mask
+
+
+def combination_key(numbers: Iterable[int], special: int) -> int:
+    """号码组合的规范化键 (与正码顺序无关)"""
+    return numbers_to_mask(numbers) | (int(special) << SPECIAL_SHIFT)
+
+
+def _popcount_swar(values: np.ndarray) -> np.ndarray:
+    """并行位计数 (SWAR), 用于没有 np.bitwise_count 的 NumPy (< 2.0)"""
+    x = values.astype(np.uint64)
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.uint8)
+
+
+def popcount(values) -> np.ndarray:
+    """uint64 数组逐元素的置位个数 (uint8)"""
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _popcount_swar(values)
+
+
+def overlap_counts(masks: np.ndarray, ticket) -> np.ndarray:
+    """每期与 ticket 相同的正码个数
+
+    Args:
+        masks: 各期正码位图 (DrawMatrix.masks)
+        ticket: 号码列表或位图
+    """
+    if not isinstance(ticket, (int, np.integer)):
+        ticket = numbers_to_mask(ticket)
+    return popcount(masks & np.uint64(ticket))
+
+
+def repeat_counts(masks: np.ndarray) -> np.ndarray:
+    """每期与上一期相同的正码个数 (第一期为 0)"""
+    repeats = np.zeros(len(masks), dtype=np.uint8)
+    if len(masks) > 1:
+        repeats[1:] = popcount(masks[1:] & masks[:-1])
+    return repeats
+
+
+def count_sharing(masks: np.ndarray, ticket, k: int) -> int:
+    """与 ticket 至少有 k 个相同正码的期数"""
+    return int(np.count_nonzero(overlap_counts(masks, ticket) >= k))
+
+
+def is_valid_draw(draw) -> bool:
+    """记录是否包含 6 个 1-49 的整数正码和一个 1-49 的特别号"""
+    if not isinstance(draw, dict):
+        return False
+    nums = draw.get('numbers')
+    return (isinstance(nums, (list, tuple)) and len(nums) == NUM_REGULAR
+            and all(_is_valid_number(n) for n in nums)
+            and _is_valid_number(draw.get('special')))
+
+
+def _is_valid_number(num) -> bool:
+    return (isinstance(num, (int, np.integer)) and not isinstance(num, bool)
+            and MIN_NUMBER <= num <= MAX_NUMBER)
+
+
+class DrawMatrix:
+    """列式开奖历史 (行顺序与数据文件一致)"""
+
+    __slots__ = ('numbers', 'special', 'draw_ids', 'dates', '_masks', '_windows', '_table')
+
+    def __init__(self, numbers, special, draw_ids=None, dates=None):
+        numbers = np.asarray(numbers, dtype=np.uint8)
+        if numbers.size == 0:
+            numbers = numbers.reshape(0, NUM_REGULAR)
+        if numbers.ndim != 2 or numbers.shape[1] != NUM_REGULAR:
+            raise ValueError(f"正码矩阵形状错误: {numbers.shape}, 需要 (N, {NUM_REGULAR})")
+        special = np.asarray(special, dtype=np.uint8).reshape(-1)
+        n = numbers.shape[0]
+        if special.shape[0] != n:
+            raise ValueError("特别号数量与开奖期数不一致")
+
+        if dates is None:
+            dates = np.array([str(i) for i in range(n)] if draw_ids is None
+                             else [str(int(i)) for i in draw_ids], dtype=str)
+        else:
+            dates = np.asarray(dates, dtype=str)
+        if draw_ids is None:
+            draw_ids = _normalize_draw_ids(dates)
+        draw_ids = np.asarray(draw_ids, dtype=np.int64).reshape(-1)
+        if draw_ids.shape[0] != n or dates.shape[0] != n:
+            raise ValueError("期号数量与开奖期数不一致")
+
+        self.numbers = numbers
+        self.special = special
+        self.draw_ids = draw_ids
+        self.dates = dates
+        self._masks = None
+        self._windows = None
+        self._table = None
+
+    # ------------------------------------------------------------------
+    # 构造与转换
+    # ------------------------------------------------------------------
+    @classmethod
+    def empty(cls) -> 'DrawMatrix':
+        return cls(np.empty((0, NUM_REGULAR), dtype=np.uint8),
+                   np.empty(0, dtype=np.uint8),
+                   np.empty(0, dtype=np.int64),
+                   np.empty(0, dtype=str))
+
+    @classmethod
+    def from_dicts(cls, history: Optional[Iterable[dict]]) -> 'DrawMatrix':
+        """由旧的字典列表构造
+
+        不完整或号码越界的记录会被跳过 (需要 6 个 1-49 的整数正码和一个 1-49 的特别号)。
+        """
+        numbers, special, dates = [], [], []
+        for draw in history or []:
+            if not is_valid_draw(draw):
+                continue
+            numbers.append(draw['numbers'])
+            special.append(draw['special'])
+            dates.append(str(draw.get('date', '')))
+        if not numbers:
+            return cls.empty()
+        return cls(numbers, special, dates=dates)
+
+    def to_dicts(self) -> List[Dict]:
+        """转换为旧的字典列表格式"""
+        return [
+            {'date': date, 'numbers': nums, 'special': spec}
+            for date, nums, spec in zip(self.dates.tolist(),
+                                        self.numbers.tolist(),
+                                        self.special.tolist())
+        ]
+
+    @classmethod
+    def from_records(cls, records: np.ndarray) -> 'DrawMatrix':
+        """由定长记录数组构造 (各列为记录数组字段的视图, 支持内存映射)"""
+        return cls(records['numbers'], records['special'], records['draw_id'], records['date'])
+
+    def to_records(self) -> np.ndarray:
+        """转换为定长记录数组, 用于二进制缓存文件"""
+        width = max(1, int(self.dates.dtype.itemsize // 4))
+        records = np.empty(len(self), dtype=record_dtype(width))
+        records['draw_id'] = self.draw_ids
+        records['numbers'] = self.numbers
+        records['special'] = self.special
+        records['date'] = self.dates
+        return records
+
+    @classmethod
+    def concatenate(cls, blocks: Iterable['DrawMatrix']) -> 'DrawMatrix':
+        """按行拼接多个 DrawMatrix (一次性复制, 用于合并分块读取的结果)"""
+        blocks = [block for block in blocks if len(block)]
+        if not blocks:
+            return cls.empty()
+        if len(blocks) == 1:
+            return blocks[0]
+        result = cls(np.concatenate([b.numbers for b in blocks]),
+                     np.concatenate([b.special for b in blocks]),
+                     np.concatenate([b.draw_ids for b in blocks]),
+                     np.concatenate([b.dates for b in blocks]))
+        if all(b._masks is not None for b in blocks):
+            result._masks = np.concatenate([b._masks for b in blocks])
+        return result
+
+    def concat(self, other: 'DrawMatrix') -> 'DrawMatrix':
+        """按行拼接两个 DrawMatrix"""
+        result = DrawMatrix(np.concatenate([self.numbers, other.numbers]),
+                            np.concatenate([self.special, other.special]),
+                            np.concatenate([self.draw_ids, other.draw_ids]),
+                            np.concatenate([self.dates, other.dates]))
+        if self._masks is not None and other._masks is not None:
+            result._masks = np.concatenate([self._masks, other._masks])
+        return result
+
+    # ------------------------------------------------------------------
+    # 序列协议 (兼容按字典读取的旧代码)
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self.numbers.shape[0]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_dicts())
+
+    def __getitem__(self, key) -> Union[Dict, 'DrawMatrix']:
+        if isinstance(key, (slice, np.ndarray, list)):
+            # 切片返回共享底层数组的视图, 不复制数据; 布尔/整数数组下标返回副本
+            result = DrawMatrix(self.numbers[key], self.special[key],
+                                self.draw_ids[key], self.dates[key])
+            if self._masks is not None:
+                result._masks = self._masks[key]
+            return result
+        idx = int(key)
+        return {'date': str(self.dates[idx]),
+                'numbers': self.numbers[idx].tolist(),
+                'special': int(self.special[idx])}
+
+    def __repr__(self) -> str:
+        return f"DrawMatrix({len(self)} draws)"
+
+    def count_table(self) -> 'CountTable':
+        """计数前缀和表 (首次调用时建立并缓存, 之后窗口计数都走查表)"""
+        if self._table is None or len(self._table) != len(self):
+            self._table = CountTable.from_draws(self)
+        return self._table
+
+    def extend_count_table(self, previous: 'DrawMatrix') -> bool:
+        """previous 为本数据的前缀 (如追加前的数据) 且已建表时, 只为新增的行扩展前缀和表
+
+        Returns:
+            bool: 是否成功复用 (否则需要调用 count_table() 重新建表)
+        """
+        m = len(previous)
+        table = previous._table
+        if table is None or len(table) != m or m > len(self):
+            return False
+        if not (np.array_equal(self.draw_ids[:m], previous.draw_ids)
+                and np.array_equal(self.numbers[:m], previous.numbers)
+                and np.array_equal(self.special[:m], previous.special)):
+            return False
+        self._table = table.extend(self[m:])
+        return True
+
+    def window(self, count: Optional[int] = None) -> 'HistoryWindow':
+        """最后 count 期的视图 (None 表示全部, count <= 0 为空窗口)
+
+        同一 DrawMatrix 上相同长度的窗口只创建一次, 其聚合结果在各调用方之间共享。
+        """
+        n = len(self)
+        start = 0 if count is None else n - min(n, max(0, int(count)))
+        if self._windows is None:
+            self._windows = {}
+        window = self._windows.get(start)
+        if window is None:
+            window = self._windows[start] = HistoryWindow(self, start, n)
+        return window
+
+    # ------------------------------------------------------------------
+    # 向量化统计
+    # ------------------------------------------------------------------
+    def regular_counts(self) -> np.ndarray:
+        """正码出现次数, 长度 50 的向量 (下标即号码)"""
+        return np.bincount(self.numbers.ravel(), minlength=COUNT_SIZE)[:COUNT_SIZE]
+
+    def special_counts(self) -> np.ndarray:
+        """特别号出现次数, 长度 50 的向量 (下标即号码)"""
+        return np.bincount(self.special, minlength=COUNT_SIZE)[:COUNT_SIZE]
+
+    def last_seen(self) -> np.ndarray:
+        """每个号码作为正码最近一次出现的行号, 从未出现为 -1"""
+        last = np.full(COUNT_SIZE, -1, dtype=np.int64)
+        if len(self):
+            rows = np.repeat(np.arange(len(self), dtype=np.int64), self.numbers.shape[1])
+            np.maximum.at(last, self.numbers.ravel(), rows)
+        return last
+
+    @property
+    def masks(self) -> np.ndarray:
+        """每期正码的位图 (uint64, 第 n 位表示号码 n), 首次访问时计算并缓存"""
+        if self._masks is None:
+            bits = np.left_shift(np.uint64(1), self.numbers.astype(np.uint64))
+            self._masks = (np.bitwise_or.reduce(bits, axis=1) if len(self)
+                           else np.empty(0, dtype=np.uint64))
+        return self._masks
+
+    def combination_keys(self) -> np.ndarray:
+        """每期号码组合的规范化键 (uint64), 与 combination_key() 一致"""
+        return self.masks | np.left_shift(self.special.astype(np.uint64), np.uint64(SPECIAL_SHIFT))
+
+    def overlap_counts(self, ticket) -> np.ndarray:
+        """每期与 ticket (号码列表或位图) 相同的正码个数"""
+        return overlap_counts(self.masks, ticket)
+
+    def repeat_counts(self) -> np.ndarray:
+        """每期与上一期相同的正码个数 (第一期为 0)"""
+        return repeat_counts(self.masks)
+
+    def count_sharing(self, ticket, k: int) -> int:
+        """与 ticket 至少有 k 个相同正码的期数"""
+        return count_sharing(self.masks, ticket, k)
+
+    def onehot(self) -> np.ndarray:
+        """N×50 布尔矩阵, [i, n] 表示号码 n 是否为第 i 期的正码"""
+        hot = np.zeros((len(self), COUNT_SIZE), dtype=bool)
+        if len(self):
+            hot[np.arange(len(self))[:, None], self.numbers] = True
+        return hot
+
+
+class CountTable:
+    """正码/特码出现次数的前缀和表
+
+    regular[i, n] 为前 i 期中号码 n 作为正码出现的次数 ((N+1)×50, 首行全零),
+    special 同理。[a, b) 期间的计数为 regular[b] - regular[a]。
+    计数不超过期数, 使用 int32 以减小内存 (每 100 万期约 200MB/表)。
+    """
+
+    __slots__ = ('regular', 'special')
+
+    def __init__(self, regular: np.ndarray, special: np.ndarray):
+        self.regular = regular
+        self.special = special
+
+    @staticmethod
+    def _prefix(rows: np.ndarray, columns, base: np.ndarray) -> np.ndarray:
+        """每期的出现矩阵累加到 base 行之上, 返回不含 base 的前缀和行"""
+        hot = np.zeros((rows.shape[0], COUNT_SIZE), dtype=np.int32)
+        hot[rows, columns] = 1
+        np.cumsum(hot, axis=0, out=hot)
+        hot += base
+        return hot
+
+    @classmethod
+    def empty(cls) -> 'CountTable':
+        zeros = np.zeros((1, COUNT_SIZE), dtype=np.int32)
+        return cls(zeros, zeros.copy())
+
+    @classmethod
+    def from_draws(cls, draws: DrawMatrix) -> 'CountTable':
+        return cls.empty().extend(draws)
+
+    def extend(self, draws: DrawMatrix) -> 'CountTable':
+        """在末尾追加若干期, 返回新表 (只计算新增的行)"""
+        if not len(draws):
+            return self
+        rows = np.arange(len(draws))
+        regular = self._prefix(rows[:, None], draws.numbers, self.regular[-1])
+        special = self._prefix(rows, draws.special, self.special[-1])
+        return CountTable(np.concatenate([self.regular, regular]),
+                          np.concatenate([self.special, special]))
+
+    def __len__(self) -> int:
+        """覆盖的期数"""
+        return self.regular.shape[0] - 1
+
+    def regular_counts(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """[start, stop) 期间正码出现次数 (长度50)"""
+        stop = len(self) if stop is None else stop
+        return (self.regular[stop] - self.regular[start]).astype(np.int64)
+
+    def special_counts(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """[start, stop) 期间特别号出现次数 (长度50)"""
+        stop = len(self) if stop is None else stop
+        return (self.special[stop] - self.special[start]).astype(np.int64)
+
+    def recent_counts(self, sizes, number_type: str = 'regular') -> np.ndarray:
+        """最近 k 期的计数, 对 sizes 中每个 k 各一行 (len(sizes)×50), 用于扫描窗口大小"""
+        table = self.special if number_type == 'special' else self.regular
+        n = len(self)
+        starts = n - np.clip(np.asarray(sizes, dtype=np.int64), 0, n)
+        return (table[n] - table[starts]).astype(np.int64)
+
+
+class HistoryWindow:
+    """DrawMatrix 中 [start, stop) 行的只读视图
+
+    构造只记录范围, 不复制也不扫描数据; 计数、位图等聚合结果在第一次访问时
+    计算并缓存。底层数据不可修改, 因此缓存始终有效。
+    """
+
+    __slots__ = ('source', 'start', 'stop', '_draws', '_cache')
+
+    def __init__(self, source: DrawMatrix, start: int, stop: int):
+        self.source = source
+        self.start = start
+        self.stop = stop
+        self._draws = None
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __repr__(self) -> str:
+        return f"HistoryWindow({self.start}:{self.stop} of {len(self.source)} draws)"
+
+    @property
+    def draws(self) -> DrawMatrix:
+        """窗口内的数据 (共享底层数组的 DrawMatrix 视图)"""
+        if self._draws is None:
+            self._draws = self.source[self.start:self.stop]
+            if self.source._masks is not None:
+                self._draws._masks = self.source._masks[self.start:self.stop]
+        return self._draws
+
+    def derived(self, key, factory):
+        """按 key 缓存的派生结果, factory(draws) 只计算一次"""
+        if key not in self._cache:
+            self._cache[key] = factory(self.draws)
+        return self._cache[key]
+
+    def _table(self) -> Optional[CountTable]:
+        table = self.source._table
+        return table if table is not None and len(table) == len(self.source) else None
+
+    def regular_counts(self) -> np.ndarray:
+        """窗口内正码出现次数 (长度50, 下标即号码; 有前缀和表时查表)"""
+        table = self._table()
+        if table is not None:
+            return self.derived('regular_counts', lambda draws: table.regular_counts(self.start, self.stop))
+        return self.derived('regular_counts', DrawMatrix.regular_counts)
+
+    def special_counts(self) -> np.ndarray:
+        """窗口内特别号出现次数 (长度50, 下标即号码; 有前缀和表时查表)"""
+        table = self._table()
+        if table is not None:
+            return self.derived('special_counts', lambda draws: table.special_counts(self.start, self.stop))
+        return self.derived('special_counts', DrawMatrix.special_counts)
+
+    def last_seen(self) -> np.ndarray:
+        """每个号码在窗口内最近一次出现的行号 (相对窗口起点), 未出现为 -1"""
+        return self.derived('last_seen', DrawMatrix.last_seen)
+
+    def onehot(self) -> np.ndarray:
+        """窗口的 N×50 出现矩阵"""
+        return self.derived('onehot', DrawMatrix.onehot)
+
+    @property
+    def masks(self) -> np.ndarray:
+        return self.draws.masks
+
+
+def as_draw_matrix(history) -> DrawMatrix:
+    """将历史数据统一转换为 DrawMatrix (已是 DrawMatrix 时原样返回, 窗口返回其数据视图)"""
+    if isinstance(history, DrawMatrix):
+        return history
+    if isinstance(history, HistoryWindow):
+        return history.draws
+    return DrawMatrix.from_dicts(history)
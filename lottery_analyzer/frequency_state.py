@@ -0,0 +1,94 @@
+"""可增量维护的号码频率状态
+
+FrequencyState 保存全部历史的正码/特码计数向量 (长度50, 下标即号码) 和总期数,
+追加一期只需对 7 个号码各 +1, 删除一期各 -1, 不必重新统计全部历史。
+
+状态以 JSON 保存在数据文件旁 (history.csv -> history.csv.freq.json):
+
+    {"version": 1, "source": {...}, "total_draws": 1234,
+     "regular": [0, 151, ...], "special": [0, 27, ...]}
+
+source 记录状态对应的数据版本 (文件大小和修改时间, 或 SQLite 写入计数),
+与当前数据不一致时状态作废, 由调用方重新统计。
+"""
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from .draws import COUNT_SIZE, DrawMatrix
+
+STATE_VERSION = 1
+
+
+class FrequencyState:
+    """正码/特码计数及其对应的数据版本"""
+
+    def __init__(self, regular=None, special=None, total_draws: int = 0, source: Optional[Dict] = None):
+        self.regular = (np.zeros(COUNT_SIZE, dtype=np.int64) if regular is None
+                        else np.asarray(regular, dtype=np.int64).copy())
+        self.special = (np.zeros(COUNT_SIZE, dtype=np.int64) if special is None
+                        else np.asarray(special, dtype=np.int64).copy())
+        if self.regular.shape != (COUNT_SIZE,) or self.special.shape != (COUNT_SIZE,):
+            raise ValueError("计数向量长度错误")
+        self.total_draws = int(total_draws)
+        self.source = source
+
+    @classmethod
+    def from_draws(cls, draws: DrawMatrix, source: Optional[Dict] = None) -> 'FrequencyState':
+        """全量统计 (每列一次 bincount)"""
+        return cls(draws.regular_counts(), draws.special_counts(), len(draws), source)
+
+    def _apply(self, draws: DrawMatrix, sign: int) -> None:
+        np.add.at(self.regular, draws.numbers.ravel(), sign)
+        np.add.at(self.special, draws.special, sign)
+        self.total_draws += sign * len(draws)
+
+    def add(self, draws: DrawMatrix) -> None:
+        """计入新追加的记录 (每期 7 次 +1)"""
+        self._apply(draws, 1)
+
+    def remove(self, draws: DrawMatrix) -> None:
+        """扣除被删除的记录 (每期 7 次 -1)
+
+        Raises:
+            ValueError: 扣除后出现负数 (记录并不在统计中)
+        """
+        self._apply(draws, -1)
+        if (self.regular < 0).any() or (self.special < 0).any() or self.total_draws < 0:
+            self._apply(draws, 1)
+            raise ValueError("频率状态与数据不一致: 删除的记录不在统计中")
+
+    def vectors(self) -> tuple:
+        """(正码计数, 特码计数) 的副本"""
+        return self.regular.copy(), self.special.copy()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, path: str) -> Optional['FrequencyState']:
+        """读取状态文件, 不存在、损坏或版本不符时返回 None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != STATE_VERSION:
+                return None
+            return cls(data['regular'], data['special'], data['total_draws'], data.get('source'))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path: str) -> None:
+        """原子写入状态文件 (临时文件名区分进程和线程)"""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': STATE_VERSION, 'source': self.source,
+                           'total_draws': self.total_draws,
+                           'regular': self.regular.tolist(), 'special': self.special.tolist()}, f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
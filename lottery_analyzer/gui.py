@@ -10,10 +10,12 @@ from PyQt6.QtCore import Qt
 import sys
 import os
 import requests # Added for API calls
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-import random
 import numpy as np
 
+from lottery_analyzer import config
 from lottery_analyzer import data_input
 from lottery_analyzer import analysis
 from lottery_analyzer import prediction
@@ -41,12 +43,16 @@ class LotteryAnalyzerGUI(QMainWindow):
         self.tabs = QTabWidget()
         self.main_layout.addWidget(self.tabs)
         
+        # 共享历史数据仓库: 数据文件变化时自动刷新表格
+        self.repository = data_input.get_repository()
+        
         try:
             self.init_input_tab()
             self.init_analysis_tab()
             self.init_prediction_tab()
             self.init_tags_tab()
             self.init_label_prediction_tab()
+            self.repository.subscribe(self.on_history_changed)
             
             # 自动从API刷新数据
             self.auto_refresh_from_api()
@@ -60,14 +66,18 @@ class LotteryAnalyzerGUI(QMainWindow):
         """格式化号码，个位数前面添加0"""
         return f"{num:02d}"
 
+    def on_history_changed(self, repository):
+        """历史数据变更回调"""
+        self.update_history_table()
+
     def update_history_table(self):
         """更新历史记录表格"""
         try:
-            history = data_input.load_history()
+            history = self.repository.history()
+            self.history_table.setRowCount(0)
             if not history:
                 return
             
-            self.history_table.setRowCount(0)
             history.sort(key=lambda x: x['date'], reverse=True)
             
             for draw in history:
@@ -134,10 +144,7 @@ class LotteryAnalyzerGUI(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             try:
                 if data_input.initialize_data():
-                    # 清空表格显示
-                    self.history_table.setRowCount(0)
-                    # 重新加载空表格
-                    self.update_history_table()
+                    # 表格由仓库变更通知自动清空
                     self.statusBar.showMessage("数据已初始化，备份文件保存在data/backup目录")
                     # 清空输入框
                     if hasattr(self, 'draw_id_input'):
@@ -161,9 +168,13 @@ class LotteryAnalyzerGUI(QMainWindow):
         )
         if file_path:
             try:
-                data_input.load_history(file_path, merge=True)  # 合并到系统数据
-                self.update_history_table()
-                self.statusBar.showMessage(f"已导入: {file_path}")
+                report = data_input.import_history(file_path)  # 按期号归并, 表格自动刷新
+                self.statusBar.showMessage(f"已导入: {file_path} ({report.summary()})")
+                if report.conflicts:
+                    details = "\n".join(f"{item['draw_id']}: {item['incoming']}"
+                                        for item in report.conflicts[:20])
+                    QMessageBox.information(self, "导入冲突",
+                                            f"{len(report.conflicts)} 条记录存在冲突, 未导入:\n{details}")
             except Exception as e:
                 QMessageBox
 
@@ -219,7 +230,7 @@ class LotteryAnalyzerGUI(QMainWindow):
             self.results_table.setRowCount(0)
             num_groups = self.num_predictions.value()
             
-            history = data_input.load_history()
+            history = self.repository.draws
             if not history:
                 QMessageBox.warning(self, "警告", "没有历史数据，预测将基于随机或有限数据")
             
@@ -234,90 +245,79 @@ class LotteryAnalyzerGUI(QMainWindow):
                     f"历史数据仅有 {max_history} 期，将使用全部可用数据进行预测。")
             
             method = self.pred_method.currentText()
+            # 各组共享一次特征计算
+            context = prediction.PredictionContext(history, *self.repository.frequency_vectors())
             
-            for group in range(num_groups):
-                # 读取种子并设置（放在最前面）
-                seed_str = self.seed_input.text().strip()
-                try:
-                    seed = int(seed_str)
-                except Exception:
-                    seed = 42
-                random.seed(seed)
-                np.random.seed(seed)
-                
-                if method == "综合预测":
-                    result = prediction.predict_all_methods(
-                        history,
-                        num_to_predict=6,
-                        recent_draws_count=recent_draws,
-                        tag_trend_draws=tag_trend_draws
-                    )
-                    self._add_prediction_results(f"第{group+1}组综合预测", result)
-                    # 显示各方法的预测结果
-                    for method_name, method_result in result['method_results'].items():
-                        self._add_prediction_results(f"  {method_name}", method_result)
-
-                    # Add label predictions to the same table for "综合预测"
-                    label_predictions = result.get('label_predictions')
-                    if label_predictions:
-                        # Add a header row for label predictions
-                        row = self.results_table.rowCount()
-                        self.results_table.insertRow(row)
-                        header_item = QTableWidgetItem("--- 标签预测 ---")
-                        header_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.results_table.setItem(row, 0, header_item)
-                        if self.results_table.columnCount() > 0: # Ensure there are columns
-                             self.results_table.setSpan(row, 0, 1, self.results_table.columnCount())
-
-                        for category, tags_list in label_predictions.items():
+            # 读取种子: 每组使用由它派生的独立种子 (SeedSequence.spawn),
+            # 结果可复现, 并且与并行调度顺序无关
+            seed_str = self.seed_input.text().strip()
+            try:
+                seed = int(seed_str)
+            except Exception:
+                seed = 42
+            
+            if method == "综合预测":
+                group_seeds = np.random.SeedSequence(seed).spawn(num_groups)
+                # 配置了线程数时各组的全部方法先提交到共享线程池并行计算, 否则串行计算; 按组顺序显示
+                workers = config.PREDICTION_WORKERS or 1
+                with ThreadPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+                    results = [
+                        prediction.predict_all_methods(
+                            history,
+                            num_to_predict=6,
+                            recent_draws_count=recent_draws,
+                            tag_trend_draws=tag_trend_draws,
+                            context=context,
+                            seed=group_seeds[group],
+                            executor=pool
+                        )
+                        for group in range(num_groups)
+                    ]
+                    for group, result in enumerate(results):
+                        self._add_prediction_results(f"第{group+1}组综合预测", result)
+                        # 显示各方法的预测结果: 结果按需计算, 每算完一个方法就刷新表格
+                        for method_name, method_result in result['method_results'].items():
+                            self._add_prediction_results(f"  {method_name}", method_result)
+                            QApplication.processEvents()
+
+                        # Add label predictions to the same table for "综合预测"
+                        label_predictions = result.get('label_predictions')
+                        if label_predictions:
+                            # Add a header row for label predictions
                             row = self.results_table.rowCount()
                             self.results_table.insertRow(row)
-
-                            self.results_table.setItem(row, 0, QTableWidgetItem(category))
-                            tags_str = ", ".join(tags_list) if tags_list else "无"
-                            self.results_table.setItem(row, 1, QTableWidgetItem(tags_str))
-                            self.results_table.setItem(row, 2, QTableWidgetItem("")) # Empty for the third column
-                else:
-                    # 单一方法预测
-                    prediction_method_func = self._get_prediction_method(method)
-                    num_predict_val = 6 # Placeholder, ideally from a UI element if it exists for this granularity
-                                        # For now, using 6 as it was in the original code.
-
-                    if method == "基础预测":
-                        reg_freq, spec_freq = analysis.calculate_frequencies(history)
-                        result = prediction_method_func(
-                            history_data=history,
-                            regular_freq=reg_freq,
-                            special_freq=spec_freq,
-                            num_to_predict=num_predict_val,
-                            recent_draws_count=recent_draws # recent_draws is from self.recent_draws.value()
-                        )
-                    elif method == "标签预测":
-                        reg_freq, spec_freq = analysis.calculate_frequencies(history)
-                        result = prediction_method_func(
-                            history_data=history,
-                            regular_freq=reg_freq,
-                            special_freq=spec_freq,
-                            number_tags=tagging.number_tags, # tagging is imported in gui.py
-                            num_to_predict=num_predict_val,
-                            recent_draws_count=recent_draws, # recent_draws is from self.recent_draws.value()
-                            tag_trend_draws=tag_trend_draws # tag_trend_draws is from self.tag_trend_draws.value()
-                        )
-                    elif method in ["马尔可夫预测", "贝叶斯预测", "时间序列预测"]: # These use predict_numbers_advanced
-                        result = prediction_method_func(
-                            history, # This will be args[0] in the lambda
-                            num_to_predict=num_predict_val
-                        )
-                    elif method == "灰度预测": # This uses predict_using_grey_model
-                        result = prediction_method_func(
-                            history_data=history,
-                            num_to_predict=num_predict_val
-                        )
-                    else:
-                        # Fallback or error for unknown method if any, though ComboBox should prevent this.
-                        QMessageBox.warning(self, "错误", f"未知的预测方法: {method}")
-                        continue # Skip this group
-
+                            header_item = QTableWidgetItem("--- 标签预测 ---")
+                            header_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                            self.results_table.setItem(row, 0, header_item)
+                            if self.results_table.columnCount() > 0: # Ensure there are columns
+                                 self.results_table.setSpan(row, 0, 1, self.results_table.columnCount())
+
+                            for category, tags_list in label_predictions.items():
+                                row = self.results_table.rowCount()
+                                self.results_table.insertRow(row)
+
+                                self.results_table.setItem(row, 0, QTableWidgetItem(category))
+                                tags_str = ", ".join(tags_list) if tags_list else "无"
+                                self.results_table.setItem(row, 1, QTableWidgetItem(tags_str))
+                                self.results_table.setItem(row, 2, QTableWidgetItem("")) # Empty for the third column
+            else:
+                method_key = self._get_prediction_method(method)
+                if method_key in prediction.DETERMINISTIC_METHODS and num_groups > 1:
+                    QMessageBox.information(self, "提示",
+                        f"{method}为确定性方法, 只生成一组固定的预测号码。")
+                    num_groups = 1
+                # 单一方法: 模型得分只计算一次, 全部分组一次向量化抽样
+                groups = prediction.predict_groups(
+                    history,
+                    method_key,
+                    num_groups,
+                    seed,
+                    num_to_predict=6,
+                    recent_draws_count=recent_draws,
+                    tag_trend_draws=tag_trend_draws,
+                    context=context
+                )
+                for group, result in enumerate(groups):
                     self._add_prediction_results(f"第{group+1}组 ({method})", result) # Added method name for clarity
             
             self.statusBar.showMessage("预测完成")
@@ -339,14 +339,14 @@ class LotteryAnalyzerGUI(QMainWindow):
         self.results_table.setItem(row, 2, QTableWidgetItem(spec_num))
 
     def _get_prediction_method(self, method_name: str):
-        """获取对应的预测方法"""
+        """获取对应的预测方法名 (prediction.predict_groups 的 method 参数)"""
         method_map = {
-            "基础预测": prediction.predict_numbers_basic,
-            "标签预测": prediction.predict_numbers_with_tags,
-            "马尔可夫预测": lambda *args, **kwargs: prediction.predict_numbers_advanced(history_data=args[0], method="markov", **kwargs),
-            "贝叶斯预测": lambda *args, **kwargs: prediction.predict_numbers_advanced(history_data=args[0], method="bayes", **kwargs),
-            "时间序列预测": lambda *args, **kwargs: prediction.predict_numbers_advanced(history_data=args[0], method="timeseries", **kwargs),
-            "灰度预测": prediction.predict_using_grey_model
+            "基础预测": "basic",
+            "标签预测": "tags",
+            "马尔可夫预测": "markov",
+            "贝叶斯预测": "bayes",
+            "时间序列预测": "timeseries",
+            "灰度预测": "grey"
         }
         return method_map.get(method_name)
 
@@ -380,7 +380,7 @@ class LotteryAnalyzerGUI(QMainWindow):
                     
                 # Load existing history
                 try:
-                    history = data_input.load_history()
+                    history = self.repository.history()
                 except Exception as e:
                     QMessageBox.critical(self, "错误", f"加载本地历史数据失败: {str(e)}")
                     self.statusBar.showMessage("加载本地历史数据失败")
@@ -438,18 +438,14 @@ class LotteryAnalyzerGUI(QMainWindow):
                     self.statusBar.showMessage("没有新的开奖数据")
                     return
 
-                # Append new records to history and save
-                # The history object is modified in place by extend
-                history.extend(new_records_to_add)
+                # Append only the new records; existing rows are left untouched
                 try:
-                    # save_history should take the entire dataset and overwrite the file
-                    data_input.save_history(history)
+                    new_draws_added_count = data_input.append_draws(new_records_to_add)
                 except Exception as e:
                     QMessageBox.critical(self, "错误", f"保存合并后的历史数据失败: {str(e)}")
                     self.statusBar.showMessage("保存历史数据失败")
                     return
 
-                self.update_history_table() # Refresh the UI table
                 QMessageBox.information(self, "成功", f"成功从API获取并添加了 {new_draws_added_count} 条新记录。")
                 self.statusBar.showMessage(f"成功添加 {new_draws_added_count} 条新记录")
 
@@ -799,7 +795,7 @@ class LotteryAnalyzerGUI(QMainWindow):
             self.label_results_table.setRowCount(0)
             self.statusBar.showMessage("正在进行标签预测...")
 
-            history = data_input.load_history()
+            history = self.repository.draws
             if not history:
                 QMessageBox.warning(self, "数据不足", "没有历史数据可用于预测标签。")
                 self.statusBar.showMessage("标签预测失败：数据不足")
@@ -814,6 +810,7 @@ class LotteryAnalyzerGUI(QMainWindow):
             # This is not controlled by the label prediction tab UI.
             tag_trend_draws_for_number_prediction_with_tags = 20
 
+            # 结果按需计算: 只读取 label_predictions, 因此只运行 predict_tags
             all_preds_result = prediction.predict_all_methods(
                 history_data=history,
                 num_to_predict=num_to_predict_default,
@@ -900,38 +897,37 @@ class LotteryAnalyzerGUI(QMainWindow):
     def handle_analysis(self):
         """处理数据分析请求"""
         try:
-            history = data_input.load_history()
+            history = self.repository.draws
             if not history:
                 raise ValueError("没有历史数据")
             
             periods = self.periods_spin.value()
-            history = history[-periods:] if len(history) > periods else history
+            history = history.window(periods)  # 视图, 计数结果缓存在窗口上
             
-            reg_freq, spec_freq = analysis.calculate_frequencies(history)
+            # 正码/特码计数向量叠成 2×50 矩阵, 一次批量 top-k
+            counts = np.vstack(analysis.frequency_vectors(history))
+            top_numbers, top_counts = analysis.top_k_numbers(counts, self.top_n.value())
+            # 当前遗漏基于全部历史, 由仓库增量维护
+            gaps = (self.repository.gap_statistics('regular').current_gaps(),
+                    self.repository.gap_statistics('special').current_gaps())
             
             self.result_table.setRowCount(0)
             analysis_type = self.analysis_type.currentText()
-            top_n = self.top_n.value()
             
-            if analysis_type in ["全部", "正码"]:
-                most_freq = analysis.get_most_frequent(reg_freq, top_n)
-                for num, freq in most_freq:
-                    row = self.result_table.rowCount()
-                    self.result_table.insertRow(row)
-                    self.result_table.setItem(row, 0, QTableWidgetItem(f"{num:02d}"))
-                    self.result_table.setItem(row, 1, QTableWidgetItem(str(freq)))
-                    percent = (freq / sum(reg_freq.values())) * 100
-                    self.result_table.setItem(row, 2, QTableWidgetItem(f"{percent:.2f}%"))
-            
-            if analysis_type in ["全部", "特码"]:
-                most_freq = analysis.get_most_frequent(spec_freq, top_n)
-                for num, freq in most_freq:
+            for i, label in enumerate(["正码", "特码"]):
+                if analysis_type not in ["全部", label]:
+                    continue
+                total = counts[i].sum()
+                for num, freq in zip(top_numbers[i].tolist(), top_counts[i].tolist()):
+                    if not freq:
+                        continue
                     row = self.result_table.rowCount()
                     self.result_table.insertRow(row)
                     self.result_table.setItem(row, 0, QTableWidgetItem(f"{num:02d}"))
                     self.result_table.setItem(row, 1, QTableWidgetItem(str(freq)))
-                    percent = (freq / sum(spec_freq.values())) * 100
+                    percent = (freq / total) * 100
                     self.result_table.setItem(row, 2, QTableWidgetItem(f"{percent:.2f}%"))
+                    self.result_table.setItem(row, 3, QTableWidgetItem(f"{gaps[i][num]}期前"))
             
             self.statusBar.showMessage("分析完成")
             
@@ -942,11 +938,11 @@ class LotteryAnalyzerGUI(QMainWindow):
     def handle_visualization(self):
         """处理可视化请求"""
         try:
-            history = data_input.load_history()
+            history = self.repository.draws
             if not history:
                 raise ValueError("没有历史数据")
             
-            reg_freq, spec_freq = analysis.calculate_frequencies(history)
+            reg_freq, spec_freq = self.repository.frequencies()
             
             # 创建图表保存目录
             plot_path = os.path.join("data", "analysis_plots")
@@ -1017,19 +1013,14 @@ class LotteryAnalyzerGUI(QMainWindow):
                 'special': special
             }
             
-            # 加载现有数据
-            history = data_input.load_history()
-            
             # 检查期号是否已存在
-            if any(draw['date'] == draw_id for draw in history):
+            history = self.repository.draws
+            if draw_id in history.dates.tolist():
                 raise ValueError(f"期号 {draw_id} 已存在")
                 
-            # 添加新记录
-            history.append(new_draw)
-            data_input.save_history(history)
-            
-            # 更新界面显示
-            self.update_history_table()
+            # 追加新记录
+            if not data_input.append_draws([new_draw]):
+                raise ValueError(f"期号 {draw_id} 的记录未通过校验")
             
             # 提交成功后自动递增期号
             self.increment_draw_id()
@@ -1048,7 +1039,7 @@ class LotteryAnalyzerGUI(QMainWindow):
     def _set_initial_draw_id(self):
         """设置初始期号"""
         try:
-            history = data_input.load_history()
+            history = self.repository.history()
             if history:
                 # 获取最新的期号
                 latest_id = max(int(draw['date']) for draw in history)
@@ -1104,13 +1095,13 @@ class LotteryAnalyzerGUI(QMainWindow):
             )
             
             if reply == QMessageBox.StandardButton.Yes:
-                # 从数据文件中删除
-                history = data_input.load_history()
-                history = [draw for draw in history if draw['date'] != draw_id]
-                data_input.save_history(history)
-                
-                # 从表格中删除
-                self.history_table.removeRow(current_row)
+                # 从数据文件中删除 (频率状态增量更新, 表格由仓库变更通知刷新)
+                if data_input.delete_draws([draw_id]) == 0:
+                    # 数据文件已被其他程序修改: 重新加载表格, 不报告删除成功
+                    self.repository.refresh()
+                    QMessageBox.warning(self, "警告", f"数据中没有期号 {draw_id} 的记录, 未删除任何记录")
+                    self.statusBar.showMessage(f"未删除期号 {draw_id} 的记录")
+                    return
                 self.statusBar.showMessage(f"已删除期号 {draw_id} 的记录")
                 
         except Exception as e:
@@ -1135,7 +1126,7 @@ class LotteryAnalyzerGUI(QMainWindow):
 
                 # Load existing history
                 try:
-                    history = data_input.load_history()
+                    history = self.repository.history()
                 except Exception:
                     history = []
 
@@ -1183,9 +1174,8 @@ class LotteryAnalyzerGUI(QMainWindow):
                         continue
 
                 if new_records_to_add:
-                    history.extend(new_records_to_add)
                     try:
-                        data_input.save_history(history)
+                        new_draws_added_count = data_input.append_draws(new_records_to_add)
                         self.statusBar.showMessage(f"启动时自动更新：新增{new_draws_added_count}条记录")
                     except Exception as e:
                         print(f"自动更新保存失败: {str(e)}")
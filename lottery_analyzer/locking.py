@@ -0,0 +1,161 @@
+"""跨进程的建议性文件锁与写入计数
+
+- FileLock: 基于 fcntl.flock (POSIX) 或 msvcrt.locking (Windows) 的排他锁,
+  同一进程内可重入 (嵌套的写操作只在最外层真正加锁/解锁)。
+  持有锁的进程退出时操作系统自动释放锁, 不会留下死锁。
+- GenerationCounter: 写入计数文件 (顺序锁)。写操作开始时计数变为奇数,
+  结束时变为偶数; 读者无需加锁, 读取前后计数相同且为偶数即说明读到的是一致的数据。
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 等待锁时的轮询间隔 (秒)
+POLL_INTERVAL = 0.01
+
+
+class FileLock:
+    """path 指向的锁文件上的排他锁 (可重入, 可用作上下文管理器)
+
+    Args:
+        path: 锁文件路径 (不存在时自动创建, 内容无意义)
+        timeout: 等待锁的最长秒数, None 表示一直等待
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._pid = None
+        self._owner = None
+
+    @property
+    def depth(self) -> int:
+        """当前线程持有锁的嵌套层数 (未持有时为 0)"""
+        if self._owner == threading.get_ident() and self._pid == os.getpid():
+            return self._depth
+        return 0
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(self, fd: int) -> None:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """获取锁
+
+        Raises:
+            TimeoutError: 超时仍未获得锁
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"等待文件锁超时: {self.path}")
+        try:
+            if self._pid != os.getpid():
+                # fork 后子进程不继承父进程持有的锁
+                self._depth, self._fd = 0, None
+            if self._depth == 0:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                while not self._try_lock(fd):
+                    if deadline is not None and time.monotonic() >= deadline:
+                        os.close(fd)
+                        raise TimeoutError(f"等待文件锁超时: {self.path}")
+                    time.sleep(POLL_INTERVAL)
+                self._fd, self._pid = fd, os.getpid()
+            self._owner = threading.get_ident()
+            self._depth += 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self) -> None:
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                fd, self._fd, self._owner = self._fd, None, None
+                try:
+                    self._unlock(fd)
+                finally:
+                    os.close(fd)
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+_locks: Dict[str, FileLock] = {}
+_locks_lock = threading.Lock()
+
+
+def get_lock(path: str, timeout: Optional[float] = None) -> FileLock:
+    """按路径共享的锁实例 (同一进程内对同一文件的嵌套加锁可重入)"""
+    path = os.path.abspath(path)
+    with _locks_lock:
+        if path not in _locks:
+            _locks[path] = FileLock(path, timeout)
+        lock = _locks[path]
+        lock.timeout = timeout
+        return lock
+
+
+class GenerationCounter:
+    """保存在 path 文件中的写入计数 (奇数表示正在写入)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> int:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def write(self, value: int) -> None:
+        """原子地写入计数 (临时文件 + os.replace)"""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(value))
+        os.replace(tmp_path, self.path)
+
+    def begin(self) -> int:
+        """标记写入开始, 返回写入结束后应设置的偶数值"""
+        value = self.read()
+        if value % 2 == 0:
+            value += 1
+        # 上次写入中途崩溃时计数已是奇数, 直接沿用
+        self.write(value)
+        return value + 1
+
+    def end(self, value: int) -> None:
+        self.write(value)
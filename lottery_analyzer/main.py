@@ -4,8 +4,8 @@ from datetime import datetime
 import sys
 from typing import Dict, List, Optional, Any
 from argparse import Namespace
-import random
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 # Project modules
 from lottery_analyzer import config  # 确保引入config模块
@@ -86,24 +86,12 @@ def handle_add_draw(args: Namespace) -> None:
         'special': special_number
     }
 
-    # Load existing history
+    # Append the new draw; existing rows are validated once and never rewritten
     try:
-        history = data_input.load_history(config.DATA_FILE_PATH)
-    except ValueError as e:
-        # Handle cases where the history file might be corrupt or not loadable
-        # For this fix, we'll assume a fresh start if loading fails,
-        # or you could choose to abort.
-        print(f"Warning: Could not load existing history: {e}. Starting with new draw as the only entry.")
-        history = []
-
-    # Append the new draw
-    history.append(new_draw)
-
-    # Save the updated history
-    # data_input.save_history expects a list of draws
-    try:
-        data_input.save_history(history, config.DATA_FILE_PATH)
-        print(f"Successfully added draw for date {date_str} and saved updated history.")
+        if data_input.append_draws([new_draw]):
+            print(f"Successfully added draw for date {date_str} and saved updated history.")
+        else:
+            print(f"Error: Draw for date {date_str} was rejected by validation.")
     except IOError as e:
         print(f"Error: Failed to save history: {e}")
         # Optionally, you might want to revert the history.append(new_draw) here
@@ -116,35 +104,62 @@ def format_number(num: int) -> str:
 def handle_predict(args):
     """处理预测命令"""
     print("Action: Predict numbers...")
-    history = data_input.load_history(DATA_FILE_PATH)
+    repository = data_input.get_repository()
+    history = repository.draws
     if not history:
         print("Warning: No history data found. Predictions will be based on random fallback or very limited data.")
         return
 
-    reg_freq, spec_freq = analysis.calculate_frequencies(history)
-    
-    print(f"\n=== 生成 {args.num_predictions} 组预测号码 ===\n")
-    
-    for i in range(args.num_predictions):
-        # 设置随机种子，保证每次预测一致
-        random.seed(42)
-        np.random.seed(42)
-        print(f"\n--- 第 {i+1} 组预测 ---")
-        if args.method == "all":
-            # 使用所有预测方法的综合结果
-            prediction_result = prediction.predict_all_methods(
+    reg_freq, spec_freq = repository.frequency_vectors()
+    # 各组共享一次特征计算
+    context = prediction.PredictionContext(history, reg_freq, spec_freq)
+
+    num_predictions = args.num_predictions
+    if args.method in prediction.DETERMINISTIC_METHODS and num_predictions > 1:
+        print(f"Note: {args.method} 为确定性方法, 只生成一组固定的预测号码。")
+        num_predictions = 1
+
+    print(f"\n=== 生成 {num_predictions} 组预测号码 ===\n")
+
+    # 每组使用由 --seed 派生的独立种子, 结果可复现且与并行调度顺序无关
+    if args.method == "all":
+        group_seeds = np.random.SeedSequence(args.seed).spawn(num_predictions)
+        # 指定了线程数时全部分组的各方法一次性提交到共享线程池, 否则串行计算; 按组顺序输出
+        workers = args.workers or config.PREDICTION_WORKERS or 1
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        results = [
+            prediction.predict_all_methods(
                 history_data=history, # Pass history directly
                 num_to_predict=args.num_to_predict,
                 recent_draws_count=args.recent_draws,
-                tag_trend_draws=args.tag_trend_draws
+                tag_trend_draws=args.tag_trend_draws,
+                context=context,
+                seed=group_seeds[i],
+                executor=executor
             )
+            for i in range(num_predictions)
+        ]
+        if executor is not None:
+            executor.shutdown(wait=False)
+    else:
+        # 单一方法: 模型得分只计算一次, 全部分组一次向量化抽样
+        results = prediction.predict_groups(
+            history, args.method, num_predictions, args.seed,
+            num_to_predict=args.num_to_predict,
+            recent_draws_count=args.recent_draws,
+            tag_trend_draws=args.tag_trend_draws,
+            context=context
+        )
+
+    for i in range(num_predictions):
+        print(f"\n--- 第 {i+1} 组预测 ---")
+        if args.method == "all":
+            # 使用所有预测方法的综合结果
+            prediction_result = results[i]
             print("综合预测结果:")
         else:
             # 使用单一方法的预测结果
-            prediction_result = get_prediction_by_method(
-                args.method, history, reg_freq, spec_freq, tagging.number_tags,
-                args.num_to_predict, args.recent_draws, args.tag_trend_draws
-            )
+            prediction_result = results[i]
             print(f"使用 {args.method} 方法:")
             
         if prediction_result and 'regular' in prediction_result and 'special' in prediction_result:
@@ -180,40 +195,16 @@ def handle_predict(args):
         else:
             print("Error: Invalid prediction result structure.")
             
-def get_prediction_by_method(method, history, reg_freq, spec_freq, number_tags, 
-                           num_to_predict, recent_draws, tag_trend_draws):
-    """根据指定方法获取预测结果"""
-    # 设置随机种子，保证每次预测一致
-    random.seed(42)
-    np.random.seed(42)
-    if method == "basic":
-        return prediction.predict_numbers_basic(
-            history, reg_freq, spec_freq,
-            num_to_predict=num_to_predict,
-            recent_draws_count=recent_draws
-        )
-    elif method == "tags":
-        return prediction.predict_numbers_with_tags(
-            history, reg_freq, spec_freq, number_tags,
-            num_to_predict=num_to_predict,
-            recent_draws_count=recent_draws,
-            tag_trend_draws=tag_trend_draws
-        )
-    else:
-        return prediction.predict_numbers_advanced(
-            history, method=method,
-            num_to_predict=num_to_predict
-        )
-
 def handle_show_analysis(args):
     """Handles the 'show_analysis' command."""
     print("Action: Show analysis...")
-    history = data_input.load_history(config.DATA_FILE_PATH)
+    repository = data_input.get_repository()
+    history = repository.draws
     if not history:
         print("No history data found. Please add draws first using the 'add_draw' command.")
         return
 
-    reg_freq, spec_freq = analysis.calculate_frequencies(history)
+    reg_freq, spec_freq = repository.frequencies()
 
     if not reg_freq and not spec_freq and history: # if history is not empty but freqs are
         print("Frequency data is empty, though history was loaded. This might indicate all data in history was invalid.")
@@ -226,24 +217,64 @@ def handle_show_analysis(args):
     top_n = args.top
     analysis_type = args.type
 
+    # 正码和特码的最多/最少各一次批量 top-k
+    counts = np.vstack(repository.frequency_vectors())
+    most_numbers, most_counts = analysis.top_k_numbers(counts, top_n)
+    least_numbers, least_counts = analysis.top_k_numbers(counts, top_n, largest=False)
+
+    def ranked(numbers, values, hot=False):
+        # 最少出现包括从未出现的号码; 最多出现只列出出现过的号码
+        return [(format_number(n), c) for n, c in zip(numbers.tolist(), values.tolist()) if c or not hot]
+
     if analysis_type in ["all", "regular"]:
         if reg_freq:
             print(f"\n--- Regular Numbers (Top {top_n}) ---")
-            most_freq = [(format_number(n), f) for n, f in analysis.get_most_frequent(reg_freq, top_n)]
-            least_freq = [(format_number(n), f) for n, f in analysis.get_least_frequent(reg_freq, top_n)]
-            print("Most Frequent:", most_freq)
-            print("Least Frequent:", least_freq)
+            print("Most Frequent:", ranked(most_numbers[0], most_counts[0], hot=True))
+            print("Least Frequent:", ranked(least_numbers[0], least_counts[0]))
         else:
             print("\nNo frequency data for regular numbers.")
 
     if analysis_type in ["all", "special"]:
         if spec_freq:
             print(f"\n--- Special Numbers (Top {top_n}) ---")
-            print("Most Frequent:", analysis.get_most_frequent(spec_freq, top_n))
-            print("Least Frequent:", analysis.get_least_frequent(spec_freq, top_n))
+            print("Most Frequent:", ranked(most_numbers[1], most_counts[1], hot=True))
+            print("Least Frequent:", ranked(least_numbers[1], least_counts[1]))
         else:
             print("\nNo frequency data for special numbers.")
 
+    if args.hot_cold is not None:
+        periods = args.hot_cold or [10, 30, 100, 500]
+        for number_type, label in (("regular", "Regular"), ("special", "Special")):
+            if analysis_type not in ["all", number_type]:
+                continue
+            print(f"\n--- {label} Hot/Cold Numbers (Top {top_n}) ---")
+            for row in analysis.hot_cold_table(history, periods, top_n, number_type):
+                hot = " ".join(f"{format_number(n)}({c})" for n, c in row['hot'])
+                cold = " ".join(f"{format_number(n)}({c})" for n, c in row['cold'])
+                print(f"{row['periods']:>5} draws  hot: {hot}  cold: {cold}")
+
+    if args.gaps:
+        for number_type, label in (("regular", "Regular"), ("special", "Special")):
+            if analysis_type not in ["all", number_type]:
+                continue
+            gaps = repository.gap_statistics(number_type)
+            current, longest = gaps.current_gaps(), gaps.max_gaps()
+            means, percentiles = gaps.mean_gaps(), gaps.current_gap_percentiles()
+            # 只列出出现过的号码, 按当前遗漏从大到小
+            order = [n for n in np.argsort(-current[1:], kind='stable') + 1 if gaps.last_seen[n] >= 0]
+            print(f"\n--- {label} Number Gaps (Top {top_n} overdue) ---")
+            print(f"{'Number':>6} {'Current':>8} {'Max':>6} {'Mean':>6} {'Pctl':>6}")
+            for n in order[:top_n]:
+                print(f"{format_number(int(n)):>6} {current[n]:>8} {longest[n]:>6}"
+                      f" {means[n]:>6.1f} {percentiles[n]:>5.0f}%")
+
+    if args.pairs:
+        pairs = repository.cooccurrence(args.periods)
+        scope = f"last {args.periods} draws" if args.periods else "all draws"
+        print(f"\n--- Co-occurrence ({scope}, Top {top_n}) ---")
+        print("Pairs:", [(f"{format_number(a)}-{format_number(b)}", c) for (a, b), c in pairs.top_pairs(top_n)])
+        print("Triples:", [("-".join(map(format_number, t)), c) for t, c in pairs.top_triples(top_n)])
+
     if args.plot:
         print("\nGenerating visualizations...")
         plot_path = os.path.join(DATA_DIR, 'analysis_plots')
@@ -314,6 +345,21 @@ def handle_initialize(args):
     else:
         print("初始化失败")
 
+def handle_restore(args):
+    """处理备份恢复命令"""
+    if args.list:
+        snapshots = data_input.list_backups()
+        if not snapshots:
+            print("没有可用的备份")
+        for snapshot in snapshots:
+            print(f"{snapshot['id']}  {snapshot['created']}  {snapshot['size']} bytes")
+        return
+
+    if data_input.restore_history(args.snapshot):
+        print(f"已恢复备份: {args.snapshot or '最新快照'}")
+    else:
+        print("恢复失败")
+
 def main():
     """Main function to drive the CLI/GUI application."""
     # 添加GUI启动支持
@@ -341,6 +387,14 @@ def main():
     parser_analysis.add_argument("--top", type=int, default=5, help="Number of most/least frequent numbers to show (default: 5)")
     parser_analysis.add_argument("--type", choices=["all", "regular", "special"], default="all",
                                  help="Type of numbers to analyze (default: all)")
+    parser_analysis.add_argument("--gaps", action="store_true",
+                               help="Show omission (gap) statistics for the most overdue numbers")
+    parser_analysis.add_argument("--hot-cold", type=int, nargs='*', metavar="PERIODS",
+                               help="Show hot and cold numbers over recent windows (default: 10 30 100 500)")
+    parser_analysis.add_argument("--pairs", action="store_true",
+                               help="Show the most frequent regular number pairs and triples")
+    parser_analysis.add_argument("--periods", type=int, default=None,
+                               help="Limit co-occurrence analysis to the most recent N draws")
     parser_analysis.add_argument("--plot", action="store_true",
                                help="Generate visualization plots")
     parser_analysis.set_defaults(func=handle_show_analysis)
@@ -363,13 +417,17 @@ def main():
                               default="all",
                               help="预测方法 (默认: all - 使用所有方法)")
     parser_predict.add_argument("--num_predictions", type=int, default=5,
-                              help="生成预测组数 (默认: 5)")
+                              help="生成预测组数 (默认: 5; basic 和 tags 为确定性方法, 只生成一组)")
     parser_predict.add_argument("--num_to_predict", type=int, default=config.NUM_REGULAR,
                                 help=f"Number of regular numbers to predict (default: {config.NUM_REGULAR})")
     parser_predict.add_argument("--recent_draws", type=int, default=10,
                                 help="Number of recent draws to consider for hot/cold analysis (default: 10)")
     parser_predict.add_argument("--tag_trend_draws", type=int, default=20,
                                 help="Number of recent draws for tag trend analysis (default: 20, for 'tags' method)")
+    parser_predict.add_argument("--seed", type=int, default=42,
+                                help="随机种子, 各组由它派生独立种子 (默认: 42)")
+    parser_predict.add_argument("--workers", type=int, default=None,
+                                help="综合预测并行计算的线程数 (默认: config.PREDICTION_WORKERS, 未设置时串行计算)")
     parser_predict.set_defaults(func=handle_predict)
 
     # --- Initialize Subparser ---
@@ -377,6 +435,12 @@ def main():
     parser_init.add_argument("--force", action="store_true", help="强制初始化，不提示确认")
     parser_init.set_defaults(func=handle_initialize)
 
+    # --- Restore Subparser ---
+    parser_restore = subparsers.add_parser("restore", help="从备份快照恢复历史数据")
+    parser_restore.add_argument("--snapshot", type=str, help="快照ID (默认最新快照)")
+    parser_restore.add_argument("--list", action="store_true", help="列出全部快照")
+    parser_restore.set_defaults(func=handle_restore)
+
     args = parser.parse_args()
     if hasattr(args, 'func'):
         args.func(args)
@@ -1,12 +1,16 @@
-from typing import Dict, List, Set, Tuple
-import random
+from collections.abc import Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Set, Tuple
 import collections
+import functools
+import threading
 import numpy as np
 from scipy.linalg import solve
 from .tagging import get_tags_for_number # Assuming tagging.py is in the same package
 from . import advanced_prediction
-from . import analysis
 from . import tagging
+from .draws import COUNT_SIZE, DrawMatrix, HistoryWindow, as_draw_matrix
+from .prediction_context import PredictionContext, resolve_rng, sample_without_replacement
 
 # Constants for prediction logic
 MIN_NUMBER = 1
@@ -26,337 +30,237 @@ TAG_PREDICTION_CONFIG = {
     "波色": {"prefix": None, "keywords": ["红波", "蓝波", "绿波"], "count": 2, "source": "color"} #波色 tags don't have a common prefix other than the word itself
 }
 
-def _get_recent_numbers(history_data: list[dict], count: int, number_type: str = 'regular') -> collections.Counter:
+def _recent_counts(draws: DrawMatrix, count: int, number_type: str = 'regular') -> np.ndarray:
+    """最近 count 期中每个号码的出现次数 (长度50的向量, 下标即号码)"""
+    if not draws or count <= 0:
+        return np.zeros(COUNT_SIZE, dtype=np.int64)
+    window = draws.window(count)  # 共享窗口, 计数只算一次
+    if number_type == 'special':
+        return window.special_counts()
+    return window.regular_counts()
+
+def _get_recent_numbers(history_data: list[dict] | DrawMatrix, count: int, number_type: str = 'regular') -> collections.Counter:
     """
     Helper function to get numbers that appeared in recent draws.
 
     Args:
-        history_data: List of draw dictionaries.
+        history_data: DrawMatrix or list of draw dictionaries.
         count: Number of recent draws to consider.
         number_type: 'regular' or 'special'.
 
     Returns:
         A Counter object with recent numbers and their counts in the recent period.
     """
-    recent_numbers_list = []
-    if not history_data or count <= 0:
-        return collections.Counter()
-
-    for draw in history_data[-count:]: # Get the last 'count' draws
-        if number_type == 'regular':
-            if 'numbers' in draw and isinstance(draw['numbers'], list):
-                recent_numbers_list.extend(draw['numbers'])
-        elif number_type == 'special':
-            if 'special' in draw and isinstance(draw['special'], int):
-                recent_numbers_list.append(draw['special'])
-    return collections.Counter(recent_numbers_list)
+    counts = _recent_counts(as_draw_matrix(history_data), count, number_type)
+    return collections.Counter({num: int(counts[num]) for num in np.flatnonzero(counts).tolist()})
+
+def _dense_frequencies(freq: dict[int, int] | np.ndarray) -> np.ndarray:
+    """频率字典 -> 长度50的向量 (越界号码忽略; 已是计数向量时直接转换)"""
+    if isinstance(freq, np.ndarray):
+        return freq.astype(float)
+    vec = np.zeros(COUNT_SIZE)
+    for num, count in freq.items():
+        if MIN_NUMBER <= num <= MAX_NUMBER:
+            vec[num] = count
+    return vec
+
+def _frequency_total(freq: dict[int, int] | np.ndarray) -> int:
+    """频率总和 (字典或计数向量)"""
+    return int(freq.sum()) if isinstance(freq, np.ndarray) else sum(freq.values())
+
+def _rank_numbers(scores: np.ndarray, exclude: int | None = None) -> list[int]:
+    """按分数降序、号码升序排列 1-49 (可排除一个号码)"""
+    nums = np.arange(MIN_NUMBER, MAX_NUMBER + 1)
+    ranked = nums[np.lexsort((nums, -scores[MIN_NUMBER:MAX_NUMBER + 1]))].tolist()
+    if exclude is not None:
+        ranked = [n for n in ranked if n != exclude]
+    return ranked
+
+def _select_prediction(
+    draws: DrawMatrix,
+    regular_scores: np.ndarray,
+    special_scores: np.ndarray,
+    num_to_predict: int,
+    log_prefix: str = "Info"
+) -> dict:
+    """按分数选出正码和特别号 (基础预测与标签预测共用)"""
+    sorted_regular_candidates = _rank_numbers(regular_scores)
+    predicted_regular_numbers = sorted_regular_candidates[:num_to_predict]
+    predicted_special_number = _rank_numbers(special_scores)[0]
+
+    # --- 避免连续两期特别号码重复 ---
+    if draws:
+        last_special = int(draws.special[-1])
+        if last_special == predicted_special_number:
+            # 排除上期特别号，选下一个分数最高的
+            predicted_special_number = _rank_numbers(special_scores, exclude=last_special)[0]
+
+    # Ensure the predicted regular numbers do not include the predicted special number.
+    # If so, replace the conflicting regular number with the next best candidate.
+    # This is a common lottery rule.
+    if predicted_special_number in predicted_regular_numbers:
+        print(f"{log_prefix}: Predicted special number {predicted_special_number} was in regular numbers. Replacing.")
+        predicted_regular_numbers = [n for n in predicted_regular_numbers if n != predicted_special_number]
+        for num in sorted_regular_candidates:
+            if num not in predicted_regular_numbers and num != predicted_special_number:
+                predicted_regular_numbers.append(num)
+                break
+
+    # Ensure correct number of predictions, sorted
+    predicted_regular_numbers = sorted(predicted_regular_numbers[:num_to_predict])
+
+    return {'regular': predicted_regular_numbers, 'special': predicted_special_number}
+
+def _frequency_shares(
+    context: PredictionContext,
+    regular_freq: dict[int, int] | np.ndarray | None,
+    special_freq: dict[int, int] | np.ndarray | None
+) -> tuple[np.ndarray, np.ndarray]:
+    """正码/特码频率占比 (计数 / 总数); 未传入的频率使用上下文中全部历史的计数"""
+    if regular_freq is None and special_freq is None:
+        return context.frequency_shares()
+    shares = []
+    for freq, default in zip((regular_freq, special_freq), context.frequencies()):
+        freq = default if freq is None else freq
+        total = _frequency_total(freq)
+        shares.append(_dense_frequencies(freq) / total if total > 0 else np.zeros(COUNT_SIZE))
+    return shares[0], shares[1]
+
+def _score_frequency_and_recency(
+    context: PredictionContext,
+    regular_share: np.ndarray,
+    special_share: np.ndarray,
+    recent_draws_count: int,
+    freq_weight: float,
+    recent_weight: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """频率 + 近期热门得分 (长度50的向量, 下标即号码)"""
+    # 1. 频率权重
+    regular_scores = regular_share * freq_weight
+    special_scores = special_share * WEIGHT_FREQUENCY
+
+    # 2. 近期热门权重
+    recent_regular_numbers = context.recent_counts(recent_draws_count, 'regular')
+    regular_scores += (recent_regular_numbers / max(1, recent_draws_count)) * recent_weight
+
+    if recent_draws_count > 0:
+        recent_special_numbers = context.recent_counts(recent_draws_count, 'special')
+        special_scores += (recent_special_numbers / recent_draws_count) * WEIGHT_RECENCY_HOT
+
+    return regular_scores, special_scores
 
 def predict_numbers_basic(
-    history_data: list[dict],
-    regular_freq: dict[int, int],
-    special_freq: dict[int, int],
+    history_data: list[dict] | DrawMatrix,
+    regular_freq: dict[int, int] | np.ndarray | None = None,
+    special_freq: dict[int, int] | np.ndarray | None = None,
     num_to_predict: int = DEFAULT_NUM_TO_PREDICT,
     recent_draws_count: int = 10,
     freq_weight: float = 0.2,      # 降低频率权重
     recent_weight: float = 0.7,    # 提高近期权重
     gap_weight: float = 0.1,       # 间隔权重
+    context: PredictionContext | None = None,
+    rng: np.random.Generator | None = None,
     **kwargs
 ) -> dict:
     """基础预测模型
     
     Args:
-        history_data: 历史开奖数据
-        regular_freq: 正码出现频率字典
-        special_freq: 特码出现频率字典
+        history_data: 历史开奖数据 (DrawMatrix 或字典列表)
+        regular_freq: 正码出现频率字典, 或 analysis.frequency_vectors() 的计数向量;
+                      None 表示使用上下文中全部历史的计数
+        special_freq: 特码出现频率字典, 或计数向量; None 同上
         num_to_predict: 需要预测的正码数量
         recent_draws_count: 参考最近期数
+        context: 共享的预测上下文 (给出时使用其中的数据和缓存特征, 忽略 history_data)
+        rng: 随机兜底使用的随机数生成器 (见 resolve_rng)
         **kwargs: 额外参数(用于统一接口)
     """
-    if not history_data or not regular_freq or not special_freq:
+    context = PredictionContext.ensure(history_data, context)
+    draws = context.draws
+    regular_share, special_share = _frequency_shares(context, regular_freq, special_freq)
+    if not draws or not regular_share.any() or not special_share.any():
         print("警告: 历史数据或频率数据为空，将使用随机预测")
         # 随机预测兜底
-        regular_numbers = sorted(random.sample(range(MIN_NUMBER, MAX_NUMBER + 1), num_to_predict))
-        special_number = random.randint(MIN_NUMBER, MAX_NUMBER)
-        while special_number in regular_numbers:
-            special_number = random.randint(MIN_NUMBER, MAX_NUMBER)
-        return {'regular': regular_numbers, 'special': special_number}
+        rng = resolve_rng(rng)
+        numbers = rng.choice(np.arange(MIN_NUMBER, MAX_NUMBER + 1), size=num_to_predict + 1, replace=False).tolist()
+        return {'regular': sorted(numbers[:num_to_predict]), 'special': numbers[num_to_predict]}
 
-    # 修改分数计算方式
-    regular_scores = collections.defaultdict(float)
-    special_scores = collections.defaultdict(float)
-
-    # 1. 频率权重
-    total_regular_draws = sum(regular_freq.values())
-    if total_regular_draws > 0:
-        for num, freq in regular_freq.items():
-            if MIN_NUMBER <= num <= MAX_NUMBER:
-                normalized_freq = freq / total_regular_draws
-                regular_scores[num] += normalized_freq * freq_weight
-
-    # 2. 近期热门权重
-    recent_regular_numbers = _get_recent_numbers(history_data, recent_draws_count, 'regular')
-    for num, recency_count in recent_regular_numbers.items():
-        if MIN_NUMBER <= num <= MAX_NUMBER:
-            regular_scores[num] += (recency_count / max(1, recent_draws_count)) * recent_weight
+    # 1-2. 频率与近期热门权重
+    regular_scores, special_scores = _score_frequency_and_recency(
+        context, regular_share, special_share, recent_draws_count, freq_weight, recent_weight
+    )
 
     # 3. 间隔权重
-    latest_appearances = {num: -1 for num in range(MIN_NUMBER, MAX_NUMBER + 1)}
-    for i, draw in enumerate(history_data):
-        for num in draw['numbers']:
-            latest_appearances[num] = i
-    
-    current_index = len(history_data)
-    for num in range(MIN_NUMBER, MAX_NUMBER + 1):
-        if latest_appearances[num] != -1:
-            gap = current_index - latest_appearances[num]
-            gap_score = 1.0 / (gap + 1)  # 间隔越大，分数越小
-            regular_scores[num] += gap_score * gap_weight
-
-    # --- Score Special Numbers ---
-    # 1. Frequency Weight
-    total_special_draws = sum(special_freq.values()) # Could also be len(history_data)
-    if total_special_draws > 0:
-        for num, freq in special_freq.items():
-             if MIN_NUMBER <= num <= MAX_NUMBER:
-                normalized_freq = freq / total_special_draws
-                special_scores[num] += normalized_freq * WEIGHT_FREQUENCY
-
-    # 2. Recency Weight (Hot Numbers)
-    recent_special_numbers = _get_recent_numbers(history_data, recent_draws_count, 'special')
-    for num, recency_count in recent_special_numbers.items():
-        if MIN_NUMBER <= num <= MAX_NUMBER:
-            special_scores[num] += (recency_count / recent_draws_count) * WEIGHT_RECENCY_HOT
+    latest_appearances = context.last_seen()
+    seen = latest_appearances >= 0
+    gap = len(draws) - latest_appearances[seen]
+    regular_scores[seen] += (1.0 / (gap + 1)) * gap_weight  # 间隔越大，分数越小
 
     # --- Prediction ---
-    # Select top N regular numbers. Counter.most_common sorts by score, then by key (number) if scores are equal.
-    # To ensure we get num_to_predict distinct numbers, especially if scores are low or many are 0.
-    predicted_regular_numbers = []
-    # Add all numbers from 1-49 to scores if not present, to ensure they can be picked if scores are sparse
-    for i in range(MIN_NUMBER, MAX_NUMBER + 1):
-        if i not in regular_scores:
-            regular_scores[i] = 0.0
-        if i not in special_scores:
-            special_scores[i] = 0.0
-
-    # Sort by score (desc) then number (asc for tie-breaking)
-    # Using Counter.most_common might be cleaner if we ensure all numbers 1-49 are in the scores dict.
-    # Let's use a list of tuples and sort it.
-    sorted_regular_candidates = sorted(regular_scores.items(), key=lambda item: (item[1], -item[0]), reverse=True) # Score desc, num asc
-
-    # We need to ensure we don't pick the same number multiple times if it's somehow duplicated in scoring (shouldn't happen with dict keys)
-    # And that we pick num_to_predict numbers
-    predicted_regular_numbers = [num for num, score in sorted_regular_candidates[:num_to_predict]]
-
-
-    # Predict special number (top 1)
-    special_counter = collections.Counter(special_scores)
-    top_special = special_counter.most_common(1)
-    predicted_special_number = top_special[0][0] if top_special else None
-    # Fallback if no special number could be predicted (e.g., empty history)
-    if predicted_special_number is None and len(special_scores) > 0:
-        predicted_special_number = list(special_scores.keys())[0]
-    elif predicted_special_number is None:
-        predicted_special_number = random.randint(MIN_NUMBER, MAX_NUMBER)
-
-    # --- 避免连续两期特别号码重复 ---
-    if history_data and isinstance(history_data[-1], dict):
-        last_special = history_data[-1].get('special')
-        if last_special == predicted_special_number:
-            # 排除上期特别号，选下一个分数最高的
-            sorted_special_candidates = sorted(
-                ((num, score) for num, score in special_scores.items() if num != last_special),
-                key=lambda item: (item[1], -item[0]), reverse=True
-            )
-            if sorted_special_candidates:
-                predicted_special_number = sorted_special_candidates[0][0]
-            # 若所有分数都一样或只有一个可选，允许重复
-
-    # Ensure the predicted regular numbers do not include the predicted special number.
-    # If so, replace the conflicting regular number with the next best candidate.
-    # This is a common lottery rule.
-    if predicted_special_number in predicted_regular_numbers:
-        print(f"Info: Predicted special number {predicted_special_number} was in regular numbers. Replacing.")
-        # Remove it and find a new candidate
-        predicted_regular_numbers = [n for n in predicted_regular_numbers if n != predicted_special_number]
-
-        next_best_candidate_found = False
-        for num, score in sorted_regular_candidates:
-            if num not in predicted_regular_numbers and num != predicted_special_number:
-                predicted_regular_numbers.append(num)
-                next_best_candidate_found = True
-                break
-
-        if not next_best_candidate_found:
-            # If we still don't have enough numbers (very unlikely), fill with random unpicked numbers
-            # This is a fallback, should ideally not be hit with proper scoring of all 1-49 numbers.
-            print("Warning: Could not find enough unique regular numbers after special number conflict resolution. Filling randomly.")
-            current_selection = set(predicted_regular_numbers)
-            current_selection.add(predicted_special_number)
-            while len(predicted_regular_numbers) < num_to_predict:
-                rand_num = random.randint(MIN_NUMBER, MAX_NUMBER)
-                if rand_num not in current_selection:
-                    predicted_regular_numbers.append(rand_num)
-                    current_selection.add(rand_num)
-
-    # Ensure correct number of predictions, sorted
-    predicted_regular_numbers = sorted(predicted_regular_numbers[:num_to_predict])
-
-
-    return {'regular': predicted_regular_numbers, 'special': predicted_special_number}
+    return _select_prediction(draws, regular_scores, special_scores, num_to_predict)
 
 
 def predict_numbers_with_tags(
-    history_data: list[dict],
-    regular_freq: dict[int, int],
-    special_freq: dict[int, int],
-    number_tags: dict[int, set[str]], # Assuming this is the global dict from tagging.py
+    history_data: list[dict] | DrawMatrix,
+    regular_freq: dict[int, int] | np.ndarray | None = None,
+    special_freq: dict[int, int] | np.ndarray | None = None,
+    number_tags: dict[int, set[str]] | None = None, # Assuming this is the global dict from tagging.py
     num_to_predict: int = DEFAULT_NUM_TO_PREDICT,
     recent_draws_count: int = 10,
     tag_trend_draws: int = 5,          # 默认窗口缩小为5
     weight_tag_trend: float = 1.0,     # 标签趋势权重提高
     freq_weight: float = 0.2,          # 频率权重降低
     recent_weight: float = 0.7,        # 近期权重提高
+    context: PredictionContext | None = None,
 ) -> dict:
     """
     Predicts lottery numbers using basic scoring plus tag trend analysis.
 
     Args:
-        history_data: List of draw dictionaries.
-        regular_freq: Dictionary of regular number frequencies.
-        special_freq: Dictionary of special number frequencies.
+        history_data: DrawMatrix or list of draw dictionaries.
+        regular_freq: Dictionary of regular number frequencies, or a dense count vector.
+                      None uses the whole-history counts from the context.
+        special_freq: Dictionary of special number frequencies, or a dense count vector.
         number_tags: Dictionary mapping numbers to sets of tags.
         num_to_predict: How many regular numbers to predict.
         recent_draws_count: For hot number analysis in basic scoring.
         tag_trend_draws: How many recent draws to analyze for tag trends.
         weight_tag_trend: Weight factor for the influence of tag trends.
+        context: Shared PredictionContext; when given, its draws and cached features are used.
 
     Returns:
         A dictionary: {'regular': [predicted_regular_numbers], 'special': predicted_special_number}.
     """
-    # 1. Get initial scores from the basic predictor
-    # We can call predict_numbers_basic and then adjust scores, or re-implement scoring logic here
-    # For clarity and to avoid issues with return format, let's re-implement and extend.
-
-    regular_scores = collections.defaultdict(float)
-    special_scores = collections.defaultdict(float)
+    context = PredictionContext.ensure(history_data, context)
+    draws = context.draws
 
     # --- Basic Scoring (Frequency and Recency) ---
-    # (This section is similar to predict_numbers_basic)
-    total_regular_draws = sum(regular_freq.values())
-    if total_regular_draws > 0:
-        for num, freq in regular_freq.items():
-            if MIN_NUMBER <= num <= MAX_NUMBER:
-                regular_scores[num] += (freq / total_regular_draws) * freq_weight
-
-    recent_regular_numbers = _get_recent_numbers(history_data, recent_draws_count, 'regular')
-    for num, recency_count in recent_regular_numbers.items():
-        if MIN_NUMBER <= num <= MAX_NUMBER:
-            regular_scores[num] += (recency_count / max(1, recent_draws_count)) * recent_weight
-
-    total_special_draws = sum(special_freq.values())
-    if total_special_draws > 0:
-        for num, freq in special_freq.items():
-            if MIN_NUMBER <= num <= MAX_NUMBER:
-                special_scores[num] += (freq / total_special_draws) * WEIGHT_FREQUENCY
-
-    recent_special_numbers = _get_recent_numbers(history_data, recent_draws_count, 'special')
-    for num, recency_count in recent_special_numbers.items():
-        if MIN_NUMBER <= num <= MAX_NUMBER:
-            special_scores[num] += (recency_count / recent_draws_count) * WEIGHT_RECENCY_HOT
+    regular_share, special_share = _frequency_shares(context, regular_freq, special_freq)
+    regular_scores, special_scores = _score_frequency_and_recency(
+        context, regular_share, special_share, recent_draws_count, freq_weight, recent_weight
+    )
 
     # --- Tag Trend Analysis ---
-    recent_tag_trends_regular = collections.Counter()
-    recent_tag_trends_special = collections.Counter()
-
-    if tag_trend_draws > 0 and history_data:
-        for draw in history_data[-tag_trend_draws:]:
-            # Regular numbers' tags
-            if 'numbers' in draw and isinstance(draw['numbers'], list):
-                for num in draw['numbers']:
-                    if MIN_NUMBER <= num <= MAX_NUMBER:
-                        # Use the get_tags_for_number function from the tagging module
-                        tags = get_tags_for_number(num) # This uses the globally loaded number_tags
-                        for tag in tags:
-                            recent_tag_trends_regular[tag] += 1
-
-            # Special number's tags
-            if 'special' in draw and isinstance(draw['special'], int):
-                num = draw['special']
-                if MIN_NUMBER <= num <= MAX_NUMBER:
-                    tags = get_tags_for_number(num)
-                    for tag in tags:
-                        recent_tag_trends_special[tag] += 1
-
-    # --- Apply Tag Trend Scores ---
-    # Normalize tag trend frequencies (e.g., by total tags counted in the trend period)
-    total_tags_counted_regular = sum(recent_tag_trends_regular.values())
-    total_tags_counted_special = sum(recent_tag_trends_special.values())
-
-    for num in range(MIN_NUMBER, MAX_NUMBER + 1):
-        num_actual_tags = get_tags_for_number(num) # Get tags for the current number being scored
-
-        # Regular score adjustment
-        if total_tags_counted_regular > 0:
-            for tag in num_actual_tags:
-                if tag in recent_tag_trends_regular:
-                    normalized_tag_trend_freq = recent_tag_trends_regular[tag] / total_tags_counted_regular
-                    regular_scores[num] += normalized_tag_trend_freq * weight_tag_trend
-
-        # Special score adjustment
-        if total_tags_counted_special > 0:
-            for tag in num_actual_tags:
-                if tag in recent_tag_trends_special:
-                    normalized_tag_trend_freq = recent_tag_trends_special[tag] / total_tags_counted_special
-                    special_scores[num] += normalized_tag_trend_freq * weight_tag_trend
+    # Each tag's share of all tags counted in the trend window, summed over a number's tags
+    # (one product with the cached number×tag matrix per number type).
+    if tag_trend_draws > 0 and draws:
+        regular_trend, special_trend = context.tag_trend_shares(tag_trend_draws)
+        regular_scores += regular_trend * weight_tag_trend
+        special_scores += special_trend * weight_tag_trend
 
     # --- Prediction (similar to basic, but with enhanced scores) ---
-    # Ensure all numbers 1-49 are in scores for complete candidate list
-    for i in range(MIN_NUMBER, MAX_NUMBER + 1):
-        if i not in regular_scores: regular_scores[i] = 0.0
-        if i not in special_scores: special_scores[i] = 0.0
-
-    sorted_regular_candidates = sorted(regular_scores.items(), key=lambda item: (item[1], -item[0]), reverse=True)
-    predicted_regular_numbers = [num for num, score in sorted_regular_candidates[:num_to_predict]]
+    return _select_prediction(draws, regular_scores, special_scores, num_to_predict,
+                              log_prefix="Info (Tag Prediction)")
 
-    special_counter = collections.Counter(special_scores)
-    top_special = special_counter.most_common(1)
-    predicted_special_number = top_special[0][0] if top_special else random.randint(MIN_NUMBER, MAX_NUMBER)
-
-    # --- 避免连续两期特别号码重复 ---
-    if history_data and isinstance(history_data[-1], dict):
-        last_special = history_data[-1].get('special')
-        if last_special == predicted_special_number:
-            sorted_special_candidates = sorted(
-                ((num, score) for num, score in special_scores.items() if num != last_special),
-                key=lambda item: (item[1], -item[0]), reverse=True
-            )
-            if sorted_special_candidates:
-                predicted_special_number = sorted_special_candidates[0][0]
-
-    # Conflict resolution: ensure special is not in regular
-    if predicted_special_number in predicted_regular_numbers:
-        print(f"Info (Tag Prediction): Predicted special number {predicted_special_number} was in regular numbers. Replacing.")
-        predicted_regular_numbers = [n for n in predicted_regular_numbers if n != predicted_special_number]
-        for num, score in sorted_regular_candidates:
-            if num not in predicted_regular_numbers and num != predicted_special_number:
-                predicted_regular_numbers.append(num)
-                break
-        # Fallback if still not enough (very unlikely)
-        current_selection = set(predicted_regular_numbers)
-        current_selection.add(predicted_special_number)
-        while len(predicted_regular_numbers) < num_to_predict:
-            rand_num = random.randint(MIN_NUMBER, MAX_NUMBER)
-            if rand_num not in current_selection:
-                predicted_regular_numbers.append(rand_num)
-                current_selection.add(rand_num)
 
+def _special_numbers(history_data: list[dict] | DrawMatrix) -> list:
+    """提取每期的特别号 (字典列表中缺失或格式错误的记录为 None)"""
+    if isinstance(history_data, DrawMatrix):
+        return history_data.special.tolist()
+    return [draw.get('special') if isinstance(draw, dict) else None for draw in history_data]
 
-    predicted_regular_numbers = sorted(predicted_regular_numbers[:num_to_predict])
-
-    return {'regular': predicted_regular_numbers, 'special': predicted_special_number}
-
-
-def predict_tags(history_data: list[dict], recent_draws_count: int | None = None) -> dict:
+def predict_tags(history_data: list[dict] | DrawMatrix, recent_draws_count: int | None = None,
+                 context: PredictionContext | None = None) -> dict:
     """
     Predicts trending tags for various categories based on **special numbers**
     from historical lottery data.
@@ -365,21 +269,35 @@ def predict_tags(history_data: list[dict], recent_draws_count: int | None = None
     the special number in each draw within the specified history window.
 
     Args:
-        history_data: List of draw dictionaries, where each draw should ideally
-                      contain a 'special' key with the special number.
+        history_data: DrawMatrix, or list of draw dictionaries where each draw should
+                      ideally contain a 'special' key with the special number.
         recent_draws_count: Optional. The number of most recent draws to analyze.
                             If None or 0 or invalid, the full history_data is used.
                             The analysis focuses on special numbers within these draws.
+        context: Optional shared PredictionContext; the result for each window size
+                 is computed once per context.
 
     Returns:
         A dictionary where keys are tag category names (e.g., "单双", "生肖")
         and values are lists of predicted tag strings for that category.
         Example: {'单双': ['单'], '大小': ['小'], ...}
     """
-    if recent_draws_count is not None and recent_draws_count > 0:
+    if context is not None:
+        predicted = context.derived(('predict_tags', recent_draws_count),
+                                    lambda draws: predict_tags(draws, recent_draws_count))
+        return {category: list(tags) for category, tags in predicted.items()}
+
+    if isinstance(history_data, (DrawMatrix, HistoryWindow)):
+        # 列式数据: 使用共享窗口, 窗口内的标签标注只计算一次
+        window = as_draw_matrix(history_data).window(
+            recent_draws_count if recent_draws_count is not None and recent_draws_count > 0 else None)
+        effective_history = window.draws
+    elif recent_draws_count is not None and recent_draws_count > 0:
+        window = None
         start_index = max(0, len(history_data) - recent_draws_count)
         effective_history = history_data[start_index:]
     else:
+        window = None
         effective_history = history_data
 
     predicted_tags_output = {category_key: [] for category_key in TAG_PREDICTION_CONFIG.keys()}
@@ -393,46 +311,33 @@ def predict_tags(history_data: list[dict], recent_draws_count: int | None = None
         cat_key: collections.defaultdict(float) for cat_key in TAG_PREDICTION_CONFIG.keys()
     }
 
-    tag_getter_mapping = {
-        "单双": tagging.get_dx_tag,
-        "大小": tagging.get_ds_tag,
-        "合数特征": tagging.get_sum_feature_tag,
-        "尾数特征": tagging.get_tail_feature_tag,
-        "生肖": tagging.get_zodiac_tag,
-        "五行": tagging.get_element_tag,
-        "波色": tagging.get_color_tag,
-    }
-
     # This constant defines the window for 'hot' tags *within* the effective_history
     recent_draws_for_hot_score_window = 10  # Defines how many of the *latest* draws in effective_history are considered "hot"
 
-    for idx, draw_data_item in enumerate(effective_history):
-        if not isinstance(draw_data_item, dict):
-            continue
-
-        special_num = draw_data_item.get('special')
+    special_numbers = _special_numbers(effective_history)
+    # Category tags of every special number; invalid specials are annotated with None
+    # and contribute nothing to tag scores.
+    if window is not None:
+        annotations = window.derived('tag_annotations',
+                                     lambda draws: tagging.annotate_numbers(draws.special.tolist()))
+    else:
+        annotations = tagging.annotate_numbers(special_numbers)
 
+    for idx in range(len(special_numbers)):
         # Determine if this draw is "recent" for the purpose of applying WEIGHT_RECENCY_HOT.
         # This is based on its position within the (potentially sliced) effective_history.
-        is_recent_for_hot_score = (len(effective_history) - 1 - idx) < recent_draws_for_hot_score_window
-
-        if special_num is not None and isinstance(special_num, int) and \
-           tagging.MIN_NUMBER <= special_num <= tagging.MAX_NUMBER:
-
-            # Process only the special number for its tags
-            num_to_process = special_num
+        is_recent_for_hot_score = (len(special_numbers) - 1 - idx) < recent_draws_for_hot_score_window
 
-            for category_key, config_details_loop in TAG_PREDICTION_CONFIG.items():
-                getter_func = tag_getter_mapping.get(category_key)
-                if not getter_func:
-                    continue
+        for category_key in TAG_PREDICTION_CONFIG:
+            category_tags = annotations.get(category_key)
+            if not category_tags:
+                continue
 
-                tag_value = getter_func(num_to_process)
-                if tag_value is not None:
-                    tag_scores[category_key][tag_value] += WEIGHT_FREQUENCY
-                    if is_recent_for_hot_score:
-                        tag_scores[category_key][tag_value] += WEIGHT_RECENCY_HOT
-        # If special_num is not valid or not present, this draw contributes nothing to tag scores.
+            tag_value = category_tags[idx]
+            if tag_value is not None:
+                tag_scores[category_key][tag_value] += WEIGHT_FREQUENCY
+                if is_recent_for_hot_score:
+                    tag_scores[category_key][tag_value] += WEIGHT_RECENCY_HOT
 
     for category_key, config_details in TAG_PREDICTION_CONFIG.items():
         num_to_predict_for_category = config_details['count']
@@ -460,47 +365,37 @@ def predict_tags(history_data: list[dict], recent_draws_count: int | None = None
     return predicted_tags_output
 
 
-def predict_using_grey_model(history_data: list[dict], num_to_predict: int = 6) -> dict:
-    """使用灰色预测模型(GM(1,1))进行预测
+def _gm11_predict(sequence: list[float], predict_length: int = 1) -> list[float]:
+    """改进的GM(1,1)预测"""
+    n = len(sequence)
+    X0 = np.array(sequence)
+    X1 = np.cumsum(X0)
     
-    灰色模型原理：
-    1. 对原始数据进行累加生成(AGO)以减少随机性
-    2. 建立微分方程模型
-    3. 求解微分方程得到预测值
-    4. 通过累减还原预测数据
-    """
-    def gm11_predict(sequence: list[float], predict_length: int = 1) -> list[float]:
-        """改进的GM(1,1)预测"""
-        n = len(sequence)
-        X0 = np.array(sequence)
-        X1 = np.cumsum(X0)
-        
-        Z1 = (X1[:-1] + X1[1:]) / 2.0
-        Z1 = Z1.reshape((n-1, 1))
-        B = np.vstack([-Z1, np.ones((n-1, 1))])
-        B = B.T
-        Y = X0[1:].reshape((n-1, 1))
-        
-        try:
-            [[a], [b]] = np.linalg.solve(B.T.dot(B), B.T.dot(Y))
-            
-            predictions = []
-            for k in range(predict_length):
-                next_val = (X0[0] - b/a) * np.exp(-a * (n+k)) + b/a
-                predictions.append(next_val - (0 if k == 0 else predictions[-1]))
-            return predictions
-        except:
-            return [sequence[-1]] * predict_length  # 如果计算失败，返回最后一个值
+    Z1 = (X1[:-1] + X1[1:]) / 2.0
+    Z1 = Z1.reshape((n-1, 1))
+    B = np.vstack([-Z1, np.ones((n-1, 1))])
+    B = B.T
+    Y = X0[1:].reshape((n-1, 1))
     
+    try:
+        [[a], [b]] = np.linalg.solve(B.T.dot(B), B.T.dot(Y))
+        
+        predictions = []
+        for k in range(predict_length):
+            next_val = (X0[0] - b/a) * np.exp(-a * (n+k)) + b/a
+            predictions.append(next_val - (0 if k == 0 else predictions[-1]))
+        return predictions
+    except:
+        return [sequence[-1]] * predict_length  # 如果计算失败，返回最后一个值
+
+def _grey_probabilities(draws: DrawMatrix) -> dict[int, float]:
+    """每个号码的 GM(1,1) 出现概率 (基于最近20期, 只依赖数据, 可在上下文中缓存)"""
     # 使用最近20期数据构建预测序列
-    recent_history = history_data[-20:]
-    number_sequences = {i: [] for i in range(1, 50)}
+    recent_history = draws.window(20)
     
-    # 为每个号码构建出现频率序列
-    for draw in recent_history:
-        numbers_set = set(draw['numbers'])
-        for num in range(1, 50):
-            number_sequences[num].append(1 if num in numbers_set else 0)
+    # 为每个号码构建出现频率序列 (one-hot 矩阵的每一列)
+    appearance = recent_history.onehot().astype(int)
+    number_sequences = {num: appearance[:, num].tolist() for num in range(1, 50)}
     
     # 预测每个号码的出现概率
     probabilities = {}
@@ -510,34 +405,47 @@ def predict_using_grey_model(history_data: list[dict], num_to_predict: int = 6)
         else:
             # 使用最近5期数据进行预测
             seq = number_sequences[num][-5:]
-            pred = gm11_predict(seq)[0]
+            pred = _gm11_predict(seq)[0]
             probabilities[num] = max(0.1, min(1.0, pred))  # 限制概率范围
+    return probabilities
+
+def _grey_weights(context: PredictionContext) -> tuple[np.ndarray, np.ndarray]:
+    """灰色模型的 (正码, 特码) 抽样概率 (长度50, 下标即号码, 1-49 之和为 1)
+
+    正码按预测概率正规化; 特别号使用不同的权重 (1 - 正码概率), 再正规化。
+    """
+    def weights(draws):
+        probabilities = context.derived('grey_probabilities', _grey_probabilities)
+        regular = np.zeros(COUNT_SIZE)
+        regular[1:] = [probabilities[n] for n in range(1, 50)]
+        regular /= regular.sum()
+        special = np.zeros(COUNT_SIZE)
+        special[1:] = 1 - regular[1:]
+        return regular, special / special.sum()
+    return context.derived('grey_weights', weights)
+
+def predict_using_grey_model(history_data: list[dict] | DrawMatrix, num_to_predict: int = 6,
+                             context: PredictionContext | None = None,
+                             rng: np.random.Generator | None = None) -> dict:
+    """使用灰色预测模型(GM(1,1))进行预测
     
-    # 根据预测概率选择号码
-    numbers = list(range(1, 50))
-    weights = [probabilities[n] for n in numbers]
-    
-    # 正规化权重
-    total_weight = sum(weights)
-    if total_weight > 0:
-        weights = [w/total_weight for w in weights]
-    
-    # 选择号码
-    regular_numbers = []
-    while len(regular_numbers) < num_to_predict:
-        chosen = np.random.choice(numbers, p=weights)
-        if chosen not in regular_numbers:
-            regular_numbers.append(chosen)
+    灰色模型原理：
+    1. 对原始数据进行累加生成(AGO)以减少随机性
+    2. 建立微分方程模型
+    3. 求解微分方程得到预测值
+    4. 通过累减还原预测数据
+    """
+    context = PredictionContext.ensure(history_data, context)
+    rng = resolve_rng(rng)
+    regular_weights, special_weights = _grey_weights(context)
     
-    # 特别号码使用不同的权重计算
-    special_weights = [1-w for w in weights]
-    total_special_weight = sum(special_weights)
-    if total_special_weight > 0:
-        special_weights = [w/total_special_weight for w in special_weights]
+    # 按预测概率选择号码
+    regular_numbers = sample_without_replacement(regular_weights, num_to_predict, rng).tolist()
     
-    special_number = np.random.choice(numbers, p=special_weights)
-    while special_number in regular_numbers:
-        special_number = np.random.choice(numbers, p=special_weights)
+    # 特别号码使用不同的权重, 在正码之外抽取
+    special_weights = special_weights.copy()
+    special_weights[regular_numbers] = 0
+    special_number = int(sample_without_replacement(special_weights, 1, rng)[0])
     
     return {
         'regular': sorted(regular_numbers),
@@ -546,17 +454,21 @@ def predict_using_grey_model(history_data: list[dict], num_to_predict: int = 6)
 
 
 def predict_numbers_advanced(
-    history_data: list[dict],
+    history_data: list[dict] | DrawMatrix,
     method: str = "hybrid",
-    num_to_predict: int = 6
+    num_to_predict: int = 6,
+    context: PredictionContext | None = None,
+    rng: np.random.Generator | None = None
 ) -> dict:
     """
     使用高级预测模型进行预测
     
     Args:
-        history_data: 历史数据
+        history_data: 历史数据 (DrawMatrix 或字典列表)
         method: 预测方法 ("markov", "bayes", "timeseries", "hybrid", "grey")
         num_to_predict: 预测号码数量
+        context: 共享的预测上下文 (给出时忽略 history_data)
+        rng: 随机数生成器 (见 resolve_rng)
     """
     prediction_funcs = {
         "markov": advanced_prediction.markov_chain_prediction,
@@ -565,30 +477,41 @@ def predict_numbers_advanced(
         "hybrid": advanced_prediction.hybrid_prediction
     }
     
+    context = PredictionContext.ensure(history_data, context)
+    rng = resolve_rng(rng)
+    history_data = context.draws
     if method == "grey":
-        return predict_using_grey_model(history_data, num_to_predict)
+        return predict_using_grey_model(history_data, num_to_predict, context=context, rng=rng)
     
     if method not in prediction_funcs:
         raise ValueError(f"Unknown prediction method: {method}")
         
     # 预测正码
-    regular_numbers = prediction_funcs[method](history_data, num_to_predict)
+    regular_numbers = prediction_funcs[method](history_data, num_to_predict=num_to_predict, context=context, rng=rng)
     
     # 预测特码 (使用混合模型)
-    special_number = prediction_funcs["hybrid"](history_data, 1)[0]
+    special_number = prediction_funcs["hybrid"](history_data, 1, context=context, rng=rng)[0]
     # --- 避免连续两期特别号码重复 ---
-    if history_data and isinstance(history_data[-1], dict):
-        last_special = history_data[-1].get('special')
+    if history_data:
+        last_special = int(history_data.special[-1])
         if last_special == special_number:
             # 重新选一个不等于上期的
             alt_special = None
             alt_candidates = [n for n in range(1, 50) if n != last_special and n not in regular_numbers]
             if alt_candidates:
-                alt_special = random.choice(alt_candidates)
+                alt_special = int(rng.choice(alt_candidates))
             if alt_special:
                 special_number = alt_special
-    while special_number in regular_numbers:
-        special_number = prediction_funcs["hybrid"](history_data, 1)[0]
+    if special_number in regular_numbers:
+        # 按混合模型的分布在正码之外重新抽取 (一次抽样, 与反复重抽的分布相同);
+        # 没有历史数据时各模型随机兜底, 在其余号码中均匀抽取
+        if history_data:
+            weights = _hybrid_special_probabilities(context).copy()
+        else:
+            weights = np.zeros(COUNT_SIZE)
+            weights[MIN_NUMBER:MAX_NUMBER + 1] = 1
+        weights[regular_numbers] = 0
+        special_number = int(sample_without_replacement(weights, 1, rng)[0])
 
     return {
         'regular': regular_numbers,
@@ -596,82 +519,312 @@ def predict_numbers_advanced(
     }
 
 
-def predict_all_methods(history_data: List[Dict], 
+class LazyResults(Mapping):
+    """按需计算的只读结果映射
+
+    每个条目由无参函数计算, 第一次访问时才运行并缓存结果。键的顺序即 factories 的顺序;
+    `in`、len() 和遍历键不会触发计算。
+    """
+
+    def __init__(self, factories: Dict[str, Callable]):
+        self._factories = dict(factories)
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self._factories[key]()
+            return self._values[key]
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def __contains__(self, key) -> bool:
+        return key in self._factories
+
+    def __repr__(self) -> str:
+        items = ", ".join(f"{key!r}: {self._values[key]!r}" if key in self._values else f"{key!r}: <pending>"
+                          for key in self._factories)
+        return f"LazyResults({{{items}}})"
+
+    def is_computed(self, key) -> bool:
+        """条目是否已经计算"""
+        return key in self._values
+
+    def to_dict(self) -> dict:
+        """按键的顺序计算全部条目, 返回普通字典 (嵌套的 LazyResults 同样展开)"""
+        return {key: value.to_dict() if isinstance(value, LazyResults) else value
+                for key, value in self.items()}
+
+
+# predict_all_methods 中相互独立的方法节点 (顺序决定各自的随机数种子)
+ALL_METHODS = ('basic', 'tags', 'markov', 'bayes', 'timeseries', 'grey')
+# 不使用随机数的方法: 同一份数据只会给出一组固定结果
+DETERMINISTIC_METHODS = ('basic', 'tags')
+
+
+def _seed_sequence(seed=None) -> np.random.SeedSequence:
+    """整数或 SeedSequence -> SeedSequence; None 时从全局 np.random 状态取熵"""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if seed is None:
+        seed = np.random.randint(0, 2 ** 32, size=4).tolist()
+    return np.random.SeedSequence(seed)
+
+
+def _method_seeds(seed=None) -> Dict[str, np.random.SeedSequence]:
+    """为每个方法节点派生独立的种子"""
+    return dict(zip(ALL_METHODS, _seed_sequence(seed).spawn(len(ALL_METHODS))))
+
+
+def _run_method(name: str, context: PredictionContext, seed: np.random.SeedSequence,
+                num_to_predict: int, recent_draws_count: int, tag_trend_draws: int) -> dict:
+    """运行一个方法节点 (模块级函数, 可提交到线程池或进程池)"""
+    rng = resolve_rng(seed)
+    draws = context.draws
+    if name == 'basic':
+        return predict_numbers_basic(draws, num_to_predict=num_to_predict,
+                                     recent_draws_count=recent_draws_count, context=context, rng=rng)
+    if name == 'tags':
+        return predict_numbers_with_tags(draws, number_tags=tagging.number_tags, num_to_predict=num_to_predict,
+                                         recent_draws_count=recent_draws_count,
+                                         tag_trend_draws=tag_trend_draws, context=context)
+    if name == 'grey':
+        return predict_using_grey_model(draws, num_to_predict=num_to_predict, context=context, rng=rng)
+    return predict_numbers_advanced(draws, method=name, num_to_predict=num_to_predict, context=context, rng=rng)
+
+
+# 工作进程中由 PredictionProcessPool 的 initializer 安装的上下文
+_worker_context: PredictionContext | None = None
+
+
+def _install_context(context: PredictionContext) -> None:
+    global _worker_context
+    _worker_context = context
+
+
+def _run_installed_method(name: str, seed: np.random.SeedSequence, num_to_predict: int,
+                          recent_draws_count: int, tag_trend_draws: int) -> dict:
+    """在工作进程中用已安装的上下文运行一个方法节点 (任务只传递方法名、种子和参数)"""
+    return _run_method(name, _worker_context, seed, num_to_predict, recent_draws_count, tag_trend_draws)
+
+
+class PredictionProcessPool(ProcessPoolExecutor):
+    """绑定一个 PredictionContext 的进程池
+
+    上下文只在每个工作进程启动时传递一次, 之后提交给 predict_all_methods 的任务
+    不再携带上下文; 各进程中的特征缓存在该进程的多组预测之间共享。
+    """
+
+    def __init__(self, context: PredictionContext, max_workers: int | None = None, mp_context=None):
+        super().__init__(max_workers=max_workers, mp_context=mp_context,
+                         initializer=_install_context, initargs=(context,))
+        self.context = context
+
+
+def predict_all_methods(history_data: List[Dict] | DrawMatrix, 
                        num_to_predict: int = 6,
                        recent_draws_count: int = 10,
-                       tag_trend_draws: int = 20) -> Dict:
-    """综合所有预测方法的结果"""
-    predictions = []
-    
-    # 计算频率
-    reg_freq, spec_freq = analysis.calculate_frequencies(history_data)
-    
-    # 1. 基础预测
-    basic_pred = predict_numbers_basic(
-        history_data, 
-        reg_freq, 
-        spec_freq,
-        num_to_predict=num_to_predict,
-        recent_draws_count=recent_draws_count
-    )
-    
-    # 2. 标签预测
-    tag_pred = predict_numbers_with_tags(
-        history_data,
-        reg_freq,
-        spec_freq,
-        tagging.number_tags,
-        num_to_predict=num_to_predict,
-        recent_draws_count=recent_draws_count,
-        tag_trend_draws=tag_trend_draws
-    )
-    
-    # 3. 马尔可夫预测
-    markov_pred = predict_numbers_advanced(
-        history_data, 
-        method="markov",
-        num_to_predict=num_to_predict
-    )
-    
-    # 4. 贝叶斯预测
-    bayes_pred = predict_numbers_advanced(
-        history_data, 
-        method="bayes", 
-        num_to_predict=num_to_predict
-    )
-    
-    # 5. 时间序列预测
-    time_pred = predict_numbers_advanced(
-        history_data, 
-        method="timeseries", 
-        num_to_predict=num_to_predict
-    )
-    
-    # 6. 灰度预测
-    grey_pred = predict_using_grey_model(
-        history_data, 
-        num_to_predict=num_to_predict
-    )
+                       tag_trend_draws: int = 20,
+                       context: PredictionContext | None = None,
+                       seed=None,
+                       workers: int | None = None,
+                       executor: Executor | None = None) -> LazyResults:
+    """综合所有预测方法的结果
 
-    # 7. 标签预测 (by category)
-    # Pass the recent_draws_count from predict_all_methods to predict_tags
-    label_predictions = predict_tags(history_data, recent_draws_count=recent_draws_count)
-    
-    # 返回综合结果
-    return {
-        'regular': sorted(basic_pred['regular']),  # 使用基础预测作为主要结果
-        'special': basic_pred['special'],
-        'method_results': {
-            'basic': basic_pred,
-            'tags': tag_pred, # This is for number prediction using tags
-            'markov': markov_pred,
-            'bayes': bayes_pred,
-            'timeseries': time_pred,
-            'grey': grey_pred
-        },
-        'label_predictions': label_predictions # New: predictions for each tag category
-    }
+    所有方法共享一个 PredictionContext, 频率、近期计数、遗漏、标签趋势、转移计数等
+    特征只计算一次。多组预测时由调用方构建一次上下文并传入, 各组之间也共享。
+
+    返回按需计算的映射 (LazyResults), 结构与原来的字典相同:
+    {'regular', 'special', 'method_results': {方法: 结果}, 'label_predictions'}。
+    只读取 'label_predictions' 时只运行 predict_tags。
 
+    每个方法使用从 seed 派生的独立随机数生成器 (SeedSequence.spawn), 结果与
+    读取顺序、是否并行以及调度顺序无关。
+
+    Args:
+        seed: 整数或 np.random.SeedSequence; None 时从全局 np.random 状态派生
+        workers: 大于 1 时用该数量的线程并行运行各方法
+        executor: 已有的线程池或进程池 (多组预测时共享一个池, 优先于 workers);
+                  绑定同一上下文的 PredictionProcessPool 不再为每个任务传递上下文,
+                  其他进程池中每个任务会收到一份上下文数据的副本
+    """
+    context = PredictionContext.ensure(history_data, context)
+    history_data = context.draws
+    seeds = _method_seeds(seed)
+    options = (num_to_predict, recent_draws_count, tag_trend_draws)
+
+    own_executor = None
+    if executor is None and workers is not None and workers > 1:
+        executor = own_executor = ThreadPoolExecutor(max_workers=min(workers, len(ALL_METHODS)))
+    if executor is not None:
+        # 全部方法立即提交, 结果按固定的键顺序合并
+        if isinstance(executor, PredictionProcessPool) and executor.context is context:
+            futures = {name: executor.submit(_run_installed_method, name, seeds[name], *options)
+                       for name in ALL_METHODS}
+        else:
+            futures = {name: executor.submit(_run_method, name, context, seeds[name], *options)
+                       for name in ALL_METHODS}
+        if own_executor is not None:
+            own_executor.shutdown(wait=False)
+        factories = {name: future.result for name, future in futures.items()}
+    else:
+        factories = {name: functools.partial(_run_method, name, context, seeds[name], *options)
+                     for name in ALL_METHODS}
+    method_results = LazyResults(factories)
+
+    # 返回综合结果 (使用基础预测作为主要结果)
+    return LazyResults({
+        'regular': lambda: sorted(method_results['basic']['regular']),
+        'special': lambda: method_results['basic']['special'],
+        'method_results': lambda: method_results,
+        # 标签预测 (by category), 只需要特别号
+        'label_predictions': lambda: predict_tags(
+            history_data, recent_draws_count=recent_draws_count, context=context),
+    })
+
+
+# ----------------------------------------------------------------------
+# 多组预测: 模型得分只计算一次, 全部分组一次向量化抽样
+# (sample_without_replacement 使用每组独立随机数流的均匀随机数)
+# ----------------------------------------------------------------------
+def _number_mask(numbers: np.ndarray) -> np.ndarray:
+    """(组数, k) 的号码矩阵 -> (组数, 50) 的布尔矩阵"""
+    mask = np.zeros((len(numbers), COUNT_SIZE), dtype=bool)
+    np.put_along_axis(mask, numbers, True, axis=1)
+    return mask
+
+
+def _hybrid_special_probabilities(context: PredictionContext) -> np.ndarray:
+    """predict_numbers_advanced 中单个特码 (hybrid_prediction 取 1 个号码) 的分布
+
+    混合模型在马尔可夫、贝叶斯各抽一个号码和时间序列的首选号码中等概率取一个
+    不同的号码, 这里对全部 (马尔可夫, 贝叶斯) 组合精确求和。
+    """
+    def probabilities(draws):
+        markov = advanced_prediction.transition_weights(context).astype(float)
+        if not markov.any():
+            markov[MIN_NUMBER:MAX_NUMBER + 1] = 1  # 没有转移记录时马尔可夫随机选号
+        markov /= markov.sum()
+        bayes = advanced_prediction.bayes_weights(context)
+        trend = advanced_prediction.time_series_prediction(draws, 1, context=context)[0]
+
+        m, b = np.meshgrid(np.arange(COUNT_SIZE), np.arange(COUNT_SIZE), indexing='ij')
+        trend_distinct = (m != trend) & (b != trend)
+        share = np.outer(markov, bayes) / (1 + (m != b) + trend_distinct)
+        result = np.bincount(m.ravel(), weights=share.ravel(), minlength=COUNT_SIZE)
+        result += np.bincount(b.ravel(), weights=(share * (m != b)).ravel(), minlength=COUNT_SIZE)
+        result[trend] += (share * trend_distinct).sum()
+        return result
+    return context.derived('hybrid_special_probabilities', probabilities)
+
+
+def _advanced_special_groups(context: PredictionContext, regular: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+    """按 predict_numbers_advanced 的规则为每组抽取特码
+
+    混合模型抽到上期特别号时, 改为在其余号码 (不含本组正码) 中等概率选择;
+    抽到本组正码时重新抽取, 即按混合模型分布在本组正码之外抽取。
+    三种情况合并为每组一个概率向量, 每组只抽一次。
+    """
+    probabilities = _hybrid_special_probabilities(context)
+    last_special = int(context.draws.special[-1])
+    allowed = ~_number_mask(regular)
+    allowed[:, 0] = False
+    not_last = np.arange(COUNT_SIZE) != last_special
+
+    alternatives = allowed & not_last
+    weights = probabilities * alternatives
+    weights += probabilities[last_special] * alternatives / alternatives.sum(axis=1, keepdims=True)
+    redraw = probabilities * allowed
+    redraw_share = (probabilities * (~allowed & not_last)).sum(axis=1, keepdims=True)
+    weights += redraw_share * redraw / redraw.sum(axis=1, keepdims=True)
+    return sample_without_replacement(weights, 1, uniforms=uniforms)[:, 0]
+
+
+def _sample_groups(context: PredictionContext, method: str, num_to_predict: int,
+                   uniforms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """随机方法的多组 (正码矩阵, 特码向量); uniforms 为 (组数, 4, 50) 的均匀随机数"""
+    if method == 'grey':
+        regular_weights, special_weights = _grey_weights(context)
+        regular = sample_without_replacement(regular_weights, num_to_predict, uniforms=uniforms[:, 0])
+        # 特别号在本组正码之外按特码权重抽取
+        special_weights = special_weights * ~_number_mask(regular)
+        special = sample_without_replacement(special_weights, 1, uniforms=uniforms[:, 3])[:, 0]
+        return regular, special
+
+    markov = advanced_prediction.transition_weights(context)
+    bayes = advanced_prediction.bayes_weights(context)
+    trend = np.array(advanced_prediction.time_series_prediction(
+        context.draws, num_to_predict, context=context))
+    if method == 'markov':
+        regular = sample_without_replacement(markov, num_to_predict, uniforms=uniforms[:, 0])
+    elif method == 'bayes':
+        regular = sample_without_replacement(bayes, num_to_predict, uniforms=uniforms[:, 0])
+    elif method == 'timeseries':
+        regular = np.tile(trend, (len(uniforms), 1))
+    else:
+        # 混合: 三个模型共同的号码全部保留, 其余从各模型的候选号码中随机补足
+        markov_mask = _number_mask(sample_without_replacement(markov, num_to_predict, uniforms=uniforms[:, 0]))
+        bayes_mask = _number_mask(sample_without_replacement(bayes, num_to_predict, uniforms=uniforms[:, 1]))
+        trend_mask = _number_mask(np.tile(trend, (len(uniforms), 1)))
+        common = markov_mask & bayes_mask & trend_mask
+        candidates = markov_mask | bayes_mask | trend_mask
+        keys = np.where(common, 2.0, np.where(candidates, uniforms[:, 2], -1.0))
+        regular = np.argsort(-keys, axis=1, kind='stable')[:, :num_to_predict]
+    return regular, _advanced_special_groups(context, regular, uniforms[:, 3])
+
+
+def predict_groups(history_data: List[Dict] | DrawMatrix,
+                   method: str,
+                   n_groups: int,
+                   seed=None,
+                   num_to_predict: int = 6,
+                   recent_draws_count: int = 10,
+                   tag_trend_draws: int = 20,
+                   context: PredictionContext | None = None) -> List[dict]:
+    """用同一方法生成 n_groups 组预测
+
+    模型得分 (转移计数、条件概率、灰色模型概率等) 在上下文中只计算一次, 随后全部分组
+    在一次向量化抽样中得到, 分布与逐组调用对应的预测函数相同。每组的随机数来自
+    seed 派生的独立流 (SeedSequence.spawn), 各组互不相同且可复现, 第 g 组的结果
+    与总组数无关。确定性方法 (DETERMINISTIC_METHODS) 只有一组固定结果, 只能请求一组。
+
+    Args:
+        history_data: 历史数据 (DrawMatrix 或字典列表)
+        method: "basic", "tags", "markov", "bayes", "timeseries", "hybrid" 或 "grey"
+        n_groups: 组数
+        seed: 整数或 np.random.SeedSequence; None 时从全局 np.random 状态派生
+        context: 共享的预测上下文 (给出时忽略 history_data)
+
+    Returns:
+        每组一个 {'regular': [...], 'special': n} 字典的列表
+
+    Raises:
+        ValueError: 未知的预测方法, 或确定性方法请求了多于一组
+    """
+    if method not in ALL_METHODS + ('hybrid',):
+        raise ValueError(f"Unknown prediction method: {method}")
+    if method in DETERMINISTIC_METHODS and n_groups > 1:
+        raise ValueError(f"Prediction method {method} is deterministic and yields a single group")
+    context = PredictionContext.ensure(history_data, context)
+    group_seeds = _seed_sequence(seed).spawn(n_groups)
+    options = (num_to_predict, recent_draws_count, tag_trend_draws)
+
+    if not context.draws:
+        # 没有历史数据时各方法随机兜底, 逐组调用
+        return [_run_method(method, context, group_seed, *options) for group_seed in group_seeds]
+    if method in DETERMINISTIC_METHODS:
+        return [_run_method(method, context, group_seed, *options) for group_seed in group_seeds]
+
+    uniforms = np.array([np.random.default_rng(group_seed).random((4, COUNT_SIZE))
+                         for group_seed in group_seeds]).reshape(n_groups, 4, COUNT_SIZE)
+    regular, special = _sample_groups(context, method, num_to_predict, uniforms)
+    return [{'regular': sorted(numbers), 'special': number}
+            for numbers, number in zip(regular.tolist(), special.tolist())]
 
 if __name__ == '__main__':
     print("--- Testing prediction functions ---")
@@ -0,0 +1,195 @@
+"""一次预测运行共享的特征
+
+各预测方法需要的频率、近期计数、遗漏、标签趋势、马尔可夫转移计数等
+都从同一份历史数据得到。PredictionContext 在一次运行 (如综合预测的全部分组)
+中只构建一次, 各特征在第一次使用时计算并缓存, 之后各方法直接复用:
+
+    context = PredictionContext(repository.draws)
+    for _ in range(50):
+        prediction.predict_all_methods(context.draws, context=context)
+
+上下文只在数据不变的一次运行内有效, 数据更新后应重新构建。
+
+resolve_rng() 统一各预测方法的随机数来源: 每个方法接受自己的 np.random.Generator,
+并行运行时结果与调度顺序无关。sample_without_replacement() 是各方法共用的
+按权重不放回抽样 (Gumbel-top-k), 一次调用得到一组或多组号码。
+"""
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .draws import COUNT_SIZE, DrawMatrix, as_draw_matrix
+from .tagging import MAX_NUMBER, MIN_NUMBER, get_tags_for_number
+
+
+def resolve_rng(rng=None) -> np.random.Generator:
+    """预测方法使用的随机数生成器
+
+    Args:
+        rng: Generator 原样返回; 整数或 np.random.SeedSequence 作为种子;
+             None 时从全局 np.random 状态派生 (np.random.seed() 之后结果仍可复现)
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None:
+        return np.random.default_rng(np.random.randint(0, 2 ** 32, size=4))
+    return np.random.default_rng(rng)
+
+
+def sample_without_replacement(weights, k: int, rng=None, size: Optional[int] = None,
+                               uniforms: Optional[np.ndarray] = None) -> np.ndarray:
+    """按权重不放回地抽取 k 个不同号码 (Gumbel-top-k), 一次向量化调用
+
+    每个号码的键为 log(w) 加 Gumbel 噪声, 取键最大的 k 个, 分布与逐个按权重抽取并
+    丢弃重复号码相同, 但不需要循环, 总能结束。权重为 0 的号码排在全部正权重号码
+    之后, 正权重号码不足 k 个时随机补足。
+
+    Args:
+        weights: 长度50的权重向量 (下标即号码, 下标 0 不参与, 不要求归一化),
+                 或每组一行的 (组数, 50) 矩阵
+        k: 每组抽取的号码个数 (不超过 49)
+        rng: 见 resolve_rng
+        size: 组数; None 时按 weights 的形状 (向量返回一组)
+        uniforms: 可选, 已有的 [0, 1) 均匀随机数 (形状与结果的组数一致, 每行50个),
+                  如每组独立的随机数流; 给出时不使用 rng
+
+    Returns:
+        按抽中先后排列的号码, 形状 (k,) 或 (组数, k)
+
+    Raises:
+        ValueError: k 超过可选号码数
+    """
+    weights = np.asarray(weights, dtype=float)[..., MIN_NUMBER:MAX_NUMBER + 1]
+    if uniforms is None:
+        rows = size if size is not None else (len(weights) if weights.ndim == 2 else None)
+        shape = weights.shape[-1:] if rows is None else (rows, weights.shape[-1])
+        uniforms = resolve_rng(rng).random(shape)
+    else:
+        uniforms = np.asarray(uniforms)[..., MIN_NUMBER:MAX_NUMBER + 1]
+    if k > uniforms.shape[-1]:
+        raise ValueError(f"最多只能抽取 {uniforms.shape[-1]} 个不同号码")
+
+    positive = np.broadcast_to(weights > 0, uniforms.shape)
+    with np.errstate(divide='ignore'):
+        gumbel = -np.log(-np.log(uniforms))
+        keys = np.where(positive, np.log(np.where(positive, weights, 1.0)) + gumbel, -np.inf)
+    # 先按键降序; 权重为 0 的号码键相同, 再按噪声随机排列
+    return np.lexsort((-gumbel, -keys), axis=-1)[..., :k] + MIN_NUMBER
+
+
+class PredictionContext:
+    """历史数据及其派生特征 (按需计算, 结果缓存, 供只读使用)
+
+    Args:
+        history_data: DrawMatrix、HistoryWindow 或字典列表
+        regular_freq: 可选, 已有的正码计数向量 (如仓库的 frequency_vectors())
+        special_freq: 可选, 已有的特码计数向量
+    """
+
+    def __init__(self, history_data, regular_freq: Optional[np.ndarray] = None,
+                 special_freq: Optional[np.ndarray] = None):
+        self.draws = as_draw_matrix(history_data)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if regular_freq is not None and special_freq is not None:
+            self._cache['frequencies'] = (np.asarray(regular_freq, dtype=np.int64),
+                                          np.asarray(special_freq, dtype=np.int64))
+
+    @classmethod
+    def ensure(cls, history_data, context: Optional['PredictionContext'] = None) -> 'PredictionContext':
+        """已有上下文时原样返回, 否则为 history_data 新建一个"""
+        return context if context is not None else cls(history_data)
+
+    def __len__(self) -> int:
+        return len(self.draws)
+
+    def __getstate__(self) -> dict:
+        # 进程池: 只传递数据本身和已计算的特征 (不带位图、窗口和前缀和表等缓存),
+        # 锁在子进程中重新创建
+        state = self.__dict__.copy()
+        del state['_lock'], state['_key_locks']
+        draws = self.draws
+        state['draws'] = DrawMatrix(draws.numbers, draws.special, draws.draw_ids, draws.dates)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def derived(self, key, factory):
+        """按 key 缓存的派生结果, factory(draws) 只计算一次
+
+        每个 key 一把锁 (双重检查): 并行运行时不同特征可同时计算,
+        同一特征只计算一次, 已缓存的结果读取时不加锁。
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._cache:
+                self._cache[key] = factory(self.draws)
+            return self._cache[key]
+
+    # ------------------------------------------------------------------
+    # 频率与近期计数
+    # ------------------------------------------------------------------
+    def frequencies(self) -> tuple:
+        """全部历史的 (正码计数, 特码计数) 向量 (长度50, 下标即号码)"""
+        return self.derived('frequencies', lambda draws: (draws.regular_counts(), draws.special_counts()))
+
+    def frequency_shares(self) -> tuple:
+        """计数除以各自总和后的 (正码占比, 特码占比), 总和为 0 时全为 0"""
+        def shares(draws):
+            result = []
+            for counts in self.frequencies():
+                total = counts.sum()
+                result.append(counts / total if total > 0 else np.zeros(COUNT_SIZE))
+            return tuple(result)
+        return self.derived('frequency_shares', shares)
+
+    def recent_counts(self, count: int, number_type: str = 'regular') -> np.ndarray:
+        """最近 count 期中每个号码的出现次数 (count <= 0 时全为 0)"""
+        if not self.draws or count <= 0:
+            return np.zeros(COUNT_SIZE, dtype=np.int64)
+        window = self.draws.window(count)  # 窗口及其计数缓存在 DrawMatrix 上
+        return window.special_counts() if number_type == 'special' else window.regular_counts()
+
+    def last_seen(self) -> np.ndarray:
+        """每个号码作为正码最近一次出现的行号, 从未出现为 -1"""
+        return self.derived('last_seen', DrawMatrix.last_seen)
+
+    # ------------------------------------------------------------------
+    # 标签趋势
+    # ------------------------------------------------------------------
+    def tag_incidence(self) -> np.ndarray:
+        """号码-标签关系矩阵 (50×标签数, [n, t] 表示号码 n 带有第 t 个标签)"""
+        def incidence(draws):
+            tags_by_number = {num: get_tags_for_number(num) for num in range(MIN_NUMBER, MAX_NUMBER + 1)}
+            tags = sorted(set().union(*tags_by_number.values()))
+            index = {tag: i for i, tag in enumerate(tags)}
+            matrix = np.zeros((COUNT_SIZE, len(tags)))
+            for num, number_tags in tags_by_number.items():
+                matrix[num, [index[tag] for tag in number_tags]] = 1
+            return matrix
+        return self.derived('tag_incidence', incidence)
+
+    def tag_trend_shares(self, tag_trend_draws: int) -> tuple:
+        """最近 tag_trend_draws 期的标签趋势得分 (正码, 特码), 每个号码一个值
+
+        先统计窗口内每个标签出现的次数并除以总次数, 号码的得分为其各标签占比之和。
+        """
+        def shares(draws):
+            incidence = self.tag_incidence()
+            result = []
+            for number_type in ('regular', 'special'):
+                tag_counts = self.recent_counts(tag_trend_draws, number_type) @ incidence
+                total = tag_counts.sum()
+                result.append(incidence @ (tag_counts / total) if total > 0 else np.zeros(COUNT_SIZE))
+            return tuple(result)
+        return self.derived(('tag_trend_shares', tag_trend_draws), shares)
@@ -0,0 +1,214 @@
+"""SQLite 存储后端 (可选)
+
+在 config.py 中设置 STORAGE_BACKEND = "sqlite" 后, data_input 的读写改为使用
+SQLITE_PATH 指向的数据库:
+
+    draws(draw_id INTEGER PRIMARY KEY, seq, date, n1..n6, special, combo)
+    meta(key TEXT PRIMARY KEY, value INTEGER)
+
+- draw_id: 规范化的整数期号 (主键)
+- seq: 行顺序, 与 CSV 文件中的行顺序一致 (有索引, 用于 "最近N期" 查询)
+- combo: 号码组合键 (见 draws.combination_key, 有索引, 用于重复检查)
+- meta.generation: 每次写事务加一, 供其他进程判断数据是否变化
+
+数据库使用 WAL 模式: 读不阻塞写, 写也不阻塞读; 每次批量写入都在单个事务中完成。
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable
+
+import numpy as np
+
+from .draws import DrawMatrix, normalize_draw_id
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS draws (
+    draw_id INTEGER PRIMARY KEY,
+    seq     INTEGER NOT NULL,
+    date    TEXT    NOT NULL,
+    n1 INTEGER NOT NULL, n2 INTEGER NOT NULL, n3 INTEGER NOT NULL,
+    n4 INTEGER NOT NULL, n5 INTEGER NOT NULL, n6 INTEGER NOT NULL,
+    special INTEGER NOT NULL,
+    combo   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_draws_seq ON draws(seq);
+CREATE INDEX IF NOT EXISTS idx_draws_combo ON draws(combo);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta(key, value) VALUES ('generation', 0);
+"""
+
+_COLUMNS = "draw_id, date, n1, n2, n3, n4, n5, n6, special"
+
+# SQLite 单条语句的参数个数上限较小, IN 查询分批进行
+_LOOKUP_BATCH = 500
+
+
+class SQLiteHistoryStore:
+    """基于 SQLite 的开奖历史存储 (每个线程使用独立连接)"""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # 连接
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():  # 连接不能跨 fork 使用
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            # 已建表时不再执行建表语句 (避免只读连接等待写锁)
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'meta'").fetchone() is None:
+                conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _write(self, statements) -> None:
+        """在单个写事务中执行 statements(conn), 并递增 generation"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            statements(conn)
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _to_matrix(rows) -> DrawMatrix:
+        if not rows:
+            return DrawMatrix.empty()
+        draw_ids, dates, *columns = zip(*rows)
+        values = np.array(columns, dtype=np.int64).T
+        return DrawMatrix(values[:, :-1], values[:, -1], draw_ids, dates)
+
+    def generation(self) -> int:
+        """写入计数, 任一进程提交写事务后都会改变"""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM draws").fetchone()[0]
+
+    def load(self, start_id=None, end_id=None) -> DrawMatrix:
+        """按行顺序读取, 可选期号范围 [start_id, end_id] (走主键索引)"""
+        query, params = f"SELECT {_COLUMNS} FROM draws", []
+        conditions = []
+        if start_id is not None:
+            conditions.append("draw_id >= ?")
+            params.append(normalize_draw_id(start_id))
+        if end_id is not None:
+            conditions.append("draw_id <= ?")
+            params.append(normalize_draw_id(end_id))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self._to_matrix(self._connect().execute(query + " ORDER BY seq", params).fetchall())
+
+    def tail(self, count: int) -> DrawMatrix:
+        """最后 count 行 (等价于 load()[-count:], 只读取需要的行)"""
+        if count <= 0:
+            return DrawMatrix.empty()
+        rows = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM draws ORDER BY seq DESC LIMIT ?", (int(count),)).fetchall()
+        return self._to_matrix(rows[::-1])
+
+    def lookup(self, draw_ids: Iterable[int], combos: Iterable[int]) -> tuple:
+        """查询已存在的期号和号码组合
+
+        Returns:
+            tuple: (已存在的期号集合 (原始字符串), {组合键: 期号})
+        """
+        conn = self._connect()
+        found_ids, found_combos = set(), {}
+        draw_ids, combos = list(draw_ids), list(combos)
+        for i in range(0, len(draw_ids), _LOOKUP_BATCH):
+            batch = draw_ids[i:i + _LOOKUP_BATCH]
+            marks = ",".join("?" * len(batch))
+            found_ids.update(row[0] for row in conn.execute(
+                f"SELECT date FROM draws WHERE draw_id IN ({marks})", batch))
+        for i in range(0, len(combos), _LOOKUP_BATCH):
+            batch = combos[i:i + _LOOKUP_BATCH]
+            marks = ",".join("?" * len(batch))
+            for combo, date in conn.execute(
+                    f"SELECT combo, date FROM draws WHERE combo IN ({marks}) ORDER BY seq", batch):
+                found_combos.setdefault(combo, date)
+        return found_ids, found_combos
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _rows(draws: DrawMatrix, first_seq: int):
+        keys = draws.combination_keys().astype(np.int64).tolist()
+        for i, (draw_id, date, numbers, special) in enumerate(zip(
+                draws.draw_ids.tolist(), draws.dates.tolist(),
+                draws.numbers.tolist(), draws.special.tolist())):
+            yield (draw_id, first_seq + i, date, *numbers, special, keys[i])
+
+    def append(self, draws: DrawMatrix) -> None:
+        """在末尾追加 (单个事务)"""
+        if not len(draws):
+            return
+        def statements(conn):
+            last = conn.execute("SELECT COALESCE(MAX(seq), -1) FROM draws").fetchone()[0]
+            conn.executemany("INSERT INTO draws VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             self._rows(draws, last + 1))
+        self._write(statements)
+
+    def delete(self, draw_ids: Iterable[int]) -> None:
+        """按期号删除 (单个事务)"""
+        draw_ids = [int(i) for i in draw_ids]
+        def statements(conn):
+            for i in range(0, len(draw_ids), _LOOKUP_BATCH):
+                batch = draw_ids[i:i + _LOOKUP_BATCH]
+                conn.execute(f"DELETE FROM draws WHERE draw_id IN ({','.join('?' * len(batch))})", batch)
+        self._write(statements)
+
+    def replace_all(self, draws: DrawMatrix) -> None:
+        """用 draws 替换全部数据 (单个事务, 读者看到的要么是旧数据要么是新数据)
+
+        期号重复时只保留第一次出现的记录。
+        """
+        _, first = np.unique(draws.draw_ids, return_index=True)
+        if len(first) < len(draws):
+            draws = draws[np.sort(first)]
+        def statements(conn):
+            conn.execute("DELETE FROM draws")
+            conn.executemany("INSERT INTO draws VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             self._rows(draws, 0))
+        self._write(statements)
+
+
+_stores: Dict[str, SQLiteHistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str) -> SQLiteHistoryStore:
+    """按路径共享的存储实例"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SQLiteHistoryStore(path)
+        return _stores[path]
@@ -423,6 +423,32 @@ def get_color_tag(number: int) -> str | None:
             return color
     return None # Should not be reached with current complete COLOR_MAPPING
 
+# 标签类别 -> 取值函数 (固定映射, 与自定义标签无关)
+CATEGORY_TAG_GETTERS = {
+    "单双": get_dx_tag,
+    "大小": get_ds_tag,
+    "合数特征": get_sum_feature_tag,
+    "尾数特征": get_tail_feature_tag,
+    "生肖": get_zodiac_tag,
+    "五行": get_element_tag,
+    "波色": get_color_tag,
+}
+
+def annotate_numbers(numbers) -> Dict[str, List[str | None]]:
+    """按类别标注一组号码, 返回 {类别: [每个号码的标签]}
+
+    无效号码 (非整数或超出 1-49) 的标签为 None。每个类别只对 1-49 查一次表。
+    """
+    numbers = list(numbers)
+    annotations = {}
+    for category, getter in CATEGORY_TAG_GETTERS.items():
+        table = {num: getter(num) for num in range(MIN_NUMBER, MAX_NUMBER + 1)}
+        annotations[category] = [
+            table.get(num) if isinstance(num, int) and not isinstance(num, bool) else None
+            for num in numbers
+        ]
+    return annotations
+
 def export_tags(filepath: str) -> bool:
     """导出标签数据"""
     try:
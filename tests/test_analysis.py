@@ -1,6 +1,9 @@
 import unittest
 import collections # For defaultdict
+import numpy as np
 from lottery_analyzer import analysis # Assuming analysis.py is in lottery_analyzer package
+from lottery_analyzer import prediction
+from lottery_analyzer.draws import DrawMatrix
 
 class TestAnalysisFunctions(unittest.TestCase):
 
@@ -146,5 +149,160 @@ class TestAnalysisFunctions(unittest.TestCase):
         self.assertEqual(analysis.get_least_frequent(freq_dict, 2), [(2,5), (1,10)])
 
 
+class TestFrequencyVectors(unittest.TestCase):
+
+    def setUp(self):
+        self.history = [
+            {'date': '2023-01-01', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 7},
+            {'date': '2023-01-08', 'numbers': [1, 10, 11, 12, 13, 49], 'special': 7},
+            {'date': '2023-01-15', 'numbers': [2, 20, 21, 22, 23, 24], 'special': 49},
+        ]
+        self.draws = DrawMatrix.from_dicts(self.history)
+
+    def test_dense_vectors(self):
+        regular, special = analysis.frequency_vectors(self.draws)
+        self.assertEqual(regular.shape, (50,))
+        self.assertEqual((regular[1], regular[2], regular[49], regular[0]), (2, 2, 1, 0))
+        self.assertEqual((special[7], special[49]), (2, 1))
+        self.assertEqual(regular.sum(), 18)
+
+    def test_dict_wrapper_matches_vectors(self):
+        regular, special = analysis.calculate_frequencies(self.history)
+        self.assertIsInstance(regular, collections.defaultdict)
+        self.assertEqual(dict(regular), {n: int(c) for n, c in enumerate(analysis.frequency_vectors(self.draws)[0]) if c})
+        self.assertEqual(analysis.calculate_frequencies(self.draws), (regular, special))
+
+    def test_predictors_accept_vectors(self):
+        reg_freq, spec_freq = analysis.calculate_frequencies(self.history)
+        reg_vec, spec_vec = analysis.frequency_vectors(self.draws)
+        self.assertEqual(
+            prediction.predict_numbers_basic(self.draws, reg_vec, spec_vec, recent_draws_count=2),
+            prediction.predict_numbers_basic(self.draws, reg_freq, spec_freq, recent_draws_count=2))
+
+
+class TestBatchedTopK(unittest.TestCase):
+
+    def test_ties_broken_by_smaller_number(self):
+        counts = np.zeros((2, 50), dtype=np.int64)
+        counts[0, [5, 3, 9]] = [2, 2, 1]
+        counts[1, 1:] = 1
+        numbers, values = analysis.top_k_numbers(counts, 3)
+        self.assertEqual(numbers.tolist(), [[3, 5, 9], [1, 2, 3]])
+        self.assertEqual(values.tolist(), [[2, 2, 1], [1, 1, 1]])
+        numbers, values = analysis.top_k_numbers(counts[0], 2, largest=False)
+        self.assertEqual(numbers.tolist(), [1, 2])  # never drawn counts as coldest
+        self.assertEqual(analysis.top_k_numbers(counts, 0)[0].shape, (2, 0))
+
+    def test_matches_full_sort(self):
+        counts = np.random.default_rng(0).integers(0, 5, size=(4, 50))
+        numbers, _ = analysis.top_k_numbers(counts, 10, largest=False)
+        for row, picked in zip(counts, numbers):
+            self.assertEqual(picked.tolist(), sorted(range(1, 50), key=lambda n: (row[n], n))[:10])
+
+    def test_hot_cold_table(self):
+        history = [{'date': str(i), 'numbers': [1, 2, 3, 4, 5, 6 + i], 'special': 40 + i % 2}
+                   for i in range(12)]
+        table = analysis.hot_cold_table(history, periods=(10, 100), k=2)
+        self.assertEqual([row['draws'] for row in table], [10, 12])
+        self.assertEqual(table[0]['hot'], [(1, 10), (2, 10)])
+        self.assertEqual(table[1]['cold'], [(18, 0), (19, 0)])
+        special = analysis.hot_cold_table(history, periods=(3,), k=1, number_type='special')
+        self.assertEqual(special[0]['hot'], [(41, 2)])
+
+
+class TestStreamingAccumulators(unittest.TestCase):
+
+    def setUp(self):
+        self.history = [
+            {'date': '2023-01-01', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 7},
+            {'date': '2023-01-08', 'numbers': [1, 10, 11, 12, 13, 14], 'special': 7},
+            {'date': '2023-01-15', 'numbers': [2, 20, 21, 22, 23, 24], 'special': 8},
+            {'date': '2023-01-22', 'numbers': [1, 30, 31, 32, 33, 34], 'special': 9},
+            {'date': '2023-01-29', 'numbers': [1, 2, 10, 40, 41, 42], 'special': 7},
+        ]
+        self.blocks = [self.history[:2], self.history[2:3], self.history[3:]]
+
+    def test_frequency_accumulator_matches_calculate_frequencies(self):
+        freq, = analysis.accumulate(self.blocks, analysis.FrequencyAccumulator())
+        self.assertEqual(freq.result(), analysis.calculate_frequencies(self.history))
+        self.assertEqual(freq.total_draws, 5)
+
+    def test_gap_accumulator_across_blocks(self):
+        gaps, specials = analysis.accumulate(
+            self.blocks, analysis.GapAccumulator(), analysis.GapAccumulator('special'))
+        current, longest = gaps.current_gaps(), gaps.max_gaps()
+        self.assertEqual((current[1], longest[1]), (0, 1))   # rows 0,1,3,4
+        self.assertEqual((current[2], longest[2]), (0, 1))   # rows 0,2,4
+        self.assertEqual((current[3], longest[3]), (4, 4))   # row 0 only
+        self.assertEqual((current[49], longest[49]), (5, 5)) # never drawn
+        self.assertEqual((specials.current_gaps()[8], specials.max_gaps()[7]), (2, 2))
+
+    def test_pair_accumulator(self):
+        pairs, = analysis.accumulate(self.blocks, analysis.PairAccumulator())
+        self.assertEqual(pairs.counts[1, 2], 2)
+        self.assertEqual(pairs.counts[1, 1], 4)
+        self.assertEqual(pairs.top_pairs(2), [((1, 2), 2), ((1, 10), 2)])
+
+    def test_cooccurrence(self):
+        pairs = analysis.cooccurrence(self.history)
+        self.assertEqual(pairs.top_pairs(2), [((1, 2), 2), ((1, 10), 2)])
+        self.assertEqual(pairs.partners(1, 2), [(2, 2), (10, 2)])
+        self.assertEqual(pairs.triple_count(10, 1, 2), 1)
+        self.assertEqual(pairs.triple_count(1, 2, 3), 1)
+        self.assertEqual(pairs.triple_count(1, 2, 20), 0)
+        self.assertEqual(pairs.top_triples(1), [((1, 2, 3), 1)])
+        self.assertEqual(pairs.special_cross[7, 1], 3)
+        self.assertEqual(pairs.special_partners(7, 1), [(1, 3)])
+
+    def test_cooccurrence_blocks_and_window_cache(self):
+        whole = analysis.cooccurrence(self.history)
+        blocks, = analysis.accumulate(self.blocks, analysis.CooccurrenceAccumulator())
+        np.testing.assert_array_equal(blocks.counts, whole.counts)
+        np.testing.assert_array_equal(blocks.special_cross, whole.special_cross)
+        np.testing.assert_array_equal(blocks.triple_keys, whole.triple_keys)
+        np.testing.assert_array_equal(blocks.triple_counts, whole.triple_counts)
+        window = DrawMatrix.from_dicts(self.history).window(2)
+        self.assertIs(analysis.cooccurrence(window), analysis.cooccurrence(window))
+        self.assertEqual(analysis.cooccurrence(window).top_pairs(1), [((1, 2), 1)])
+
+
+class TestGapStatistics(unittest.TestCase):
+
+    def setUp(self):
+        # 1 drawn at rows 0, 1, 3, 7 -> closed gaps 0, 1, 3; current gap 2
+        self.history = [
+            {'date': str(i), 'numbers': [1 if i in (0, 1, 3, 7) else 2] + [10 + i, 20, 21, 22, 23],
+             'special': 30 + i % 2}
+            for i in range(10)
+        ]
+
+    def test_mean_and_percentiles(self):
+        gaps = analysis.gap_statistics(self.history)
+        self.assertEqual(gaps.current_gaps()[1], 2)
+        self.assertAlmostEqual(gaps.mean_gaps()[1], 4 / 3)
+        self.assertEqual(gaps.gap_percentiles(50)[1], 1)
+        self.assertEqual(gaps.gap_percentiles(100)[1], 3)
+        self.assertAlmostEqual(gaps.current_gap_percentiles()[1], 200 / 3)  # 0 and 1 are shorter
+        self.assertEqual(gaps.mean_gaps()[20], 0)
+        self.assertTrue(np.isnan(gaps.mean_gaps()[10]))  # drawn only once
+        self.assertTrue(np.isnan(gaps.current_gap_percentiles()[49]))
+        self.assertEqual(analysis.gap_statistics(self.history, 'special').mean_gaps()[30], 1)
+
+    def test_incremental_update_matches_single_pass(self):
+        whole = analysis.gap_statistics(self.history)
+        gaps = analysis.gap_statistics(self.history[:2])
+        gaps.update(self.history[2:5])
+        gaps.update(self.history[5:])
+        np.testing.assert_array_equal(gaps.current_gaps(), whole.current_gaps())
+        np.testing.assert_array_equal(gaps.max_gaps(), whole.max_gaps())
+        np.testing.assert_array_equal(gaps.mean_gaps(), whole.mean_gaps())
+        np.testing.assert_array_equal(gaps.gap_percentiles(90), whole.gap_percentiles(90))
+        np.testing.assert_array_equal(gaps.current_gap_percentiles(), whole.current_gap_percentiles())
+
+    def test_invalid_percentile(self):
+        with self.assertRaises(ValueError):
+            analysis.gap_statistics(self.history).gap_percentiles(101)
+
+
 if __name__ == '__main__':
     unittest.main()
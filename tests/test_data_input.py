@@ -0,0 +1,598 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from lottery_analyzer import data_input
+
+
+SAMPLE_CSV = (
+    "date,n1,n2,n3,n4,n5,n6,special_number\n"
+    "2025001,01,02,03,04,05,06,07\n"
+    "2025002,08,09,10,11,12,13,14\n"
+    "2025003,15,16,17,18,19,20,21\n"
+)
+
+
+class DataDirTestCase(unittest.TestCase):
+    """Points data_input at a temporary data directory for each test."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.system_file = os.path.join(self.tmpdir, "history.csv")
+        with open(self.system_file, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_CSV)
+        patcher = mock.patch.multiple(
+            data_input,
+            DATA_DIR=self.tmpdir,
+            BACKUP_DIR=os.path.join(self.tmpdir, "backup"),
+            SYSTEM_FILE=self.system_file,
+            ARCHIVE_DIR=os.path.join(self.tmpdir, "history"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+
+
+class TestSidecarCache(DataDirTestCase):
+
+    def test_cold_load_writes_sidecar(self):
+        draws = data_input.load_draws()
+        self.assertEqual(len(draws), 3)
+        self.assertTrue(os.path.exists(self.system_file + data_input.SIDECAR_SUFFIX))
+        self.assertTrue(os.path.exists(self.system_file + data_input.SIDECAR_META_SUFFIX))
+
+    def test_warm_load_skips_csv_parsing(self):
+        cold = data_input.load_draws()
+        with mock.patch.object(data_input, '_read_history_file', side_effect=AssertionError("parsed CSV")):
+            warm = data_input.load_draws()
+        self.assertEqual(warm.to_dicts(), cold.to_dicts())
+        self.assertIsInstance(warm.numbers.base, np.memmap)
+
+    def test_sidecar_invalidated_when_csv_changes(self):
+        data_input.load_draws()
+        with open(self.system_file, 'a', encoding='utf-8') as f:
+            f.write("2025004,22,23,24,25,26,27,28\n")
+        self.assertEqual(len(data_input.load_draws()), 4)
+
+    def test_touch_with_same_content_keeps_sidecar(self):
+        data_input.load_draws()
+        stat = os.stat(self.system_file)
+        os.utime(self.system_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000))
+        with mock.patch.object(data_input, '_read_history_file', side_effect=AssertionError("parsed CSV")):
+            self.assertEqual(len(data_input.load_draws()), 3)
+
+    def test_stale_npy_under_fresh_meta_is_rejected(self):
+        data_input.load_draws()
+        npy_path = self.system_file + data_input.SIDECAR_SUFFIX
+        shutil.copy(npy_path, npy_path + ".old")
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        # 解析旧 CSV 的读者在写入方之后替换了 .npy
+        os.replace(npy_path + ".old", npy_path)
+        self.assertEqual(data_input.load_draws().dates.tolist()[-1], '2025004')
+
+    def test_reader_skips_sidecar_while_writer_holds_lock(self):
+        locked, release = threading.Event(), threading.Event()
+
+        def writer():
+            with data_input._history_lock():
+                locked.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        locked.wait(5)
+        self.assertEqual(len(data_input._load_system_draws(self.system_file)), 3)
+        self.assertFalse(os.path.exists(self.system_file + data_input.SIDECAR_META_SUFFIX))
+        release.set()
+        thread.join()
+        data_input._load_system_draws(self.system_file)
+        self.assertTrue(os.path.exists(self.system_file + data_input.SIDECAR_META_SUFFIX))
+
+    def test_load_history_returns_dicts(self):
+        history = data_input.load_history()
+        self.assertEqual(history[0], {'date': '2025001', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 7})
+
+
+class TestAppendAndAtomicWrites(DataDirTestCase):
+
+    def test_append_draws_appends_only_new_rows(self):
+        added = data_input.append_draws([
+            {'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28},
+        ])
+        self.assertEqual(added, 1)
+        with open(self.system_file, encoding='utf-8') as f:
+            content = f.read()
+        self.assertTrue(content.startswith(SAMPLE_CSV))
+        self.assertEqual(content.count('date,'), 1)
+        self.assertEqual(data_input.load_history()[-1]['date'], '2025004')
+
+    def test_append_draws_keeps_sidecar_current(self):
+        data_input.load_draws()
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        with mock.patch.object(data_input, '_read_history_file', side_effect=AssertionError("parsed CSV")):
+            draws = data_input.load_draws()
+            data_input.append_draws([{'date': '2025005', 'numbers': [29, 30, 31, 32, 33, 34], 'special': 35}])
+            self.assertEqual(len(data_input.load_draws()), 5)
+        self.assertEqual(draws.dates.tolist()[-1], '2025004')
+        self.assertIsInstance(draws.numbers.base, np.memmap)
+
+    def test_append_extends_sidecar_without_rewriting_or_hashing(self):
+        data_input.load_draws()
+        with mock.patch.object(data_input, '_write_sidecar', side_effect=AssertionError("rewrote sidecar")), \
+                mock.patch.object(data_input, '_content_hash', side_effect=AssertionError("hashed CSV")):
+            data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        records = np.load(self.system_file + data_input.SIDECAR_SUFFIX)
+        self.assertEqual(records['draw_id'].tolist(), [2025001, 2025002, 2025003, 2025004])
+        with open(self.system_file + data_input.SIDECAR_META_SUFFIX, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['rows'], 4)
+
+    def test_sidecar_dropped_when_it_cannot_grow_in_place(self):
+        data_input.load_draws()
+        with mock.patch.object(data_input, '_extend_npy', return_value=False):
+            data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        # 元数据被删除后下次读取重新解析CSV并重建缓存
+        self.assertEqual(data_input.load_draws().dates.tolist()[-1], '2025004')
+        self.assertEqual(len(np.load(self.system_file + data_input.SIDECAR_SUFFIX)), 4)
+
+    def test_append_draws_rejects_existing_and_invalid_ids(self):
+        added = data_input.append_draws([
+            {'date': '2025001', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28},
+            {'date': '2023-01-01', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28},
+        ])
+        self.assertEqual(added, 0)
+        self.assertEqual(len(data_input.load_draws()), 3)
+
+    def test_append_draws_handles_missing_trailing_newline(self):
+        with open(self.system_file, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_CSV.rstrip('\n'))
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        self.assertEqual(len(data_input.load_draws()), 4)
+
+    def test_append_draws_creates_missing_file(self):
+        os.remove(self.system_file)
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        self.assertEqual(len(data_input.load_history()), 1)
+
+    def test_failed_rewrite_keeps_original_file(self):
+        with mock.patch.object(data_input, '_draw_to_row', side_effect=RuntimeError("disk full")):
+            with self.assertRaises(IOError):
+                data_input.save_history(data_input.load_history()[:1])
+        with open(self.system_file, encoding='utf-8') as f:
+            self.assertEqual(f.read(), SAMPLE_CSV)
+        self.assertFalse([name for name in os.listdir(self.tmpdir) if name.endswith('.tmp')])
+
+    def test_save_history_rewrites_atomically(self):
+        data_input.save_history(data_input.load_history()[1:])
+        self.assertEqual([d['date'] for d in data_input.load_history()], ['2025002', '2025003'])
+        self.assertFalse([name for name in os.listdir(self.tmpdir) if name.endswith('.tmp')])
+
+
+class TestDuplicateIndex(DataDirTestCase):
+
+    def _draw(self, i, numbers, special):
+        return {'date': f"2024{i:03d}", 'numbers': numbers, 'special': special}
+
+    def test_duplicate_far_back_is_rejected(self):
+        history = [self._draw(1, [1, 2, 3, 4, 5, 6], 7)]
+        history += [self._draw(i, [i, i + 10, i + 20, 31, 32, 33], 40) for i in range(2, 15)]
+        history.append(self._draw(15, [6, 5, 4, 3, 2, 1], 7))  # same combination, different order
+        data_input.save_history(history)
+        dates = [d['date'] for d in data_input.load_history()]
+        self.assertEqual(len(dates), 14)
+        self.assertNotIn('2024015', dates)
+
+    def test_append_checks_whole_history(self):
+        added = data_input.append_draws([
+            {'date': '2025004', 'numbers': [3, 2, 1, 4, 5, 6], 'special': 7},    # same as 2025001
+            {'date': '2025005', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 8},    # different special
+        ])
+        self.assertEqual(added, 1)
+        self.assertEqual(data_input.load_history()[-1]['date'], '2025005')
+
+    def test_append_index_covers_only_related_rows(self):
+        index = data_input._draws_index(data_input.load_draws(), [
+            {'date': '2025002', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28},
+            {'date': '2025009', 'numbers': [6, 5, 4, 3, 2, 1], 'special': 7},
+        ])
+        self.assertEqual(index.ids, {'2025002'})
+        self.assertEqual(list(index.combinations.values()), ['2025001'])
+
+    def test_index_built_from_draws(self):
+        index = data_input.DrawIndex.from_draws(data_input.load_draws())
+        self.assertEqual(index.ids, {'2025001', '2025002', '2025003'})
+        self.assertFalse(data_input._validate_draw_data(
+            {'date': '2025009', 'numbers': [13, 12, 11, 10, 9, 8], 'special': 14}, index))
+        self.assertTrue(data_input._validate_draw_data(
+            {'date': '2025002', 'numbers': [8, 9, 10, 11, 12, 13], 'special': 14}, index))
+
+
+class TestIterHistory(DataDirTestCase):
+
+    def test_chunks_cover_whole_file(self):
+        blocks = list(data_input.iter_history(chunk_size=2))
+        self.assertEqual([len(block) for block in blocks], [2, 1])
+        self.assertEqual(data_input.DrawMatrix.concatenate(blocks).to_dicts(),
+                         data_input.load_draws().to_dicts())
+
+    def test_bad_rows_skipped_within_chunk(self):
+        with open(self.system_file, 'a', encoding='utf-8') as f:
+            f.write("2025004,22,23,xx,25,26,27,28\n")     # not a number: per-line fallback
+            f.write("2025005,22,23,24,25,26\n")           # missing column
+            f.write("2025006,22,23,24,25,26,27,50\n")     # out of range
+            f.write("\n")
+            f.write("2025007,22,23,24,25,26,27,28\n")
+        dates = [d['date'] for d in data_input.DrawMatrix.concatenate(
+            data_input.iter_history(chunk_size=4)).to_dicts()]
+        self.assertEqual(dates, ['2025001', '2025002', '2025003', '2025007'])
+
+    def test_header_with_reordered_columns(self):
+        with open(self.system_file, 'w', encoding='utf-8') as f:
+            f.write("special_number,date,n1,n2,n3,n4,n5,n6\r\n07,2025001,01,02,03,04,05,06\r\n")
+        block, = data_input.iter_history()
+        self.assertEqual(block[0], {'date': '2025001', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 7})
+
+    def test_missing_columns_raise(self):
+        with open(self.system_file, 'w', encoding='utf-8') as f:
+            f.write("date,a,b\n1,2,3\n")
+        with self.assertRaises(ValueError):
+            list(data_input.iter_history())
+
+
+class TestBulkIngest(DataDirTestCase):
+
+    def _write(self, body):
+        path = os.path.join(self.tmpdir, "import.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("date,n1,n2,n3,n4,n5,n6,special_number\n" + body)
+        return path
+
+    def test_rejection_report(self):
+        path = self._write(
+            "2024001,01,02,03,04,05,06,07\n"
+            "2024002,01,01,03,04,05,06,07\n"   # duplicate regular
+            "2024003,01,02,03,04,05,06,06\n"   # special among regulars
+            "2024004,01,02,03,04,05,60,07\n"   # out of range
+            "2024-05,01,02,03,04,05,06,07\n"   # bad id
+            "2024006,01,02,xx,04,05,06,07\n"   # not a number
+            "2024007,01,02,03,04,05\n"         # missing column
+            "2024008,\"08\",09,10,11,12,13,14\n" # quoted field, still valid
+        )
+        with mock.patch('builtins.print') as printed:
+            draws, report = data_input.ingest_history(path, chunk_size=3)
+        printed.assert_not_called()
+        self.assertEqual(draws.dates.tolist(), ['2024001', '2024008'])
+        self.assertEqual(report.accepted, 2)
+        self.assertEqual([(item['line'], item['reason']) for item in report.rejected],
+                         [(3, 'duplicate_numbers'), (4, 'special_in_regulars'), (5, 'range'),
+                          (6, 'draw_id'), (7, 'format'), (8, 'format')])
+        self.assertEqual(report.counts()['format'], 2)
+
+    def test_merge_import_uses_ingest(self):
+        path = self._write("2024001,11,12,13,14,15,16,17\n2024002,01,01,03,04,05,06,07\n")
+        data_input.load_history(path, merge=True)
+        self.assertEqual([d['date'] for d in data_input.load_history()],
+                         ['2024001', '2025001', '2025002', '2025003'])
+
+
+class TestMergeHistories(DataDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.import_file = os.path.join(self.tmpdir, "import.csv")
+        with open(self.import_file, 'w', encoding='utf-8') as f:
+            f.write("date,n1,n2,n3,n4,n5,n6,special_number\n"
+                    "2025004,22,23,24,25,26,27,28\n"   # new
+                    "2025002,13,12,11,10,09,08,14\n"   # identical (different order)
+                    "2025003,15,16,17,18,19,20,30\n"   # same id, different numbers
+                    "2025005,01,02,03,04,05,06,07\n")  # same combination as 2025001
+
+    def test_report_and_result(self):
+        report = data_input.import_history(self.import_file)
+        self.assertEqual(report.inserted.tolist(), [2025004])
+        self.assertEqual(report.identical.tolist(), [2025002])
+        self.assertEqual(sorted(report.conflicting.tolist()), [2025003, 2025005])
+        self.assertEqual({c['reason'] for c in report.conflicts},
+                         {'different_numbers', 'duplicate_combination'})
+        history = data_input.load_history()
+        self.assertEqual([d['date'] for d in history], ['2025001', '2025002', '2025003', '2025004'])
+        self.assertEqual(history[2]['special'], 21)  # existing record kept
+
+    def test_repeated_ids_in_batch_are_reported(self):
+        incoming = data_input.DrawMatrix(
+            np.array([[22, 23, 24, 25, 26, 27], [27, 26, 25, 24, 23, 22], [30, 31, 32, 33, 34, 35]]),
+            np.array([28, 28, 36]), draw_ids=np.array([2025004, 2025004, 2025004]),
+            dates=np.array(['2025004'] * 3))
+        merged, report = data_input.merge_histories(data_input.load_draws(), incoming)
+        self.assertEqual(report.inserted.tolist(), [2025004])
+        self.assertEqual(report.repeated.tolist(), [2025004])
+        self.assertEqual(report.conflicting.tolist(), [2025004])
+        self.assertEqual([(c['reason'], c['incoming']) for c in report.conflicts],
+                         [('repeated_id', '2025004: [30, 31, 32, 33, 34, 35] + 36')])
+        self.assertIn("重复 1 行", report.summary())
+        self.assertEqual(merged.numbers[-1].tolist(), [22, 23, 24, 25, 26, 27])
+
+    def test_descending_order_preserved(self):
+        existing = data_input.load_draws()[::-1]
+        merged, report = data_input.merge_histories(existing, data_input.ingest_history(self.import_file)[0])
+        self.assertEqual(merged.dates.tolist(), ['2025004', '2025003', '2025002', '2025001'])
+
+    def test_nothing_new_leaves_file_untouched(self):
+        before = os.stat(self.system_file).st_ino
+        with open(self.import_file, 'w', encoding='utf-8') as f:
+            f.write("date,n1,n2,n3,n4,n5,n6,special_number\n2025001,01,02,03,04,05,06,07\n")
+        report = data_input.import_history(self.import_file)
+        self.assertEqual(report.identical.tolist(), [2025001])
+        self.assertEqual(os.stat(self.system_file).st_ino, before)
+
+
+class TestYearArchive(DataDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.archive_dir = os.path.join(self.tmpdir, "history")
+        history = [{'date': f"{year}{i:03d}", 'numbers': [i, i + 10, i + 20, 31, 32, 33], 'special': year - 2000}
+                   for year in (2023, 2024, 2025) for i in range(1, 4)]
+        data_input.save_history(history)
+
+    def _inodes(self):
+        # 分区通过 os.replace 重写, inode 随之改变
+        return {name: os.stat(os.path.join(self.archive_dir, name)).st_ino
+                for name in os.listdir(self.archive_dir) if name.endswith('.npz')}
+
+    def test_partitions_and_manifest(self):
+        self.assertEqual(sorted(self._inodes()), ['2023.npz', '2024.npz', '2025.npz'])
+        partitions = data_input._archive().partitions()
+        self.assertEqual([(p['year'], p['min_id'], p['max_id'], p['rows']) for p in partitions],
+                         [('2023', 2023001, 2023003, 3), ('2024', 2024001, 2024003, 3),
+                          ('2025', 2025001, 2025003, 3)])
+
+    def test_range_query_opens_only_needed_partitions(self):
+        archive = data_input._archive()
+        opened = []
+        original = data_input.HistoryArchive._read_partition
+        def spy(self, entry):
+            opened.append(entry['year'])
+            return original(self, entry)
+        with mock.patch.object(data_input.HistoryArchive, '_read_partition', spy):
+            history = data_input.load_history(start_id='2024002', end_id='2025001')
+        self.assertEqual([d['date'] for d in history], ['2024002', '2024003', '2025001'])
+        self.assertEqual(opened, ['2024', '2025'])
+        self.assertEqual(len(archive.load(start_id=2025002)), 2)
+
+    def test_append_rewrites_only_current_year(self):
+        before = self._inodes()
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        after = self._inodes()
+        self.assertEqual(after['2023.npz'], before['2023.npz'])
+        self.assertEqual(after['2024.npz'], before['2024.npz'])
+        self.assertNotEqual(after['2025.npz'], before['2025.npz'])
+        self.assertEqual(len(data_input.load_draws(start_id='2025001')), 4)
+
+    def test_rewrite_touches_only_changed_year(self):
+        before = self._inodes()
+        history = [d for d in data_input.load_history() if d['date'] != '2024002']
+        data_input.save_history(history)
+        after = self._inodes()
+        self.assertEqual(after['2023.npz'], before['2023.npz'])
+        self.assertNotEqual(after['2024.npz'], before['2024.npz'])
+        self.assertEqual(after['2025.npz'], before['2025.npz'])
+
+    def test_delete_and_import_touch_only_changed_years(self):
+        before = self._inodes()
+        with mock.patch.object(data_input.HistoryArchive, '_read_partition',
+                               side_effect=AssertionError("read partition")), \
+                mock.patch.object(data_input, '_read_history_file', side_effect=AssertionError("parsed CSV")):
+            self.assertEqual(data_input.delete_draws(['2024002']), 1)
+        after = self._inodes()
+        self.assertEqual(after['2023.npz'], before['2023.npz'])
+        self.assertNotEqual(after['2024.npz'], before['2024.npz'])
+        self.assertEqual(after['2025.npz'], before['2025.npz'])
+
+        import_file = os.path.join(self.tmpdir, "import.csv")
+        with open(import_file, 'w', encoding='utf-8') as f:
+            f.write("date,n1,n2,n3,n4,n5,n6,special_number\n2023004,40,41,42,43,44,45,46\n")
+        with mock.patch.object(data_input.HistoryArchive, '_read_partition',
+                               side_effect=AssertionError("read partition")):
+            data_input.import_history(import_file)
+        final = self._inodes()
+        self.assertNotEqual(final['2023.npz'], after['2023.npz'])
+        self.assertEqual(final['2024.npz'], after['2024.npz'])
+        self.assertEqual(final['2025.npz'], after['2025.npz'])
+        self.assertEqual([d['date'] for d in data_input.load_history(start_id='2023003', end_id='2024002')],
+                         ['2023003', '2023004', '2024001'])
+
+    def test_stale_archive_resynced_from_csv(self):
+        with open(self.system_file, 'a', encoding='utf-8') as f:
+            f.write("2026001,22,23,24,25,26,27,28\n")
+        self.assertEqual([d['date'] for d in data_input.load_history(start_id='2026000')], ['2026001'])
+
+
+class TestBackups(DataDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.store = data_input.BackupStore(os.path.join(self.tmpdir, "backup"))
+
+    def _blobs(self):
+        return os.listdir(self.store.blob_dir)
+
+    def test_unchanged_data_is_backed_up_once(self):
+        first = data_input.backup_history()
+        second = data_input.backup_history()
+        self.assertEqual(first, second)
+        self.assertEqual(len(data_input.list_backups()), 1)
+        self.assertEqual(len(self._blobs()), 1)
+
+    def test_same_content_shares_blob(self):
+        first = data_input.backup_history()
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        data_input.backup_history()
+        with open(self.system_file, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_CSV)
+        third = data_input.backup_history()
+        self.assertEqual(third['sha256'], first['sha256'])
+        self.assertEqual(len(data_input.list_backups()), 3)
+        self.assertEqual(len(self._blobs()), 2)
+
+    def test_initialize_and_restore(self):
+        self.assertTrue(data_input.initialize_data())
+        self.assertEqual(len(data_input.load_draws()), 0)
+        snapshot = data_input.list_backups()[0]
+        self.assertTrue(data_input.restore_history(snapshot['id']))
+        with open(self.system_file, encoding='utf-8') as f:
+            self.assertEqual(f.read(), SAMPLE_CSV)
+        self.assertFalse(data_input.restore_history('missing'))
+
+    def test_retention_keeps_last_daily_and_monthly(self):
+        from datetime import datetime
+        stamps = [datetime(2025, 1, 15), datetime(2025, 2, 10), datetime(2025, 3, 1, 9),
+                  datetime(2025, 3, 1, 18), datetime(2025, 3, 2), datetime(2025, 3, 3)]
+        for i, stamp in enumerate(stamps):
+            with open(self.system_file, 'a', encoding='utf-8') as f:
+                f.write(f"20250{i + 10},22,23,24,25,26,{i + 30},28\n")
+            self.store.snapshot(self.system_file, now=stamp)
+        removed = self.store.apply_retention(keep_last=1, keep_daily=2, keep_monthly=2)
+        kept = [s['created'] for s in self.store.snapshots()]
+        self.assertEqual(kept, ['2025-02-10T00:00:00', '2025-03-02T00:00:00', '2025-03-03T00:00:00'])
+        self.assertEqual(len(removed), 3)
+        self.assertEqual(len(self._blobs()), 3)
+
+
+class TestFrequencyState(DataDirTestCase):
+
+    NEW_DRAW = {'date': '2025004', 'numbers': [1, 23, 24, 25, 26, 27], 'special': 28}
+
+    def assertStateMatchesHistory(self, state):
+        draws = data_input.load_draws()
+        self.assertEqual(state.total_draws, len(draws))
+        self.assertEqual(state.regular.tolist(), draws.regular_counts().tolist())
+        self.assertEqual(state.special.tolist(), draws.special_counts().tolist())
+
+    def test_state_persisted_and_reused(self):
+        state = data_input.load_frequency_state()
+        self.assertStateMatchesHistory(state)
+        self.assertTrue(os.path.exists(self.system_file + data_input.FREQUENCY_STATE_SUFFIX))
+        with mock.patch.object(data_input, 'load_draws', side_effect=AssertionError("recounted")):
+            self.assertEqual(data_input.load_frequency_state().regular.tolist(), state.regular.tolist())
+
+    def test_append_updates_state_incrementally(self):
+        data_input.load_frequency_state()
+        data_input.append_draws([self.NEW_DRAW])
+        with mock.patch.object(data_input.FrequencyState, 'from_draws', side_effect=AssertionError("recounted")):
+            state = data_input.load_frequency_state()
+        self.assertEqual(state.regular[1], 2)
+        self.assertStateMatchesHistory(state)
+
+    def test_delete_draws(self):
+        data_input.load_frequency_state()
+        self.assertEqual(data_input.delete_draws(['2025002', 2025009]), 1)
+        self.assertEqual(data_input.load_draws().dates.tolist(), ['2025001', '2025003'])
+        with mock.patch.object(data_input.FrequencyState, 'from_draws', side_effect=AssertionError("recounted")):
+            state = data_input.load_frequency_state()
+        self.assertEqual(state.regular[8], 0)
+        self.assertStateMatchesHistory(state)
+        self.assertEqual(data_input.delete_draws(['2025002']), 0)
+
+    def test_stale_state_is_rebuilt(self):
+        data_input.load_frequency_state()
+        data_input.save_history(data_input.load_history()[:1])
+        self.assertStateMatchesHistory(data_input.load_frequency_state())
+
+    def test_repository_ignores_state_for_other_data_version(self):
+        draws = data_input.load_draws()
+        forged = data_input.FrequencyState(np.ones(50), np.ones(50), len(draws), {'size': 0, 'mtime_ns': 0})
+        repository = data_input.HistoryRepository()
+        with mock.patch.object(data_input, 'load_frequency_state', return_value=forged):
+            regular, special = repository.frequency_vectors()
+        self.assertEqual(regular.tolist(), draws.regular_counts().tolist())
+        self.assertEqual(special.tolist(), draws.special_counts().tolist())
+
+        repository = data_input.HistoryRepository()
+        with mock.patch.object(data_input, 'analysis') as analysis:
+            regular, _ = repository.frequency_vectors()
+        analysis.frequency_vectors.assert_not_called()
+        self.assertEqual(regular.tolist(), draws.regular_counts().tolist())
+
+
+class TestHistoryRepository(DataDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.repository = data_input.HistoryRepository()
+        patcher = mock.patch.object(data_input, '_repository', self.repository)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unchanged_file_is_not_reloaded(self):
+        self.assertEqual(len(self.repository.draws), 3)
+        with mock.patch.object(data_input, 'load_draws', side_effect=AssertionError("reloaded")):
+            self.assertEqual(len(self.repository.draws), 3)
+            self.assertFalse(self.repository.refresh())
+
+    def test_writes_notify_subscribers(self):
+        self.repository.draws
+        seen = []
+        self.repository.subscribe(lambda repo: seen.append(len(repo.draws)))
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        self.assertEqual(seen, [4])
+        data_input.save_history(data_input.load_history()[1:])
+        self.assertEqual(seen, [4, 3])
+
+    def test_count_table_extended_on_append(self):
+        self.assertEqual(len(self.repository.draws.count_table()), 3)
+        from lottery_analyzer.draws import CountTable
+        with mock.patch.object(CountTable, 'from_draws', side_effect=AssertionError("rebuilt")):
+            data_input.append_draws([{'date': '2025004', 'numbers': [1, 23, 24, 25, 26, 27], 'special': 28}])
+            window = self.repository.draws.window(2)
+            self.assertEqual(window.regular_counts()[1], 1)
+        self.assertEqual(len(self.repository.draws.count_table()), 4)
+
+    def test_gap_statistics_updated_with_appended_rows(self):
+        self.assertEqual(self.repository.gap_statistics().current_gaps()[1], 2)
+        from lottery_analyzer.analysis import GapAccumulator
+        original = GapAccumulator.update
+        blocks = []
+        with mock.patch.object(GapAccumulator, 'update', autospec=True,
+                               side_effect=lambda acc, block: blocks.append(len(block)) or original(acc, block)):
+            data_input.append_draws([{'date': '2025004', 'numbers': [1, 23, 24, 25, 26, 27], 'special': 28}])
+            gaps = self.repository.gap_statistics()
+        self.assertEqual(blocks, [1])
+        self.assertEqual(gaps.current_gaps()[1], 0)
+        self.assertEqual(gaps.mean_gaps()[1], 2)
+
+    def test_cooccurrence_cached_per_window(self):
+        self.assertIs(self.repository.cooccurrence(2), self.repository.cooccurrence(2))
+        self.assertEqual(self.repository.cooccurrence().counts[1, 2], 1)
+        data_input.append_draws([{'date': '2025004', 'numbers': [1, 2, 24, 25, 26, 27], 'special': 28}])
+        self.assertEqual(self.repository.cooccurrence().counts[1, 2], 2)
+        self.assertEqual(self.repository.cooccurrence(1).top_pairs(1), [((1, 2), 1)])
+
+    def test_derived_results_cached_per_version(self):
+        calls = []
+        factory = lambda draws: calls.append(1) or len(draws)
+        self.assertEqual(self.repository.derived('size', factory), 3)
+        self.assertEqual(self.repository.derived('size', factory), 3)
+        self.assertEqual(len(calls), 1)
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        self.assertEqual(self.repository.derived('size', factory), 4)
+        self.assertEqual(len(calls), 2)
+
+    def test_frequencies_and_tag_annotations(self):
+        reg_freq, spec_freq = self.repository.frequencies()
+        self.assertEqual(reg_freq[1], 1)
+        self.assertEqual(spec_freq[14], 1)
+        reg_freq[1] = 99  # 调用方修改不影响缓存
+        self.assertEqual(self.repository.frequencies()[0][1], 1)
+        self.assertEqual(self.repository.tag_annotations()['单双'], ['单', '双', '单'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+import unittest.mock
+import numpy as np
+from lottery_analyzer import analysis, prediction
+from lottery_analyzer import draws as draws_module
+from lottery_analyzer.draws import CountTable, DrawMatrix, HistoryWindow, as_draw_matrix, normalize_draw_id, numbers_to_mask
+
+
+class TestDrawMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.history = [
+            {'date': '2025001', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 7},
+            {'date': '2025002', 'numbers': [1, 10, 11, 12, 13, 14], 'special': 7},
+            {'date': '2025003', 'numbers': [2, 20, 21, 22, 23, 24], 'special': 8},
+            {'date': '2025004', 'numbers': [30, 2, 31, 32, 33, 34], 'special': 9},
+        ]
+        self.draws = DrawMatrix.from_dicts(self.history)
+
+    def test_columns_shape_and_dtype(self):
+        """The store is an N×6 uint8 matrix plus special and int64 draw-id vectors."""
+        self.assertEqual(self.draws.numbers.shape, (4, 6))
+        self.assertEqual(self.draws.numbers.dtype, np.uint8)
+        self.assertEqual(self.draws.special.tolist(), [7, 7, 8, 9])
+        self.assertEqual(self.draws.draw_ids.dtype, np.int64)
+        self.assertEqual(self.draws.draw_ids.tolist(), [2025001, 2025002, 2025003, 2025004])
+
+    def test_dict_adapter_round_trip(self):
+        """to_dicts() returns the legacy format, preserving number order."""
+        self.assertEqual(self.draws.to_dicts(), self.history)
+        self.assertEqual(list(self.draws), self.history)
+        self.assertEqual(self.draws[-1], self.history[-1])
+
+    def test_slice_is_view(self):
+        """Slicing returns a DrawMatrix sharing memory with the original."""
+        window = self.draws[-2:]
+        self.assertIsInstance(window, DrawMatrix)
+        self.assertEqual(len(window), 2)
+        self.assertTrue(np.shares_memory(window.numbers, self.draws.numbers))
+
+    def test_from_dicts_skips_invalid(self):
+        """Incomplete or out-of-range draws are dropped."""
+        history = self.history + [
+            {'date': 'bad1', 'numbers': [1, 2, 3], 'special': 4},
+            {'date': 'bad2', 'numbers': [1, 2, 3, 4, 5, 60], 'special': 4},
+            {'date': 'bad3', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 'x'},
+            None,
+        ]
+        self.assertEqual(len(DrawMatrix.from_dicts(history)), 4)
+        self.assertEqual(len(DrawMatrix.from_dicts([])), 0)
+        self.assertIs(as_draw_matrix(self.draws), self.draws)
+
+    def test_normalize_draw_id(self):
+        self.assertEqual(normalize_draw_id('2025001'), 2025001)
+        self.assertEqual(normalize_draw_id('2023-01-01'), 20230101)
+        self.assertEqual(normalize_draw_id('dx'), -1)
+
+    def test_last_seen(self):
+        last = self.draws.last_seen()
+        self.assertEqual(last[2], 3)
+        self.assertEqual(last[1], 1)
+        self.assertEqual(last[49], -1)
+
+    def test_calculate_frequencies_matches_dict_path(self):
+        """DrawMatrix input gives the same frequencies as the dict-list path."""
+        self.assertEqual(analysis.calculate_frequencies(self.draws),
+                         analysis.calculate_frequencies(self.history))
+
+    def test_predictions_match_dict_path(self):
+        """Predictors accept DrawMatrix and agree with the dict-list input."""
+        reg_freq, spec_freq = analysis.calculate_frequencies(self.history)
+        self.assertEqual(
+            prediction.predict_numbers_basic(self.draws, reg_freq, spec_freq, recent_draws_count=2),
+            prediction.predict_numbers_basic(self.history, reg_freq, spec_freq, recent_draws_count=2))
+        self.assertEqual(prediction._get_recent_numbers(self.draws, 2, 'special'),
+                         prediction._get_recent_numbers(self.history, 2, 'special'))
+
+
+class TestBitmaskKernels(unittest.TestCase):
+
+    def setUp(self):
+        self.draws = DrawMatrix.from_dicts([
+            {'date': '2025001', 'numbers': [1, 2, 3, 4, 5, 6], 'special': 7},
+            {'date': '2025002', 'numbers': [1, 2, 11, 12, 13, 49], 'special': 7},
+            {'date': '2025003', 'numbers': [2, 20, 21, 22, 23, 49], 'special': 8},
+        ])
+
+    def test_masks_and_combination_keys(self):
+        self.assertEqual(self.draws.masks.dtype, np.uint64)
+        self.assertEqual(int(self.draws.masks[1]), numbers_to_mask([1, 2, 11, 12, 13, 49]))
+        self.assertEqual(self.draws.combination_keys().tolist(),
+                         [draws_module.combination_key(d['numbers'], d['special']) for d in self.draws])
+        self.assertTrue(np.shares_memory(self.draws[1:].masks, self.draws.masks))
+
+    def test_swar_popcount_matches_builtin(self):
+        values = np.random.default_rng(0).integers(0, 2 ** 63, 1000, dtype=np.uint64)
+        values[:3] = [0, np.uint64(2 ** 64 - 1), np.uint64(1 << 49)]
+        expected = [bin(int(v)).count('1') for v in values]
+        self.assertEqual(draws_module._popcount_swar(values).tolist(), expected)
+        self.assertEqual(draws_module.popcount(values).tolist(), expected)
+
+    def test_overlap_repeats_and_sharing(self):
+        ticket = [1, 2, 3, 20, 30, 49]
+        self.assertEqual(analysis.match_counts(self.draws, ticket).tolist(), [3, 3, 3])
+        self.assertEqual(self.draws.overlap_counts(numbers_to_mask([2, 49])).tolist(), [1, 2, 2])
+        self.assertEqual(analysis.repeat_counts(self.draws).tolist(), [0, 2, 2])
+        self.assertEqual(analysis.count_draws_sharing(self.draws, [1, 2, 49], 3), 1)
+        self.assertEqual(analysis.count_draws_sharing(self.draws, [1, 2, 49], 2), 3)
+        self.assertEqual(analysis.repeat_counts(DrawMatrix.empty()).tolist(), [])
+
+
+class TestHistoryWindow(unittest.TestCase):
+
+    def setUp(self):
+        self.history = [
+            {'date': str(2025001 + i), 'numbers': [i % 40 + 1, 42, 43, 44, 45, 46], 'special': i % 7 + 1}
+            for i in range(30)]
+        self.draws = DrawMatrix.from_dicts(self.history)
+
+    def test_window_matches_list_slice(self):
+        for count in (None, 0, 1, 10, 30, 100):
+            expected = self.history if count is None else (self.history[-count:] if count else [])
+            window = self.draws.window(count)
+            self.assertIsInstance(window, HistoryWindow)
+            self.assertEqual(window.draws.to_dicts(), expected)
+            self.assertEqual(window.regular_counts().tolist(),
+                             DrawMatrix.from_dicts(expected).regular_counts().tolist())
+
+    def test_windows_and_aggregates_are_shared(self):
+        window = self.draws.window(10)
+        self.assertIs(self.draws.window(10), window)
+        self.assertIs(window.special_counts(), window.special_counts())
+        self.assertTrue(np.shares_memory(window.draws.numbers, self.draws.numbers))
+        self.assertEqual(analysis.calculate_frequencies(window),
+                         analysis.calculate_frequencies(self.history[-10:]))
+
+    def test_predict_tags_window_matches_dict_path(self):
+        self.assertEqual(prediction.predict_tags(self.draws, recent_draws_count=12),
+                         prediction.predict_tags(self.history, recent_draws_count=12))
+
+
+class TestCountTable(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        numbers = np.argsort(rng.random((200, 49)), axis=1)[:, :7] + 1
+        self.draws = DrawMatrix(numbers[:, :6], numbers[:, 6])
+
+    def test_window_counts_by_subtraction(self):
+        table = self.draws.count_table()
+        self.assertEqual(len(table), 200)
+        for start, stop in [(0, 200), (17, 123), (199, 200), (50, 50)]:
+            self.assertEqual(table.regular_counts(start, stop).tolist(),
+                             self.draws[start:stop].regular_counts().tolist())
+            self.assertEqual(table.special_counts(start, stop).tolist(),
+                             self.draws[start:stop].special_counts().tolist())
+        sweep = table.recent_counts([1, 30, 500], 'special')
+        self.assertEqual(sweep.shape, (3, 50))
+        self.assertEqual(sweep[1].tolist(), self.draws[-30:].special_counts().tolist())
+        self.assertEqual(sweep[2].tolist(), self.draws.special_counts().tolist())
+
+    def test_extend_matches_full_build(self):
+        table = CountTable.from_draws(self.draws[:150]).extend(self.draws[150:])
+        full = self.draws.count_table()
+        self.assertTrue((table.regular == full.regular).all())
+        self.assertTrue((table.special == full.special).all())
+
+    def test_windows_use_table_and_reuse_on_append(self):
+        head = self.draws[:150].concat(DrawMatrix.empty())
+        head.count_table()
+        self.assertTrue(self.draws.extend_count_table(head))
+        self.assertFalse(self.draws.extend_count_table(self.draws[1:151]))
+        with unittest.mock.patch.object(DrawMatrix, 'regular_counts', side_effect=AssertionError("scanned")):
+            counts = self.draws.window(40).regular_counts()
+        self.assertEqual(counts.sum(), 240)
+
+
+if __name__ == '__main__':
+    unittest.main()
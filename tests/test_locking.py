@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from lottery_analyzer import data_input
+from lottery_analyzer.locking import FileLock, GenerationCounter
+
+from tests.test_data_input import DataDirTestCase
+
+
+def _hold_lock(path, ready, release):
+    with FileLock(path):
+        ready.set()
+        release.wait(10)
+
+
+def _append_worker(worker, count):
+    for i in range(count):
+        number = worker * count + i
+        data_input.append_draws([{'date': str(2026000 + number),
+                                  'numbers': [1, 2, 3, 4, 5, number % 40 + 6],
+                                  'special': worker + 40}])
+
+
+class TestFileLock(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+        self.path = os.path.join(self.tmpdir, "history.csv.lock")
+
+    def test_reentrant_within_process(self):
+        lock = FileLock(self.path)
+        with lock:
+            with lock:
+                self.assertEqual(lock.depth, 2)
+            self.assertEqual(lock.depth, 1)
+        self.assertEqual(lock.depth, 0)
+
+    def test_other_process_times_out_while_held(self):
+        ctx = multiprocessing.get_context('fork')
+        ready, release = ctx.Event(), ctx.Event()
+        holder = ctx.Process(target=_hold_lock, args=(self.path, ready, release))
+        holder.start()
+        try:
+            self.assertTrue(ready.wait(10))
+            with self.assertRaises(TimeoutError):
+                FileLock(self.path).acquire(timeout=0.1)
+        finally:
+            release.set()
+            holder.join(10)
+        with FileLock(self.path, timeout=1):
+            pass
+
+    def test_generation_counter_is_odd_while_writing(self):
+        counter = GenerationCounter(os.path.join(self.tmpdir, "history.csv.generation"))
+        done = counter.begin()
+        self.assertEqual(counter.read() % 2, 1)
+        counter.end(done)
+        self.assertEqual(counter.read(), 2)
+
+
+class TestLockedHistoryWrites(DataDirTestCase):
+
+    def test_write_bumps_generation_once(self):
+        before = data_input.history_generation()
+        data_input.append_draws([{'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28}])
+        self.assertEqual(data_input.history_generation(), before + 2)
+
+    def test_concurrent_appends_lose_nothing(self):
+        ctx = multiprocessing.get_context('fork')
+        workers = [ctx.Process(target=_append_worker, args=(w, 10)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+        self.assertEqual(len(data_input.load_draws()), 3 + 40)
+        self.assertEqual(data_input.history_generation(), 2 * 40)
+
+    def test_reader_retries_while_write_in_progress(self):
+        counter = data_input._generation_counter()
+        counter.write(1)  # 模拟写入进程中途崩溃
+        with mock.patch.object(data_input, 'READ_RETRIES', 2):
+            start = time.monotonic()
+            draws = data_input.load_draws()
+        self.assertEqual(len(draws), 3)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(counter.read(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,14 @@
 import unittest
 import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+
+from lottery_analyzer import advanced_prediction, prediction
+from lottery_analyzer.draws import DrawMatrix
+from lottery_analyzer.prediction_context import PredictionContext, sample_without_replacement
 from lottery_analyzer.prediction import (
     predict_tags,
     TAG_PREDICTION_CONFIG,
@@ -174,5 +183,224 @@ class TestPredictTags(unittest.TestCase):
                 self.assertFalse(tag_name.startswith("生肖-"))
 
 
+class TestPredictionContext(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        numbers = np.argsort(rng.random((60, 49)), axis=1)[:, :7] + 1
+        self.draws = DrawMatrix(numbers[:, :6], numbers[:, 6])
+
+    def run_all(self, context=None, **kwargs):
+        with mock.patch('builtins.print'):
+            return prediction.predict_all_methods(self.draws, recent_draws_count=10, tag_trend_draws=20,
+                                                  context=context, seed=1, **kwargs).to_dict()
+
+    def test_same_results_with_shared_context(self):
+        self.assertEqual(self.run_all(), self.run_all(PredictionContext(self.draws)))
+
+    def test_groups_share_one_feature_pass(self):
+        with mock.patch.object(prediction, '_gm11_predict', wraps=prediction._gm11_predict) as gm11:
+            self.run_all()
+        single_run = gm11.call_count
+        context = PredictionContext(self.draws)
+        with mock.patch.object(DrawMatrix, 'last_seen', autospec=True, side_effect=lambda d: np.full(50, -1)) as last_seen, \
+                mock.patch.object(advanced_prediction, '_next_number_counts',
+                                  wraps=advanced_prediction._next_number_counts) as transitions, \
+                mock.patch.object(prediction, '_gm11_predict', wraps=prediction._gm11_predict) as gm11:
+            for _ in range(5):
+                self.run_all(context)
+        self.assertEqual(last_seen.call_count, 1)
+        self.assertEqual(transitions.call_count, 1)
+        self.assertEqual(gm11.call_count, single_run)
+
+    def test_results_are_computed_on_first_access(self):
+        with mock.patch.object(prediction, 'predict_numbers_basic', wraps=prediction.predict_numbers_basic) as basic, \
+                mock.patch.object(prediction, 'predict_numbers_advanced') as advanced, \
+                mock.patch.object(prediction, 'predict_using_grey_model') as grey:
+            result = prediction.predict_all_methods(self.draws)
+            self.assertIn('label_predictions', result)
+            self.assertEqual(set(result['label_predictions']), set(TAG_PREDICTION_CONFIG))
+            self.assertEqual(basic.call_count, 0)
+            self.assertFalse(result.is_computed('regular'))
+            with mock.patch('builtins.print'):
+                self.assertEqual(result['regular'], sorted(result['method_results']['basic']['regular']))
+            self.assertEqual(basic.call_count, 1)
+            advanced.assert_not_called()
+            grey.assert_not_called()
+
+    def test_seeded_results_independent_of_access_order(self):
+        expected = self.run_all()
+        with mock.patch('builtins.print'):
+            result = prediction.predict_all_methods(self.draws, recent_draws_count=10, tag_trend_draws=20, seed=1)
+            methods = result['method_results']
+            reordered = {name: methods[name] for name in reversed(prediction.ALL_METHODS)}
+        self.assertEqual(reordered, expected['method_results'])
+
+    def test_parallel_runs_match_serial(self):
+        expected = self.run_all()
+        self.assertEqual(self.run_all(workers=4), expected)
+        self.assertEqual(self.run_all(PredictionContext(self.draws), workers=4), expected)
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('fork')) as pool:
+            self.assertEqual(self.run_all(executor=pool), expected)
+
+    def test_bound_process_pool_sends_context_once(self):
+        expected = self.run_all()
+        context = PredictionContext(self.draws)
+        with mock.patch.object(PredictionContext, '__getstate__', autospec=True,
+                               side_effect=PredictionContext.__getstate__) as getstate:
+            with prediction.PredictionProcessPool(context, max_workers=2,
+                                                  mp_context=multiprocessing.get_context('fork')) as pool:
+                self.assertEqual(self.run_all(context, executor=pool), expected)
+                self.assertEqual(self.run_all(context, executor=pool), expected)
+        self.assertEqual(getstate.call_count, 0)
+
+    def test_features_computed_once_across_threads(self):
+        context = PredictionContext(self.draws)
+        calls = []
+        def factory(draws):
+            calls.append(1)
+            return len(draws)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: context.derived('size', factory), range(32)))
+        self.assertEqual(results, [len(self.draws)] * 32)
+        self.assertEqual(len(calls), 1)
+
+    def test_global_random_state_reproducible_without_seed(self):
+        def run():
+            np.random.seed(3)
+            with mock.patch('builtins.print'):
+                return prediction.predict_all_methods(self.draws).to_dict()
+        self.assertEqual(run(), run())
+
+    def test_tag_trend_shares_match_per_tag_loop(self):
+        context = PredictionContext(self.draws)
+        regular, _ = context.tag_trend_shares(5)
+        window = self.draws.window(5).regular_counts()
+        tags = {n: prediction.get_tags_for_number(n) for n in range(1, 50)}
+        trends = collections.Counter()
+        for n, number_tags in tags.items():
+            for tag in number_tags:
+                trends[tag] += int(window[n])
+        total = sum(trends.values())
+        expected = [sum(trends[tag] / total for tag in tags[n]) for n in range(1, 50)]
+        np.testing.assert_allclose(regular[1:], expected)
+
+
+
+class TestPredictGroups(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        numbers = np.argsort(rng.random((80, 49)), axis=1)[:, :7] + 1
+        numbers[-1, :6] = np.sort(numbers[30, :6])  # 最近一期的状态在历史中出现过
+        self.draws = DrawMatrix(numbers[:, :6], numbers[:, 6])
+        self.context = PredictionContext(self.draws)
+
+    def groups(self, method, n_groups, seed=7):
+        with mock.patch('builtins.print'):
+            return prediction.predict_groups(self.draws, method, n_groups, seed, context=self.context)
+
+    def test_groups_are_valid_distinct_and_reproducible(self):
+        for method in ('markov', 'bayes', 'timeseries', 'grey', 'hybrid'):
+            with self.subTest(method=method):
+                groups = self.groups(method, 20)
+                for result in groups:
+                    self.assertEqual(len(set(result['regular'])), 6)
+                    self.assertEqual(result['regular'], sorted(result['regular']))
+                    self.assertTrue(all(MIN_NUMBER <= n <= MAX_NUMBER for n in result['regular']))
+                    self.assertNotIn(result['special'], result['regular'])
+                self.assertEqual(groups, self.groups(method, 20))
+                # 第 g 组只取决于种子和 g
+                self.assertEqual(groups[:5], self.groups(method, 5))
+                self.assertGreater(len({(tuple(r['regular']), r['special']) for r in groups}), 1)
+
+    def test_deterministic_methods_match_single_call(self):
+        with mock.patch('builtins.print'):
+            expected = prediction.predict_numbers_basic(self.draws, context=self.context)
+        self.assertEqual(self.groups('basic', 1), [expected])
+        for method in prediction.DETERMINISTIC_METHODS:
+            with self.subTest(method=method), self.assertRaises(ValueError):
+                self.groups(method, 3)
+
+    def test_special_distribution_matches_hybrid_model(self):
+        probabilities = prediction._hybrid_special_probabilities(self.context)
+        self.assertAlmostEqual(probabilities.sum(), 1.0)
+        rng = np.random.default_rng(3)
+        draws = [advanced_prediction.hybrid_prediction(self.draws, 1, context=self.context, rng=rng)[0]
+                 for _ in range(4000)]
+        observed = np.bincount(draws, minlength=50) / len(draws)
+        np.testing.assert_allclose(observed, probabilities, atol=0.03)
+
+    def test_regular_marginals_match_per_call_sampling(self):
+        groups = self.groups('grey', 3000)
+        batched = np.bincount([n for r in groups for n in r['regular']], minlength=50) / len(groups)
+        single = [prediction.predict_using_grey_model(self.draws, context=self.context,
+                                                      rng=np.random.default_rng([5, i]))
+                  for i in range(3000)]
+        looped = np.bincount([n for r in single for n in r['regular']], minlength=50) / len(single)
+        np.testing.assert_allclose(batched, looped, atol=0.04)
+
+    def test_unknown_method_and_empty_history(self):
+        with self.assertRaises(ValueError):
+            prediction.predict_groups(self.draws, 'nonsense', 2)
+        with mock.patch('builtins.print'):
+            groups = prediction.predict_groups([], 'bayes', 3, seed=1)
+        self.assertEqual(len(groups), 3)
+        self.assertTrue(all(len(set(r['regular'])) == 6 for r in groups))
+        # 没有历史数据时特码同样在正码之外抽取
+        with mock.patch('builtins.print'):
+            groups = prediction.predict_groups([], 'hybrid', 200, seed=2)
+        self.assertTrue(all(r['special'] not in r['regular'] for r in groups))
+        self.assertTrue(all(MIN_NUMBER <= r['special'] <= MAX_NUMBER for r in groups))
+
+
+
+class TestSampleWithoutReplacement(unittest.TestCase):
+
+    def test_distinct_numbers_in_batches(self):
+        weights = np.zeros(50)
+        weights[1:] = np.arange(1, 50) ** 2
+        groups = sample_without_replacement(weights, 6, rng=0, size=500)
+        self.assertEqual(groups.shape, (500, 6))
+        self.assertTrue(((groups >= MIN_NUMBER) & (groups <= MAX_NUMBER)).all())
+        self.assertTrue(all(len(set(row)) == 6 for row in groups.tolist()))
+        self.assertEqual(sample_without_replacement(weights, 6, rng=0).shape, (6,))
+        self.assertEqual(sample_without_replacement(np.ones((3, 50)), 49, rng=0).shape, (3, 49))
+        with self.assertRaises(ValueError):
+            sample_without_replacement(weights, 50, rng=0)
+
+    def test_matches_sequential_sampling_with_discarded_repeats(self):
+        weights = np.zeros(50)
+        weights[1:10] = [30, 20, 10, 5, 5, 2, 1, 1, 1]
+        batched = sample_without_replacement(weights, 3, rng=1, size=20000)
+        rng = np.random.default_rng(2)
+        looped = []
+        for _ in range(20000):
+            picked = []
+            while len(picked) < 3:
+                n = int(rng.choice(50, p=weights / weights.sum()))
+                if n not in picked:
+                    picked.append(n)
+            looped.append(picked)
+        for position in range(3):
+            np.testing.assert_allclose(np.bincount(batched[:, position], minlength=50) / 20000,
+                                       np.bincount(np.array(looped)[:, position], minlength=50) / 20000,
+                                       atol=0.015)
+
+    def test_zero_weights_fill_after_positive_weights(self):
+        weights = np.zeros(50)
+        weights[[4, 9]] = [1, 3]
+        groups = sample_without_replacement(weights, 5, rng=3, size=200)
+        self.assertTrue(all(set(row[:2]) == {4, 9} for row in groups.tolist()))
+        self.assertGreater(len(set(groups[:, 2:].ravel().tolist())), 10)
+
+    def test_markov_terminates_with_sparse_transitions(self):
+        numbers = np.array([[1, 2, 3, 4, 5, 6], [7, 8, 9, 10, 11, 12], [1, 2, 3, 4, 5, 6]])
+        draws = DrawMatrix(numbers, np.array([13, 14, 15]))
+        predicted = advanced_prediction.markov_chain_prediction(draws, num_to_predict=10, rng=0)
+        self.assertEqual(len(set(predicted)), 10)
+        self.assertTrue({7, 8, 9, 10, 11, 12} <= set(predicted))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from lottery_analyzer import config, data_input
+from lottery_analyzer.draws import DrawMatrix
+from lottery_analyzer.sqlite_backend import SQLiteHistoryStore
+
+from tests.test_data_input import DataDirTestCase
+
+
+def _draws(start, count):
+    return DrawMatrix.from_dicts([
+        {'date': str(2025000 + i), 'numbers': [i % 40 + 1, 42, 43, 44, 45, 46], 'special': i % 5 + 1}
+        for i in range(start, start + count)])
+
+
+class TestSQLiteHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+        self.store = SQLiteHistoryStore(os.path.join(self.tmpdir, "history.db"))
+        self.addCleanup(self.store.close)
+
+    def test_wal_mode_and_round_trip(self):
+        self.store.replace_all(_draws(1, 5))
+        mode = self.store._connect().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, 'wal')
+        self.assertEqual(self.store.load().to_dicts(), _draws(1, 5).to_dicts())
+
+    def test_tail_and_range_queries(self):
+        self.store.replace_all(_draws(1, 5))
+        self.store.append(_draws(6, 3))
+        self.assertEqual(self.store.tail(2).dates.tolist(), ['2025007', '2025008'])
+        self.assertEqual(self.store.load(start_id='2025003', end_id=2025004).dates.tolist(),
+                         ['2025003', '2025004'])
+        self.assertEqual(self.store.count(), 8)
+
+    def test_generation_changes_on_every_write(self):
+        before = self.store.generation()
+        self.store.append(_draws(1, 1))
+        self.store.append(_draws(2, 1))
+        self.assertEqual(self.store.generation(), before + 2)
+
+    def test_failed_batch_rolls_back(self):
+        self.store.append(_draws(1, 2))
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.store.append(_draws(2, 3))   # 2025002 already stored
+        self.assertEqual(self.store.count(), 2)
+
+    def test_reader_not_blocked_by_open_write_transaction(self):
+        self.store.replace_all(_draws(1, 3))
+        writer = sqlite3.connect(self.store.path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("DELETE FROM draws")
+        reader = SQLiteHistoryStore(self.store.path, timeout=0.1)
+        self.addCleanup(reader.close)
+        self.assertEqual(len(reader.load()), 3)
+        writer.execute("ROLLBACK")
+
+
+class TestSQLiteBackend(DataDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.multiple(config, STORAGE_BACKEND="sqlite",
+                                      SQLITE_PATH=os.path.join(self.tmpdir, "history.db"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: data_input._sqlite_store().close())
+
+    def test_csv_imported_on_first_use(self):
+        self.assertEqual(data_input.load_history()[0]['date'], '2025001')
+        self.assertEqual(len(data_input.load_draws()), 3)
+
+    def test_append_and_duplicate_checks_use_database(self):
+        added = data_input.append_draws([
+            {'date': '2025004', 'numbers': [22, 23, 24, 25, 26, 27], 'special': 28},
+            {'date': '2025005', 'numbers': [3, 2, 1, 4, 5, 6], 'special': 7},   # same as 2025001
+            {'date': '2025002', 'numbers': [31, 32, 33, 34, 35, 36], 'special': 37},
+        ])
+        self.assertEqual(added, 1)
+        self.assertEqual(data_input.load_recent(2).dates.tolist(), ['2025003', '2025004'])
+        with open(self.system_file, encoding='utf-8') as f:
+            self.assertNotIn('2025004', f.read())   # the CSV is no longer written
+
+    def test_delete_updates_frequency_state(self):
+        data_input.load_frequency_state()
+        self.assertEqual(data_input.delete_draws(['2025001']), 1)
+        self.assertEqual(data_input.load_draws().dates.tolist(), ['2025002', '2025003'])
+        state = data_input.load_frequency_state()
+        self.assertEqual((state.total_draws, state.regular[1], state.regular[8]), (2, 0, 1))
+
+    def test_save_and_initialize(self):
+        data_input.save_history(data_input.load_history()[1:])
+        self.assertEqual(len(data_input.load_draws()), 2)
+        self.assertTrue(data_input.initialize_data())
+        self.assertEqual(len(data_input.load_draws()), 0)
+        self.assertTrue(data_input.restore_history(data_input.list_backups()[0]['id']))
+        self.assertEqual(data_input.load_draws().dates.tolist(), ['2025002', '2025003'])
+
+
+if __name__ == '__main__':
+    unittest.main()